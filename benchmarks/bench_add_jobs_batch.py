@@ -0,0 +1,50 @@
+"""Benchmark job ingestion through ``POST /projects/{id}/jobs/batch``.
+
+Runs the server app in-process against the database configured via the
+``database_*`` settings, submits batches of jobs to a scratch project and
+reports the ingestion rate. The scratch project and its jobs are deleted
+afterwards.
+
+Usage:
+    python benchmarks/bench_add_jobs_batch.py [--jobs 100000] [--batch-size 10000]
+"""
+
+import argparse
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+
+from whatsnext.api.server.main import app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100_000, help="Total number of jobs to submit")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Jobs per request")
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        project = client.post("/projects/", json={"name": f"bench-{uuid.uuid4().hex[:8]}", "description": "batch benchmark"}).json()
+        task = client.post("/tasks/", json={"name": "train", "project_id": project["id"]}).json()
+        try:
+            submitted = 0
+            start = time.perf_counter()
+            while submitted < args.jobs:
+                size = min(args.batch_size, args.jobs - submitted)
+                jobs = [
+                    {"name": f"job-{submitted + i}", "task_id": task["id"], "parameters": {"lr": 0.001 * i, "seed": i}, "priority": i % 10}
+                    for i in range(size)
+                ]
+                response = client.post(f"/projects/{project['id']}/jobs/batch", json={"jobs": jobs})
+                response.raise_for_status()
+                submitted += size
+            elapsed = time.perf_counter() - start
+        finally:
+            client.delete(f"/projects/{project['id']}")
+
+    print(f"{submitted} jobs in {elapsed:.2f}s: {submitted / elapsed:,.0f} jobs/s (batches of {args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark the overhead of the authentication and rate limit middleware.
+
+Sends heartbeat-sized requests straight into the ASGI app, without a
+network or database, through three stacks around the same small JSON route:
+no middleware, ``BaseHTTPMiddleware`` subclasses checking the API key with
+``compare_digest`` against every valid key (how the server's middleware used
+to work), and the server's plain ASGI ``AuthenticationMiddleware`` and
+``RateLimitMiddleware``. Prints the requests per second of each.
+
+Usage:
+    python benchmarks/bench_middleware.py [--requests 20000] [--keys 10]
+"""
+
+import argparse
+import asyncio
+import secrets
+import time
+from typing import Callable, List
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+from starlette.types import ASGIApp
+
+from whatsnext.api.server.middleware import AuthenticationMiddleware, RateLimitMiddleware
+from whatsnext.api.server.ratelimit import RouteLimits
+
+PATH = "/clients/bench/heartbeat"
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/clients/{id}/heartbeat")
+    async def heartbeat(id: str):
+        return {"status": "ok"}
+
+    return app
+
+
+class BaseHTTPAuthentication(BaseHTTPMiddleware):
+    """The former authentication middleware, comparing the key with every valid key."""
+
+    def __init__(self, app: ASGIApp, api_keys: List[str]):
+        super().__init__(app)
+        self.api_keys = api_keys
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        api_key = request.headers.get("X-API-Key")
+        if api_key is None:
+            return Response(status_code=401)
+        valid = False
+        for valid_key in self.api_keys:
+            if secrets.compare_digest(api_key.encode(), valid_key.encode()):
+                valid = True
+        if not valid:
+            return Response(status_code=403)
+        return await call_next(request)
+
+
+class BaseHTTPRateLimit(BaseHTTPMiddleware):
+    """The rate limit check in a BaseHTTPMiddleware."""
+
+    def __init__(self, app: ASGIApp, requests_per_minute: int):
+        super().__init__(app)
+        self.limits = RouteLimits(requests_per_minute)
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        limiter = self.limits.limiter_for(request.url.path)
+        if limiter is not None and limiter.hit(request.client.host if request.client else "unknown"):
+            return Response(status_code=429)
+        return await call_next(request)
+
+
+async def measure(app: ASGIApp, api_key: str, requests: int) -> float:
+    """Send ``requests`` heartbeats through ``app``; return requests per second."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": PATH,
+        "raw_path": PATH.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"x-api-key", api_key.encode()), (b"content-length", b"0")],
+        "client": ("10.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"Unexpected status {message['status']}")
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000, help="Requests per middleware stack")
+    parser.add_argument("--keys", type=int, default=10, help="Number of valid API keys")
+    args = parser.parse_args()
+
+    api_keys = [f"key-{i:04d}-{'x' * 32}" for i in range(args.keys)]
+    # Never rate limited, so every request runs the full check
+    limit = args.requests * 10
+    stacks = {
+        "no middleware": make_app(),
+        "BaseHTTPMiddleware": BaseHTTPAuthentication(BaseHTTPRateLimit(make_app(), limit), api_keys),
+        "ASGI middleware": AuthenticationMiddleware(RateLimitMiddleware(make_app(), limit), api_keys),
+    }
+    for name, app in stacks.items():
+        asyncio.run(measure(app, api_keys[-1], 500))  # warm up
+        rate = asyncio.run(measure(app, api_keys[-1], args.requests))
+        print(f"{name:20} {rate:10,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
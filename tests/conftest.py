@@ -52,3 +52,131 @@ def sample_job_data():
         "created_at": "2024-01-01T00:00:00",
         "updated_at": "2024-01-01T00:00:00",
     }
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    """Engine for the PostgreSQL test database configured via ``database_*`` settings.
+
+    Skips unless the database is reachable and its name ends in ``test``,
+    since the schema is dropped and recreated.
+    """
+    pytest.importorskip("sqlalchemy")
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    from whatsnext.api.server import models
+    from whatsnext.api.server.config import db
+    from whatsnext.api.server.database import engine
+
+    if not db.database.endswith("test"):
+        pytest.skip("Integration tests require a database whose name ends in 'test'")
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError:
+        pytest.skip("PostgreSQL test database is not available")
+
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    yield engine
+    models.Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def pg_db(pg_engine):
+    """A session on the PostgreSQL test database; all tables are emptied afterwards."""
+    from sqlalchemy import text
+
+    from whatsnext.api.server import models
+    from whatsnext.api.server.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+    tables = ", ".join(table.name for table in models.Base.metadata.sorted_tables)
+    with pg_engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+
+@pytest.fixture
+def make_project(pg_db):
+    """Factory for projects with a single ``train`` task, available as ``project.task``."""
+    from whatsnext.api.server import models
+
+    def make(name="project", required_cpu=1, required_accelerators=0):
+        project = models.Project(name=name, description="")
+        pg_db.add(project)
+        pg_db.flush()
+        task = models.Task(name="train", project_id=project.id, required_cpu=required_cpu, required_accelerators=required_accelerators)
+        pg_db.add(task)
+        pg_db.flush()
+        project.task = task
+        return project
+
+    return make
+
+
+@pytest.fixture
+def project(make_project):
+    """A project with a single 1 CPU task."""
+    return make_project()
+
+
+@pytest.fixture
+def add_job(pg_db):
+    """Factory for jobs of a project; ``task`` defaults to ``project.task``."""
+    from whatsnext.api.server import models
+    from whatsnext.api.server.dependencies import set_dependencies
+
+    def add(project, name, depends_on=(), status=models.JobStatus.PENDING, priority=0, task=None):
+        job = models.Job(
+            name=name,
+            project_id=project.id,
+            task_id=(task or project.task).id,
+            parameters={},
+            status=status,
+            priority=priority,
+        )
+        pg_db.add(job)
+        pg_db.flush()
+        set_dependencies(pg_db, job.id, [dep.id for dep in depends_on])
+        return job
+
+    return add
+
+
+@pytest.fixture
+def add_jobs(add_job):
+    """Factory for ``n`` independent jobs of a project named ``job-0``, ``job-1``, ..."""
+    from whatsnext.api.server import models
+
+    def add(project, n, status=models.JobStatus.PENDING, priority=0):
+        return [add_job(project, f"job-{i}", status=status, priority=priority) for i in range(n)]
+
+    return add
+
+
+@pytest.fixture
+def run_workers():
+    """Run a callable in ``n`` threads and re-raise the first exception any of them raised."""
+    import threading
+
+    def run(worker, n):
+        errors = []
+
+        def target():
+            try:
+                worker()
+            except BaseException as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=target) for _ in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    return run
@@ -12,13 +12,13 @@ INSERT INTO tasks (name, project_id) VALUES
 	('Inference', 2);
 
 
-INSERT INTO jobs (name, project_id, task_id, parameters, status, priority, depends) VALUES
-	('speedy-fog-1', 1, 1, '{}', 'PENDING', 0, '{}'),
-	('speedy-fog-2', 2, 1, '{}', 'PENDING', 0, '{}'),
-	('speedy-fog-3', 1, 2, '{}', 'PENDING', 0, '{}'),
-	('speedy-fog-4', 2, 2, '{}', 'PENDING', 0, '{}'),
-	('speedy-fog-5', 1, 3, '{}', 'PENDING', 0, '{}'),
-	('speedy-fog-6', 1, 4, '{}', 'PENDING', 0, '{}');
+INSERT INTO jobs (name, project_id, task_id, parameters, status, priority) VALUES
+	('speedy-fog-1', 1, 1, '{}', 'PENDING', 0),
+	('speedy-fog-2', 2, 1, '{}', 'PENDING', 0),
+	('speedy-fog-3', 1, 2, '{}', 'PENDING', 0),
+	('speedy-fog-4', 2, 2, '{}', 'PENDING', 0),
+	('speedy-fog-5', 1, 3, '{}', 'PENDING', 0),
+	('speedy-fog-6', 1, 4, '{}', 'PENDING', 0);
 
 
 SELECT jobs.*, tasks.name FROM jobs JOIN tasks ON jobs.task_id = tasks.id;
@@ -1,8 +1,13 @@
 """Tests for CLI main application."""
 
+from unittest.mock import patch
+
+import pytest
+import typer
 from typer.testing import CliRunner
 
 from whatsnext.cli import __version__, app
+from whatsnext.cli.commands.worker import parse_share
 
 runner = CliRunner(env={"NO_COLOR": "1", "TERM": "dumb"})
 
@@ -91,6 +96,22 @@ class TestQueueSubcommand:
         assert "stats" in result.stdout
         assert "clear" in result.stdout
 
+    def test_queue_ls_reads_pages_through_client(self):
+        """Test queue ls lists jobs with the client's page iterator, up to --limit."""
+        jobs = ({"id": i, "name": f"job-{i}", "status": "PENDING"} for i in range(10))
+        with (
+            patch("requests.get") as mock_get,
+            patch("whatsnext.Server") as mock_server,
+        ):
+            mock_get.return_value.json.return_value = {"id": 7}
+            mock_server.return_value.iter_jobs.return_value = jobs
+            result = runner.invoke(app, ["queue", "ls", "--project", "demo", "--status", "pending", "--limit", "3", "--json"])
+
+        assert result.exit_code == 0
+        assert "job-2" in result.stdout
+        assert "job-3" not in result.stdout
+        mock_server.return_value.iter_jobs.assert_called_once_with(project_id=7, status="PENDING", page_size=3)
+
 
 class TestClientsSubcommand:
     """Tests for the clients subcommand."""
@@ -132,6 +153,20 @@ class TestWorkerCommand:
         assert "--poll-interval" in result.stdout
         assert "--once" in result.stdout
 
+    @pytest.mark.parametrize(
+        "value,expected",
+        [("ml", ("ml", 1.0)), ("ml:3", ("ml", 3.0)), ("team:ml:0.5", ("team:ml", 0.5))],
+    )
+    def test_parse_share(self, value, expected):
+        """Test project options are split into name and weight."""
+        assert parse_share(value) == expected
+
+    @pytest.mark.parametrize("value", ["ml:heavy", "ml:0", "ml:-1"])
+    def test_parse_share_invalid_weight(self, value):
+        """Test weights must be positive numbers."""
+        with pytest.raises(typer.BadParameter):
+            parse_share(value)
+
 
 class TestStatusCommand:
     """Tests for the status command."""
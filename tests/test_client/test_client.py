@@ -1,7 +1,10 @@
 """Tests for the Client class."""
 
 import signal
-from unittest.mock import MagicMock
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
 
 from whatsnext.api.client.client import Client
 from whatsnext.api.client.exceptions import EmptyQueueError
@@ -260,6 +263,138 @@ class TestClientWork:
 
         mock_project.fetch_job.assert_called_with()
 
+    def test_work_with_batches(self):
+        """Test work loop claims jobs in batches when batch_size > 1."""
+        mock_project = MagicMock()
+        mock_project._server = None
+        mock_project.id = 1
+
+        mock_jobs = []
+        for i in range(3):
+            job = MagicMock()
+            job.id = i + 1
+            job.name = f"job-{i}"
+            job.run.return_value = 0
+            mock_jobs.append(job)
+
+        mock_project.fetch_jobs.side_effect = [mock_jobs, EmptyQueueError("No jobs")]
+
+        formatter = CLIFormatter()
+        client = Client(entity="test", name="client", description="test", project=mock_project, formatter=formatter, register_with_server=False)
+
+        jobs_done = client.work(batch_size=5, use_resource_filter=False)
+
+        assert jobs_done == 3
+        mock_project.fetch_jobs.assert_called_with(max_jobs=5, sequential=True)
+        mock_project.fetch_job.assert_not_called()
+
+    def test_work_registered_client_leases_and_heartbeats(self):
+        """Test a registered client claims jobs under its ID and heartbeats while working."""
+        mock_server = MagicMock()
+        mock_server.register_client.return_value = True
+        mock_project = MagicMock()
+        mock_project._server = mock_server
+        mock_project._check_server.return_value = mock_server
+        mock_project.id = 1
+
+        mock_job = MagicMock()
+        mock_job.id = 1
+
+        formatter = CLIFormatter()
+        client = Client(entity="test", name="client", description="test", project=mock_project, formatter=formatter)
+
+        def run(resource):
+            # Give the heartbeat thread time to beat while the job runs
+            time.sleep(0.2)
+            return 0
+
+        mock_job.run.side_effect = run
+        mock_project.fetch_job.side_effect = [mock_job, EmptyQueueError("No jobs")]
+
+        jobs_done = client.work(use_resource_filter=False, heartbeat_interval=0.05)
+
+        assert jobs_done == 1
+        mock_project.fetch_job.assert_called_with(client_id=client.id)
+        mock_server.client_heartbeat.assert_called_with(client.id)
+
+    def test_work_with_shares(self):
+        """Test work loop fetches by fair share when serving several projects."""
+        mock_project = MagicMock()
+        mock_project._server = None
+        mock_project.id = 1
+        other_project = MagicMock()
+        other_project.id = 2
+
+        mock_job = MagicMock()
+        mock_job.id = 1
+        mock_job.run.return_value = 0
+
+        formatter = CLIFormatter()
+        client = Client(entity="test", name="client", description="test", project=mock_project, formatter=formatter, register_with_server=False)
+        shares = [(mock_project, 2.0), (other_project, 1.0)]
+
+        with patch.object(client, "fetch_shared_job", side_effect=[mock_job, EmptyQueueError("No jobs")]) as mock_fetch:
+            jobs_done = client.work(use_resource_filter=False, shares=shares)
+
+        assert jobs_done == 1
+        mock_fetch.assert_called_with(shares)
+        mock_project.fetch_job.assert_not_called()
+
+    def test_work_shares_reject_batches(self):
+        """Test fetching by fair share cannot be combined with batches."""
+        mock_project = MagicMock()
+        mock_project._server = None
+
+        formatter = CLIFormatter()
+        client = Client(entity="test", name="client", description="test", project=mock_project, formatter=formatter, register_with_server=False)
+
+        with pytest.raises(ValueError):
+            client.work(batch_size=2, shares=[(mock_project, 1.0)])
+
+    def test_work_releases_unrun_batch_jobs_on_shutdown(self):
+        """Test claimed jobs that were not run are returned to the queue on shutdown."""
+        mock_project = MagicMock()
+        mock_project._server = None
+        mock_project.id = 1
+
+        formatter = CLIFormatter()
+        client = Client(entity="test", name="client", description="test", project=mock_project, formatter=formatter, register_with_server=False)
+
+        first, second = MagicMock(), MagicMock()
+        first.run.side_effect = lambda resource: client.stop() or 0
+        mock_project.fetch_jobs.return_value = [first, second]
+
+        jobs_done = client.work(batch_size=2)
+
+        assert jobs_done == 1
+        first.release.assert_not_called()
+        second.run.assert_not_called()
+        second.release.assert_called_once_with()
+
+    def test_work_run_forever_long_polls(self):
+        """Test run_forever fetches with a server-side wait instead of a fixed sleep."""
+        mock_project = MagicMock()
+        mock_project._server = None
+        mock_project.id = 1
+
+        formatter = CLIFormatter()
+        client = Client(entity="test", name="client", description="test", project=mock_project, formatter=formatter, register_with_server=False)
+
+        mock_job = MagicMock()
+        mock_job.run.side_effect = lambda resource: client.stop() or 0
+        mock_project.fetch_job.side_effect = [EmptyQueueError("No jobs"), mock_job]
+
+        with (
+            patch("whatsnext.api.client.client.time.sleep") as mock_sleep,
+            patch("whatsnext.api.client.client.time.monotonic", side_effect=[0.0, 30.0, 30.0]),
+        ):
+            jobs_done = client.work(poll_interval=30, run_forever=True, use_resource_filter=False)
+
+        assert jobs_done == 1
+        mock_project.fetch_job.assert_called_with(wait=30)
+        # The long poll already took the whole interval
+        mock_sleep.assert_not_called()
+
     def test_work_with_provided_resource(self):
         """Test work loop with externally provided resource."""
         mock_project = MagicMock()
@@ -215,6 +215,17 @@ class TestJob:
         mock_server._job_connector.set_status.assert_called_once_with(job, "RUNNING")
         assert job.status == "RUNNING"
 
+    def test_release_with_server(self):
+        """Test release returns the job to the queue through the server."""
+        job = Job(name="test", task="task", parameters={}, status="QUEUED")
+        mock_server = MagicMock()
+        job._bind_server(mock_server)
+
+        job.release()
+
+        mock_server._job_connector.release.assert_called_once_with(job)
+        assert job.status == "PENDING"
+
     def test_set_priority_without_server(self):
         """Test set_priority_to raises error without server."""
         job = Job(name="test", task="task", parameters={})
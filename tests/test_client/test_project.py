@@ -294,7 +294,25 @@ class TestProjectFetchJob:
 
         project.fetch_job(available_cpu=8, available_accelerators=4)
 
-        mock_server.fetch_job.assert_called_once_with(project, available_cpu=8, available_accelerators=4)
+        mock_server.fetch_job.assert_called_once_with(project, available_cpu=8, available_accelerators=4, wait=0, client_id=None)
+
+    def test_fetch_jobs(self):
+        """Test fetching several jobs in one request."""
+        mock_server = MagicMock()
+        mock_server.fetch_jobs.return_value = {
+            "jobs": [{"id": i, "name": f"job-{i}", "task_name": "train", "project_id": 1, "task_id": 1, "parameters": {}} for i in (1, 2)],
+            "num_pending": 5,
+        }
+
+        project = Project(id=1, _server=mock_server)
+
+        jobs = project.fetch_jobs(max_jobs=2, available_cpu=8)
+
+        assert [job.id for job in jobs] == [1, 2]
+        assert all(job.task == "train" and job._server == mock_server for job in jobs)
+        mock_server.fetch_jobs.assert_called_once_with(
+            project, max_jobs=2, available_cpu=8, available_accelerators=0, wait=0, client_id=None, sequential=False
+        )
 
 
 class TestProjectCreateTask:
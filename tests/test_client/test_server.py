@@ -185,6 +185,102 @@ class TestServer:
         assert call_args[1]["params"]["available_cpu"] == 4
         assert call_args[1]["params"]["available_accelerators"] == 2
 
+    @patch("whatsnext.api.client.server.requests")
+    def test_fetch_job_no_ready_job(self, mock_requests):
+        """Test pending jobs that are not ready count as an empty queue."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        mock_requests.get.return_value.json.return_value = {"job": None, "num_pending": 3}
+
+        server = Server("localhost", 8000)
+        project = Project(1, server)
+
+        with pytest.raises(EmptyQueueError):
+            server.fetch_job(project)
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_fetch_job_long_poll(self, mock_requests):
+        """Test the wait is sent to the server and added to the request timeout."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        mock_requests.get.return_value.json.return_value = {"job": {"id": 1}, "num_pending": 1}
+
+        server = Server("localhost", 8000)
+        project = Project(1, server)
+
+        server.fetch_job(project, wait=20)
+
+        call_args = mock_requests.get.call_args
+        assert call_args[1]["params"]["wait"] == 20
+        assert call_args[1]["timeout"] == DEFAULT_TIMEOUT + 20
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_fetch_jobs(self, mock_requests):
+        """Test fetching several jobs with a resource budget."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        mock_requests.get.return_value.json.return_value = {
+            "jobs": [{"id": 1, "name": "job1"}, {"id": 2, "name": "job2"}],
+            "num_pending": 5,
+        }
+
+        server = Server("localhost", 8000)
+        project = Project(1, server)
+
+        result = server.fetch_jobs(project, max_jobs=2, available_cpu=4)
+
+        assert [job["id"] for job in result["jobs"]] == [1, 2]
+        call_args = mock_requests.get.call_args
+        assert call_args[0][0].endswith("/projects/1/fetch_jobs")
+        assert call_args[1]["params"] == {"max": 2, "available_cpu": 4}
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_fetch_jobs_sequential(self, mock_requests):
+        """Test a batch to be run one job after another asks for a per-job budget."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        mock_requests.get.return_value.json.return_value = {"jobs": [{"id": 1, "name": "job1"}], "num_pending": 0}
+
+        server = Server("localhost", 8000)
+        server.fetch_jobs(Project(1, server), max_jobs=2, available_cpu=4, sequential=True)
+
+        assert mock_requests.get.call_args[1]["params"] == {"max": 2, "available_cpu": 4, "sequential": True}
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_fetch_jobs_empty_queue(self, mock_requests):
+        """Test fetching several jobs when none can be claimed."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        mock_requests.get.return_value.json.return_value = {"jobs": [], "num_pending": 3}
+
+        server = Server("localhost", 8000)
+        project = Project(1, server)
+
+        with pytest.raises(EmptyQueueError):
+            server.fetch_jobs(project)
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_fetch_shared_job(self, mock_requests):
+        """Test fetching by fair share sends every project with its weight."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        mock_requests.get.return_value.json.return_value = {"job": {"id": 3}, "num_pending": 4}
+
+        server = Server("localhost", 8000)
+        shares = [(Project(1, server), 3.0), (Project(2, server), 1.0)]
+
+        result = server.fetch_shared_job(shares, available_cpu=2)
+
+        assert result["job"]["id"] == 3
+        call_args = mock_requests.get.call_args
+        assert call_args[0][0].endswith("/fetch_job")
+        assert call_args[1]["params"] == {"project_id": [1, 2], "weight": [3.0, 1.0], "available_cpu": 2}
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_fetch_shared_job_empty(self, mock_requests):
+        """Test fetching by fair share when no project has a ready job."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        mock_requests.get.return_value.json.return_value = {"job": None, "num_pending": 0}
+
+        server = Server("localhost", 8000)
+
+        with pytest.raises(EmptyQueueError):
+            server.fetch_shared_job([(Project(1, server), 1.0)])
+
     @patch("whatsnext.api.client.server.requests")
     def test_register_client(self, mock_requests):
         """Test client registration."""
@@ -318,6 +414,19 @@ class TestJobConnector:
         call_args = mock_requests.put.call_args
         assert call_args[1]["json"]["status"] == "RUNNING"
 
+    @patch("whatsnext.api.client.server.requests")
+    def test_release(self, mock_requests):
+        """Test releasing a job posts to its release endpoint."""
+        mock_server = MagicMock()
+        mock_server.base_url = "http://localhost:8000"
+        mock_requests.post.return_value.raise_for_status = MagicMock()
+
+        connector = JobConnector(mock_server)
+        connector.release(Job(id=1, name="job1", task="train", parameters={}))
+
+        assert mock_requests.post.call_args[0][0] == "http://localhost:8000/jobs/1/release"
+        mock_requests.put.assert_not_called()
+
     @patch("whatsnext.api.client.server.requests")
     def test_set_priority_to(self, mock_requests):
         """Test setting job priority."""
@@ -461,6 +570,39 @@ class TestServerAdditional:
 
         assert len(result) == 2
 
+    @patch("whatsnext.api.client.server.requests")
+    def test_iter_pages_follows_cursor(self, mock_requests):
+        """Test all pages are fetched lazily by following the next-page cursor."""
+        mock_requests.get.return_value.raise_for_status = MagicMock()
+        server = Server("localhost", 8000)
+        first, last = MagicMock(ok=True, headers={"X-Next-Cursor": "abc"}), MagicMock(ok=True, headers={})
+        first.json.return_value = [{"id": 1}, {"id": 2}]
+        last.json.return_value = [{"id": 3}]
+        mock_requests.get.reset_mock()
+        mock_requests.get.side_effect = [first, last]
+
+        jobs = server.iter_jobs(project_id=7, page_size=2)
+        assert next(jobs) == {"id": 1}
+        assert mock_requests.get.call_count == 1
+        assert [job["id"] for job in jobs] == [2, 3]
+
+        calls = mock_requests.get.call_args_list
+        assert calls[0].kwargs["params"] == {"order": "id", "project_id": 7, "limit": 2}
+        assert calls[1].kwargs["params"] == {"order": "id", "project_id": 7, "limit": 2, "cursor": "abc"}
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_iter_pages_leaves_params_alone(self, mock_requests):
+        """Test the caller's parameters are not changed while paging."""
+        server = Server("localhost", 8000)
+        first, last = MagicMock(ok=True, headers={"X-Next-Cursor": "abc"}), MagicMock(ok=True, headers={})
+        first.json.return_value = [{"id": 1}]
+        last.json.return_value = []
+        mock_requests.get.side_effect = [first, last]
+        params = {"project_id": 7}
+
+        assert list(server.iter_pages("/jobs", params, page_size=1)) == [{"id": 1}]
+        assert params == {"project_id": 7}
+
     @patch("whatsnext.api.client.server.requests")
     def test_get_queue_failure(self, mock_requests):
         """Test getting queue when request fails."""
@@ -556,6 +698,57 @@ class TestServerAdditional:
 
         assert result == [1, 2]
 
+    @patch("whatsnext.api.client.server.requests")
+    def test_extend_queue_sends_dependencies(self, mock_requests):
+        """Test in-batch dependencies are sent by position and existing ones by ID."""
+        mock_requests.get.return_value.ok = True
+        mock_requests.get.return_value.json.return_value = {"id": 1}
+        mock_requests.post.return_value.status_code = 201
+        mock_requests.post.return_value.json.return_value = {"created": 2, "job_ids": [11, 12]}
+
+        server = Server("localhost", 8000)
+        project = Project(1, server)
+        existing = Job(name="existing", task="train", parameters={}, id=5)
+        prepare = Job(name="prepare", task="train", parameters={}, depends=[existing])
+        train = Job(name="train", task="train", parameters={}, depends=[prepare, existing])
+
+        result = server.extend_queue(project, [prepare, train])
+
+        assert result == [11, 12]
+        assert (prepare.id, train.id) == (11, 12)
+        items = mock_requests.post.call_args.kwargs["json"]["jobs"]
+        assert items[0]["depends"] == {"5": "existing"}
+        assert items[0]["depends_on_items"] == []
+        assert items[1]["depends"] == {"5": "existing"}
+        assert items[1]["depends_on_items"] == [0]
+        # The task is looked up once for the whole batch
+        task_lookups = [call for call in mock_requests.get.call_args_list if "/tasks/name/" in call.args[0]]
+        assert len(task_lookups) == 1
+
+    @patch("whatsnext.api.client.server.requests")
+    def test_extend_queue_skips_dependents_of_skipped_jobs(self, mock_requests):
+        """Test jobs depending on a job with an unknown task are skipped too."""
+
+        def get_task(url, **kwargs):
+            response = MagicMock()
+            response.ok = not url.endswith("/missing")
+            response.json.return_value = {"id": 1}
+            return response
+
+        mock_requests.get.side_effect = get_task
+        mock_requests.post.return_value.status_code = 201
+        mock_requests.post.return_value.json.return_value = {"created": 1, "job_ids": [3]}
+
+        server = Server("localhost", 8000)
+        project = Project(1, server)
+        broken = Job(name="broken", task="missing", parameters={})
+        dependent = Job(name="dependent", task="train", parameters={}, depends=[broken])
+        independent = Job(name="independent", task="train", parameters={})
+
+        assert server.extend_queue(project, [dependent, broken, independent]) == [3]
+        items = mock_requests.post.call_args.kwargs["json"]["jobs"]
+        assert [item["name"] for item in items] == ["independent"]
+
     @patch("whatsnext.api.client.server.requests")
     def test_extend_queue_task_not_found(self, mock_requests):
         """Test extending queue when task not found."""
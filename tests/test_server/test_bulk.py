@@ -0,0 +1,162 @@
+"""Tests for set-based batch job creation."""
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from whatsnext.api.server import models, schemas
+from whatsnext.api.server.bulk import insert_jobs, resolve_batch_dependencies, topological_order
+from whatsnext.api.server.dependencies import get_dependency_ids
+from whatsnext.api.server.models import JobStatus
+
+
+def _item(project, name, depends=(), priority=0, depends_on_items=(), depends_on_names=()):
+    return schemas.JobBatchItem(
+        name=name,
+        task_id=project.task.id if project else 1,
+        parameters={"name": name},
+        priority=priority,
+        depends={str(job.id): job.name for job in depends},
+        depends_on_items=list(depends_on_items),
+        depends_on_names=list(depends_on_names),
+    )
+
+
+class TestResolveBatchDependencies:
+    """Tests for resolve_batch_dependencies."""
+
+    def test_positions_and_names(self):
+        """Test references by position and by name resolve to positions."""
+        items = [_item(None, "a"), _item(None, "b", depends_on_items=[0]), _item(None, "c", depends_on_items=[1], depends_on_names=["a", "b"])]
+
+        assert resolve_batch_dependencies(items) == [[], [0], [1, 0]]
+
+    @pytest.mark.parametrize(
+        "items",
+        [
+            [_item(None, "a", depends_on_items=[3])],
+            [_item(None, "a", depends_on_names=["missing"])],
+            [_item(None, "a"), _item(None, "a"), _item(None, "b", depends_on_names=["a"])],
+            [_item(None, "a", depends_on_items=[0])],
+        ],
+        ids=["out-of-range", "unknown-name", "ambiguous-name", "self"],
+    )
+    def test_invalid_reference(self, items):
+        """Test references that do not name exactly one other item are rejected."""
+        with pytest.raises(HTTPException) as exc_info:
+            resolve_batch_dependencies(items)
+        assert exc_info.value.status_code == 400
+
+    def test_cycle(self):
+        """Test a cycle within the batch is rejected."""
+        items = [_item(None, "a", depends_on_names=["c"]), _item(None, "b", depends_on_items=[0]), _item(None, "c", depends_on_items=[1])]
+
+        with pytest.raises(HTTPException) as exc_info:
+            resolve_batch_dependencies(items)
+        assert "Circular" in exc_info.value.detail
+
+
+class TestTopologicalOrder:
+    """Tests for topological_order."""
+
+    def test_dependencies_first(self):
+        """Test every position comes after its dependencies."""
+        order = topological_order([[2], [0, 2], []])
+
+        assert order == [2, 0, 1]
+
+    def test_cycle_left_out(self):
+        """Test positions on or behind a cycle are left out."""
+        assert topological_order([[], [2], [1], [2]]) == [0]
+
+
+@pytest.mark.integration
+class TestInsertJobs:
+    """Tests for insert_jobs."""
+
+    def test_empty_batch(self, pg_db, project):
+        """Test an empty batch inserts nothing."""
+        assert insert_jobs(pg_db, project.id, []) == []
+
+    def test_ids_in_item_order(self, pg_db, project):
+        """Test returned IDs match the order of the items."""
+        items = [_item(project, f"job-{i}", priority=i) for i in range(50)]
+
+        job_ids = insert_jobs(pg_db, project.id, items)
+        pg_db.commit()
+
+        names = dict(pg_db.execute(select(models.Job.id, models.Job.name).where(models.Job.id.in_(job_ids))).all())
+        assert [names[job_id] for job_id in job_ids] == [f"job-{i}" for i in range(50)]
+
+    def test_dependencies_and_unmet_counts(self, pg_db, project):
+        """Test edges are written and unmet dependencies counted."""
+        done = models.Job(name="done", project_id=project.id, parameters={}, status=JobStatus.COMPLETED)
+        waiting = models.Job(name="waiting", project_id=project.id, parameters={})
+        pg_db.add_all([done, waiting])
+        pg_db.flush()
+
+        job_ids = insert_jobs(pg_db, project.id, [_item(project, "a", depends=[done]), _item(project, "b", depends=[done, waiting])])
+        pg_db.commit()
+
+        a, b = (pg_db.get(models.Job, job_id) for job_id in job_ids)
+        assert sorted(get_dependency_ids(pg_db, b)) == sorted([done.id, waiting.id])
+        assert a.unmet_dependencies == 0
+        assert b.unmet_dependencies == 1
+        assert a.status == JobStatus.PENDING
+
+    def test_failed_dependency_blocks(self, pg_db, project):
+        """Test jobs depending on a failed job are created BLOCKED."""
+        failed = models.Job(name="failed", project_id=project.id, parameters={}, status=JobStatus.FAILED)
+        pg_db.add(failed)
+        pg_db.flush()
+
+        job_ids = insert_jobs(pg_db, project.id, [_item(project, "a", depends=[failed]), _item(project, "b")])
+        pg_db.commit()
+
+        a, b = (pg_db.get(models.Job, job_id) for job_id in job_ids)
+        assert a.status == JobStatus.BLOCKED
+        assert b.status == JobStatus.PENDING
+
+    def test_deleted_dependency_rejected(self, pg_db, project):
+        """Test a dependency deleted after validation is reported as missing, not a KeyError."""
+        gone = models.Job(name="gone", project_id=project.id, parameters={})
+        pg_db.add(gone)
+        pg_db.flush()
+        item = _item(project, "a", depends=[gone])
+        pg_db.delete(gone)
+        pg_db.flush()
+
+        with pytest.raises(HTTPException) as exc_info:
+            insert_jobs(pg_db, project.id, [item])
+
+        assert exc_info.value.status_code == 400
+        assert str(gone.id) in exc_info.value.detail
+
+    def test_batch_dag(self, pg_db, project):
+        """Test in-batch dependencies become edges between the new jobs."""
+        items = [
+            _item(project, "train", depends_on_names=["prepare"]),
+            _item(project, "prepare"),
+            _item(project, "evaluate", depends_on_items=[0, 1]),
+        ]
+
+        job_ids = insert_jobs(pg_db, project.id, items, resolve_batch_dependencies(items))
+        pg_db.commit()
+
+        train, prepare, evaluate = (pg_db.get(models.Job, job_id) for job_id in job_ids)
+        assert get_dependency_ids(pg_db, train) == [prepare.id]
+        assert sorted(get_dependency_ids(pg_db, evaluate)) == sorted([train.id, prepare.id])
+        assert (prepare.unmet_dependencies, train.unmet_dependencies, evaluate.unmet_dependencies) == (0, 1, 2)
+
+    def test_failure_blocks_through_batch(self, pg_db, project):
+        """Test a failed existing dependency blocks its dependents within the batch."""
+        failed = models.Job(name="failed", project_id=project.id, parameters={}, status=JobStatus.FAILED)
+        pg_db.add(failed)
+        pg_db.flush()
+        items = [_item(project, "child", depends=[failed]), _item(project, "grandchild", depends_on_items=[0]), _item(project, "other")]
+
+        job_ids = insert_jobs(pg_db, project.id, items, resolve_batch_dependencies(items))
+        pg_db.commit()
+
+        statuses = [pg_db.get(models.Job, job_id).status for job_id in job_ids]
+        assert statuses == [JobStatus.BLOCKED, JobStatus.BLOCKED, JobStatus.PENDING]
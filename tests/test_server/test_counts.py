@@ -0,0 +1,259 @@
+"""Integration tests for the trigger-maintained per-project job counts."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select, text, update
+
+from whatsnext.api.server import models
+from whatsnext.api.server.counts import (
+    count_jobs,
+    count_jobs_by_task,
+    count_jobs_of_projects,
+    count_pending_by_priority,
+    get_job_counts,
+    recount_jobs,
+)
+from whatsnext.api.server.database import SessionLocal
+from whatsnext.api.server.models import JOB_COUNT_STRIPES
+from whatsnext.api.server.scheduler import claim_jobs
+
+pytestmark = pytest.mark.integration
+
+
+class TestJobCounts:
+    """Tests for the project_job_counts triggers."""
+
+    def test_insert_counts(self, pg_db, make_project, add_jobs):
+        """Test inserted jobs are counted by status."""
+        project = make_project()
+        add_jobs(project, 3)
+        add_jobs(project, 2, status=models.JobStatus.COMPLETED)
+        pg_db.commit()
+
+        counts = get_job_counts(pg_db, project.id)
+
+        assert counts[models.JobStatus.PENDING] == 3
+        assert counts[models.JobStatus.COMPLETED] == 2
+        assert counts[models.JobStatus.RUNNING] == 0
+
+    def test_claim_moves_counts(self, pg_db, make_project, add_jobs):
+        """Test claiming moves jobs from PENDING to QUEUED."""
+        project = make_project()
+        add_jobs(project, 5)
+        pg_db.commit()
+
+        claim_jobs(pg_db, project.id, 2)
+        pg_db.commit()
+
+        assert count_jobs(pg_db, project.id, models.JobStatus.PENDING) == 3
+        assert count_jobs(pg_db, project.id, models.JobStatus.QUEUED) == 2
+
+    def test_orm_status_change(self, pg_db, make_project, add_jobs):
+        """Test a status change through the ORM is counted."""
+        project = make_project()
+        job = add_jobs(project, 1)[0]
+        pg_db.commit()
+
+        job.status = models.JobStatus.FAILED
+        pg_db.commit()
+
+        assert count_jobs(pg_db, project.id, models.JobStatus.PENDING) == 0
+        assert count_jobs(pg_db, project.id, models.JobStatus.FAILED) == 1
+
+    def test_delete_counts(self, pg_db, make_project, add_jobs):
+        """Test deleted jobs are no longer counted."""
+        project = make_project()
+        add_jobs(project, 4)
+        pg_db.commit()
+
+        pg_db.execute(delete(models.Job).where(models.Job.name.in_(["job-0", "job-1"])))
+        pg_db.commit()
+
+        assert count_jobs(pg_db, project.id, models.JobStatus.PENDING) == 2
+
+    def test_rollback_leaves_counts(self, pg_db, make_project, add_jobs):
+        """Test counts change only when the job change commits."""
+        project = make_project()
+        add_jobs(project, 2)
+        pg_db.commit()
+
+        pg_db.execute(update(models.Job).values(status=models.JobStatus.RUNNING))
+        pg_db.rollback()
+
+        assert count_jobs(pg_db, project.id, models.JobStatus.PENDING) == 2
+        assert count_jobs(pg_db, project.id, models.JobStatus.RUNNING) == 0
+
+    def test_project_delete_removes_counts(self, pg_db, make_project, add_jobs):
+        """Test deleting a project cascades to its jobs and counts."""
+        project = make_project()
+        add_jobs(project, 2)
+        pg_db.commit()
+
+        pg_db.execute(delete(models.Project).where(models.Project.id == project.id))
+        pg_db.commit()
+
+        assert pg_db.query(models.ProjectJobCount).count() == 0
+
+    def test_counts_are_per_project(self, pg_db, make_project, add_jobs):
+        """Test jobs of other projects are not counted."""
+        first = make_project("first")
+        second = make_project("second")
+        add_jobs(first, 3)
+        add_jobs(second, 1)
+        pg_db.commit()
+
+        assert count_jobs(pg_db, first.id, models.JobStatus.PENDING) == 3
+        assert count_jobs(pg_db, second.id, models.JobStatus.PENDING) == 1
+
+    def test_counts_of_several_projects(self, pg_db, make_project, add_jobs):
+        """Test the jobs of several projects are counted together, across stripes."""
+        first = make_project("first")
+        second = make_project("second")
+        other = make_project("other")
+        add_jobs(first, 3)
+        add_jobs(second, 1)
+        add_jobs(other, 2)
+        pg_db.commit()
+        pg_db.add(models.ProjectJobCount(project_id=first.id, status=models.JobStatus.PENDING, stripe=JOB_COUNT_STRIPES - 1, n=2))
+        pg_db.commit()
+
+        assert count_jobs_of_projects(pg_db, [first.id, second.id], models.JobStatus.PENDING) == 6
+        assert count_jobs_of_projects(pg_db, [first.id, second.id], models.JobStatus.FAILED) == 0
+
+    def test_moving_job_between_projects(self, pg_db, make_project, add_jobs):
+        """Test a job moved to another project is counted there."""
+        first = make_project("first")
+        second = make_project("second")
+        job = add_jobs(first, 1)[0]
+        pg_db.commit()
+
+        job.project_id = second.id
+        pg_db.commit()
+
+        assert count_jobs(pg_db, first.id, models.JobStatus.PENDING) == 0
+        assert count_jobs(pg_db, second.id, models.JobStatus.PENDING) == 1
+
+    def test_updates_keeping_status_skip_counters(self, pg_db, make_project, add_jobs):
+        """Test lease renewals and updates setting the same status do not write counter rows."""
+        project = make_project()
+        add_jobs(project, 3)
+        pg_db.commit()
+        versions = pg_db.execute(text("SELECT xmin::text FROM project_job_counts ORDER BY stripe, status")).all()
+
+        pg_db.execute(update(models.Job).values(lease_owner="client", lease_expires_at=datetime.now(timezone.utc)))
+        pg_db.execute(update(models.Job).values(status=models.JobStatus.PENDING))
+        pg_db.commit()
+
+        assert pg_db.execute(text("SELECT xmin::text FROM project_job_counts ORDER BY stripe, status")).all() == versions
+
+    def test_counts_sum_stripes(self, pg_db, make_project, add_jobs):
+        """Test a count is the sum over the stripes of its counter rows."""
+        project = make_project()
+        add_jobs(project, 3)
+        pg_db.commit()
+        stripe = pg_db.scalar(select(models.ProjectJobCount.stripe))
+        pg_db.add(models.ProjectJobCount(project_id=project.id, status=models.JobStatus.PENDING, stripe=(stripe + 1) % JOB_COUNT_STRIPES, n=-1))
+        pg_db.commit()
+
+        assert count_jobs(pg_db, project.id, models.JobStatus.PENDING) == 2
+        assert get_job_counts(pg_db, project.id)[models.JobStatus.PENDING] == 2
+
+    def test_concurrent_claims_keep_counts(self, pg_db, make_project, add_jobs, run_workers):
+        """Test claims of one project from many sessions are all counted."""
+        project = make_project()
+        add_jobs(project, 100)
+        pg_db.commit()
+        project_id = project.id
+
+        def worker():
+            session = SessionLocal()
+            try:
+                while claim_jobs(session, project_id, 3):
+                    session.commit()
+                session.commit()
+            finally:
+                session.close()
+
+        run_workers(worker, 8)
+
+        assert count_jobs(pg_db, project_id, models.JobStatus.PENDING) == 0
+        assert count_jobs(pg_db, project_id, models.JobStatus.QUEUED) == 100
+
+
+class TestRecountJobs:
+    """Tests for recount_jobs."""
+
+    def test_repairs_drifted_counts(self, pg_db, make_project, add_jobs):
+        """Test recounting replaces wrong counts with the real ones."""
+        project = make_project()
+        add_jobs(project, 3)
+        pg_db.commit()
+        pg_db.execute(update(models.ProjectJobCount).values(n=42))
+        pg_db.commit()
+
+        recount_jobs(pg_db)
+        pg_db.commit()
+
+        assert count_jobs(pg_db, project.id, models.JobStatus.PENDING) == 3
+
+    def test_recount_one_project(self, pg_db, make_project, add_jobs):
+        """Test recounting one project leaves the others alone."""
+        first = make_project("first")
+        second = make_project("second")
+        add_jobs(first, 3)
+        add_jobs(second, 1)
+        pg_db.commit()
+        pg_db.execute(update(models.ProjectJobCount).values(n=42))
+        pg_db.commit()
+
+        recount_jobs(pg_db, first.id)
+        pg_db.commit()
+
+        assert count_jobs(pg_db, first.id, models.JobStatus.PENDING) == 3
+        assert count_jobs(pg_db, second.id, models.JobStatus.PENDING) == 42
+
+
+class TestGroupedCounts:
+    """Tests for the counts aggregated with GROUP BY."""
+
+    def test_count_by_task(self, pg_db, make_project, add_jobs):
+        """Test jobs are counted per task, the most jobs first."""
+        project = make_project()
+        small = models.Task(name="small", project_id=project.id)
+        large = models.Task(name="large", project_id=project.id)
+        pg_db.add_all([small, large])
+        pg_db.flush()
+        for job in add_jobs(project, 3):
+            job.task_id = large.id
+        add_jobs(project, 1)[0].task_id = small.id
+        completed = add_jobs(project, 2, models.JobStatus.COMPLETED)
+        completed[0].task_id = large.id
+        completed[1].task_id = None
+        pg_db.commit()
+
+        assert count_jobs_by_task(pg_db, project.id) == [(large.id, "large", 4), (small.id, "small", 1), (None, None, 1)]
+
+    def test_pending_by_priority(self, pg_db, make_project, add_jobs):
+        """Test pending jobs are counted per priority band, the highest band first."""
+        project = make_project()
+        for job, priority in zip(add_jobs(project, 4), [-3, 0, 9, 25]):
+            job.priority = priority
+        oldest = add_jobs(project, 1)[0]
+        oldest.priority = 21
+        oldest.created_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        add_jobs(project, 3, models.JobStatus.RUNNING)
+        pg_db.commit()
+
+        bands, oldest_age = count_pending_by_priority(pg_db, project.id, 10)
+
+        assert bands == [(20, 2), (0, 2), (-10, 1)]
+        assert 3600 <= oldest_age < 3700
+
+    def test_pending_by_priority_without_pending_jobs(self, pg_db, make_project, add_jobs):
+        """Test a project without pending jobs has no bands and no age."""
+        project = make_project()
+        add_jobs(project, 2, models.JobStatus.COMPLETED)
+        pg_db.commit()
+
+        assert count_pending_by_priority(pg_db, project.id, 10) == ([], None)
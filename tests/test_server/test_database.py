@@ -70,3 +70,64 @@ class TestDatabaseURL:
             assert hasattr(db_module, "SessionLocal")
             assert hasattr(db_module, "Base")
             assert hasattr(db_module, "get_db")
+
+
+class TestSessionRunner:
+    """Tests for running database work from async routes."""
+
+    def test_sync_runner_uses_threadpool(self):
+        """Test the sync runner calls the work with its session off the event loop."""
+        import asyncio
+        import threading
+
+        from whatsnext.api.server.database import SessionRunner
+
+        session = MagicMock()
+
+        def work(db, value):
+            return db, value, threading.current_thread()
+
+        db, value, thread = asyncio.run(SessionRunner(session).run(work, 42))
+
+        assert db is session
+        assert value == 42
+        assert thread is not threading.main_thread()
+
+    def test_async_runner_uses_run_sync(self):
+        """Test the async runner hands the work to AsyncSession.run_sync."""
+        import asyncio
+
+        from whatsnext.api.server.database import AsyncSessionRunner
+
+        session = MagicMock()
+
+        async def run_sync(fn, *args, **kwargs):
+            return fn("sync-session", *args, **kwargs)
+
+        session.run_sync = run_sync
+
+        assert asyncio.run(AsyncSessionRunner(session).run(lambda db, value: (db, value), 42)) == ("sync-session", 42)
+
+    def test_session_runner_follows_mode(self):
+        """Test get_session_runner wraps the sync session, or an AsyncSession in async mode."""
+        import asyncio
+
+        from whatsnext.api.server.database import AsyncSessionRunner, SessionRunner, get_session_runner
+
+        async def first(gen):
+            runner = await gen.__anext__()
+            await gen.aclose()
+            return runner
+
+        sync_session = MagicMock()
+        runner = asyncio.run(first(get_session_runner(sync_session)))
+        assert type(runner) is SessionRunner
+        assert runner.session is sync_session
+
+        async_session = MagicMock()
+        async_session_local = MagicMock()
+        async_session_local.return_value.__aenter__.return_value = async_session
+        with patch("whatsnext.api.server.database.AsyncSessionLocal", async_session_local):
+            runner = asyncio.run(first(get_session_runner(sync_session)))
+        assert isinstance(runner, AsyncSessionRunner)
+        assert runner.session is async_session
@@ -1,362 +1,352 @@
 """Tests for server dependency resolution utilities."""
 
-from unittest.mock import MagicMock
+import threading
 
+import pytest
+from sqlalchemy import insert, select
+
+from whatsnext.api.server import models, schemas
+from whatsnext.api.server.database import SessionLocal
 from whatsnext.api.server.dependencies import (
+    apply_status_change,
     are_dependencies_completed,
     detect_circular_dependency,
     get_dependency_ids,
-    get_jobs_with_completed_dependencies,
     has_failed_dependency,
+    parse_dependency_ids,
     propagate_failure,
+    release_dependents,
+    set_dependencies,
 )
 from whatsnext.api.server.models import JobStatus
+from whatsnext.api.server.routers.jobs import update_job
 
 
-class TestGetDependencyIds:
-    """Tests for get_dependency_ids function."""
+class TestParseDependencyIds:
+    """Tests for parse_dependency_ids function."""
 
     def test_no_dependencies(self):
-        """Test job with no dependencies."""
-        job = MagicMock()
-        job.depends = None
+        """Test None yields no dependencies."""
+        assert parse_dependency_ids(None) == []
 
-        result = get_dependency_ids(job)
+    def test_empty_dependencies(self):
+        """Test empty dependencies dict."""
+        assert parse_dependency_ids({}) == []
 
-        assert result == []
+    def test_with_dependencies(self):
+        """Test string keys are converted to IDs."""
+        assert sorted(parse_dependency_ids({"1": "job-a", "2": "job-b", "3": "job-c"})) == [1, 2, 3]
 
-    def test_empty_dependencies(self):
-        """Test job with empty dependencies dict."""
-        job = MagicMock()
-        job.depends = {}
 
-        result = get_dependency_ids(job)
+@pytest.mark.integration
+class TestGetDependencyIds:
+    """Tests for get_dependency_ids function."""
 
-        assert result == []
+    def test_no_dependencies(self, pg_db, project, add_job):
+        """Test job with no dependencies."""
+        job = add_job(project, "a")
 
-    def test_with_dependencies(self):
+        assert get_dependency_ids(pg_db, job) == []
+
+    def test_with_dependencies(self, pg_db, project, add_job):
         """Test job with dependencies."""
-        job = MagicMock()
-        job.depends = {"1": "job-a", "2": "job-b", "3": "job-c"}
+        a = add_job(project, "a")
+        b = add_job(project, "b")
+        c = add_job(project, "c", depends_on=[a, b])
 
-        result = get_dependency_ids(job)
+        assert sorted(get_dependency_ids(pg_db, c)) == sorted([a.id, b.id])
 
-        assert sorted(result) == [1, 2, 3]
+    def test_set_dependencies_replaces_edges(self, pg_db, project, add_job):
+        """Test set_dependencies replaces the previous edges."""
+        a = add_job(project, "a")
+        b = add_job(project, "b")
+        c = add_job(project, "c", depends_on=[a])
 
+        set_dependencies(pg_db, c.id, [b.id])
 
-class TestAreDependenciesCompleted:
-    """Tests for are_dependencies_completed function."""
+        assert get_dependency_ids(pg_db, c) == [b.id]
 
-    def test_no_dependencies(self):
-        """Test job with no dependencies returns True."""
-        mock_db = MagicMock()
-        job = MagicMock()
-        job.depends = None
 
-        result = are_dependencies_completed(mock_db, job)
+@pytest.mark.integration
+class TestUnmetDependencies:
+    """Tests for the unmet_dependencies counter."""
 
-        assert result is True
+    def _unmet(self, db, job):
+        db.refresh(job)
+        return job.unmet_dependencies
 
-    def test_all_completed(self):
-        """Test all dependencies completed."""
-        mock_db = MagicMock()
-        job = MagicMock()
-        job.depends = {"1": "job-a", "2": "job-b"}
+    def test_set_at_insert(self, pg_db, project, add_job):
+        """Test only dependencies that are not COMPLETED are counted."""
+        done = add_job(project, "done", status=JobStatus.COMPLETED)
+        running = add_job(project, "running", status=JobStatus.RUNNING)
+        job = add_job(project, "job", depends_on=[done, running])
 
-        dep1 = MagicMock()
-        dep1.status = JobStatus.COMPLETED
-        dep2 = MagicMock()
-        dep2.status = JobStatus.COMPLETED
+        assert self._unmet(pg_db, job) == 1
 
-        mock_db.query.return_value.filter.return_value.all.return_value = [dep1, dep2]
+    def test_decremented_on_completion(self, pg_db, project, add_job):
+        """Test dependents are decremented when a dependency completes and incremented when it reverts."""
+        prereq = add_job(project, "prereq", status=JobStatus.RUNNING)
+        job = add_job(project, "job", depends_on=[prereq])
 
-        result = are_dependencies_completed(mock_db, job)
+        apply_status_change(pg_db, prereq.id, JobStatus.RUNNING, JobStatus.COMPLETED)
+        assert self._unmet(pg_db, job) == 0
 
-        assert result is True
+        apply_status_change(pg_db, prereq.id, JobStatus.COMPLETED, JobStatus.PENDING)
+        assert self._unmet(pg_db, job) == 1
 
-    def test_some_not_completed(self):
-        """Test some dependencies not completed."""
-        mock_db = MagicMock()
-        job = MagicMock()
-        job.depends = {"1": "job-a", "2": "job-b"}
+    def test_unchanged_by_other_transitions(self, pg_db, project, add_job):
+        """Test transitions not involving COMPLETED leave dependents alone."""
+        prereq = add_job(project, "prereq")
+        job = add_job(project, "job", depends_on=[prereq])
 
-        dep1 = MagicMock()
-        dep1.status = JobStatus.COMPLETED
-        dep2 = MagicMock()
-        dep2.status = JobStatus.RUNNING
+        apply_status_change(pg_db, prereq.id, JobStatus.PENDING, JobStatus.RUNNING)
 
-        mock_db.query.return_value.filter.return_value.all.return_value = [dep1, dep2]
+        assert self._unmet(pg_db, job) == 1
 
-        result = are_dependencies_completed(mock_db, job)
+    def test_released_on_delete(self, pg_db, project, add_job):
+        """Test deleting an unfinished dependency releases its dependents."""
+        done = add_job(project, "done", status=JobStatus.COMPLETED)
+        pending = add_job(project, "pending")
+        job = add_job(project, "job", depends_on=[done, pending])
 
-        assert result is False
+        release_dependents(pg_db, select(models.Job.id).where(models.Job.id.in_([done.id, pending.id])))
+        pg_db.delete(pending)
+        pg_db.flush()
 
-    def test_missing_dependencies(self):
-        """Test some dependencies don't exist in DB."""
-        mock_db = MagicMock()
-        job = MagicMock()
-        job.depends = {"1": "job-a", "2": "job-b", "3": "job-c"}
+        assert self._unmet(pg_db, job) == 0
 
-        # Only 2 deps returned from DB
-        dep1 = MagicMock()
-        dep1.status = JobStatus.COMPLETED
-        dep2 = MagicMock()
-        dep2.status = JobStatus.COMPLETED
+    def test_concurrent_completions_decrement_once(self, pg_db, project, add_job, run_workers):
+        """Test concurrent updates completing the same job decrement its dependents once."""
+        prereq = add_job(project, "prereq", status=JobStatus.RUNNING)
+        jobs = [add_job(project, f"job-{i}", depends_on=[prereq]) for i in range(5)]
+        pg_db.commit()
+        update = schemas.JobUpdate(
+            name=prereq.name,
+            project_id=project.id,
+            task_id=project.task.id,
+            parameters={},
+            status="COMPLETED",
+            priority=0,
+            depends={},
+        )
+        prereq_id = prereq.id
+        barrier = threading.Barrier(8)
 
-        mock_db.query.return_value.filter.return_value.all.return_value = [dep1, dep2]
+        def worker():
+            session = SessionLocal()
+            try:
+                barrier.wait()
+                update_job(prereq_id, update, session)
+            finally:
+                session.close()
 
-        result = are_dependencies_completed(mock_db, job)
+        run_workers(worker, 8)
 
-        assert result is False
+        assert [self._unmet(pg_db, job) for job in jobs] == [0] * 5
 
 
-class TestHasFailedDependency:
-    """Tests for has_failed_dependency function."""
+@pytest.mark.integration
+class TestAreDependenciesCompleted:
+    """Tests for are_dependencies_completed function."""
 
-    def test_no_dependencies(self):
-        """Test job with no dependencies returns False."""
-        mock_db = MagicMock()
-        job = MagicMock()
-        job.depends = None
+    def test_no_dependencies(self, pg_db, project, add_job):
+        """Test job with no dependencies returns True."""
+        job = add_job(project, "a")
 
-        result = has_failed_dependency(mock_db, job)
+        assert are_dependencies_completed(pg_db, job) is True
 
-        assert result is False
+    def test_all_completed(self, pg_db, project, add_job):
+        """Test all dependencies completed."""
+        a = add_job(project, "a", status=JobStatus.COMPLETED)
+        b = add_job(project, "b", status=JobStatus.COMPLETED)
+        job = add_job(project, "c", depends_on=[a, b])
 
-    def test_no_failed(self):
-        """Test no failed dependencies."""
-        mock_db = MagicMock()
-        job = MagicMock()
-        job.depends = {"1": "job-a"}
+        assert are_dependencies_completed(pg_db, job) is True
 
-        mock_db.query.return_value.filter.return_value.count.return_value = 0
+    def test_some_not_completed(self, pg_db, project, add_job):
+        """Test some dependencies not completed."""
+        a = add_job(project, "a", status=JobStatus.COMPLETED)
+        b = add_job(project, "b", status=JobStatus.RUNNING)
+        job = add_job(project, "c", depends_on=[a, b])
 
-        result = has_failed_dependency(mock_db, job)
+        assert are_dependencies_completed(pg_db, job) is False
 
-        assert result is False
 
-    def test_has_failed(self):
-        """Test has failed dependency."""
-        mock_db = MagicMock()
-        job = MagicMock()
-        job.depends = {"1": "job-a", "2": "job-b"}
+@pytest.mark.integration
+class TestHasFailedDependency:
+    """Tests for has_failed_dependency function."""
 
-        mock_db.query.return_value.filter.return_value.count.return_value = 1
+    def test_no_dependencies(self, pg_db, project, add_job):
+        """Test job with no dependencies returns False."""
+        job = add_job(project, "a")
 
-        result = has_failed_dependency(mock_db, job)
+        assert has_failed_dependency(pg_db, job) is False
+
+    def test_no_failed(self, pg_db, project, add_job):
+        """Test no failed dependencies."""
+        a = add_job(project, "a", status=JobStatus.RUNNING)
+        job = add_job(project, "b", depends_on=[a])
 
-        assert result is True
+        assert has_failed_dependency(pg_db, job) is False
 
+    @pytest.mark.parametrize("status", [JobStatus.FAILED, JobStatus.BLOCKED])
+    def test_has_failed(self, pg_db, project, status, add_job):
+        """Test FAILED and BLOCKED dependencies count as failed."""
+        a = add_job(project, "a", status=JobStatus.COMPLETED)
+        b = add_job(project, "b", status=status)
+        job = add_job(project, "c", depends_on=[a, b])
 
+        assert has_failed_dependency(pg_db, job) is True
+
+
+@pytest.mark.integration
 class TestDetectCircularDependency:
     """Tests for detect_circular_dependency function."""
 
-    def test_no_dependencies(self):
+    def test_no_dependencies(self, pg_db, project):
         """Test no circular dependency when no deps."""
-        mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.all.return_value = []
-
-        result = detect_circular_dependency(mock_db, 1, {}, 1)
-
-        assert result is False
+        assert detect_circular_dependency(pg_db, 1, {}, project.id) is False
 
-    def test_self_dependency(self):
+    def test_self_dependency(self, pg_db, project, add_job):
         """Test self-dependency is detected as circular."""
-        mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.all.return_value = []
+        job = add_job(project, "a")
 
-        result = detect_circular_dependency(mock_db, 1, {"1": "self"}, 1)
+        assert detect_circular_dependency(pg_db, job.id, {str(job.id): "self"}, project.id) is True
 
-        assert result is True
-
-    def test_simple_chain_no_cycle(self):
+    def test_simple_chain_no_cycle(self, pg_db, project, add_job):
         """Test simple dependency chain without cycle."""
-        mock_db = MagicMock()
-
-        # Job 1 -> Job 2 -> Job 3 (no cycle)
-        job1 = MagicMock()
-        job1.id = 1
-        job1.depends = {}
-
-        job2 = MagicMock()
-        job2.id = 2
-        job2.depends = {"1": "job1"}
+        job1 = add_job(project, "job1")
+        job2 = add_job(project, "job2", depends_on=[job1])
+        job3 = add_job(project, "job3", depends_on=[job2])
 
-        job3 = MagicMock()
-        job3.id = 3
-        job3.depends = {"2": "job2"}
+        # Adding a new job that depends on job3
+        assert detect_circular_dependency(pg_db, 0, {str(job3.id): "job3"}, project.id) is False
 
-        mock_db.query.return_value.filter.return_value.all.return_value = [job1, job2, job3]
+    def test_cycle_detected(self, pg_db, project, add_job):
+        """Test cycle is detected."""
+        job1 = add_job(project, "job1")
+        job2 = add_job(project, "job2", depends_on=[job1])
+        job3 = add_job(project, "job3", depends_on=[job2])
 
-        # Adding job4 that depends on job3
-        result = detect_circular_dependency(mock_db, 4, {"3": "job3"}, 1)
+        # Try to make job1 depend on job3 (creates cycle)
+        assert detect_circular_dependency(pg_db, job1.id, {str(job3.id): "job3"}, project.id) is True
 
-        assert result is False
+    def test_new_job_never_cycles(self, pg_db, project, add_job):
+        """Test a new job cannot close a cycle, whatever it depends on."""
+        job1 = add_job(project, "job1")
 
-    def test_cycle_detected(self):
-        """Test cycle is detected."""
-        mock_db = MagicMock()
+        assert detect_circular_dependency(pg_db, 0, {str(job1.id): "job1"}, project.id) is False
 
-        # Job 1 -> Job 2, and we want to add Job 2 -> Job 1 (cycle)
-        job1 = MagicMock()
-        job1.id = 1
-        job1.depends = {}
+    def test_unrelated_branch_no_cycle(self, pg_db, project, add_job):
+        """Test depending on a sibling branch is not a cycle."""
+        root = add_job(project, "root")
+        left = add_job(project, "left", depends_on=[root])
+        right = add_job(project, "right", depends_on=[root])
 
-        job2 = MagicMock()
-        job2.id = 2
-        job2.depends = {"1": "job1"}
+        assert detect_circular_dependency(pg_db, left.id, {str(right.id): "right"}, project.id) is False
 
-        mock_db.query.return_value.filter.return_value.all.return_value = [job1, job2]
+    def test_cycle_in_deep_chain(self, pg_db, project):
+        """Test cycles are found through chains deeper than Python's recursion limit."""
+        chain = [models.Job(name=f"chain-{i}", project_id=project.id, parameters={}) for i in range(1500)]
+        pg_db.add_all(chain)
+        pg_db.flush()
+        pg_db.execute(
+            insert(models.JobDependency),
+            [{"job_id": job.id, "depends_on_id": previous.id} for previous, job in zip(chain, chain[1:])],
+        )
 
-        # Try to make job1 depend on job2 (creates cycle)
-        result = detect_circular_dependency(mock_db, 1, {"2": "job2"}, 1)
-
-        assert result is True
+        assert detect_circular_dependency(pg_db, chain[0].id, {str(chain[-1].id): "last"}, project.id) is True
 
 
+@pytest.mark.integration
 class TestPropagateFailure:
     """Tests for propagate_failure function."""
 
-    def test_no_dependent_jobs(self):
+    def test_no_dependent_jobs(self, pg_db, project, add_job):
         """Test no jobs depend on failed job."""
-        mock_db = MagicMock()
-        failed_job = MagicMock()
-        failed_job.id = 1
-        failed_job.project_id = 1
-
-        mock_db.query.return_value.filter.return_value.all.return_value = []
-
-        result = propagate_failure(mock_db, failed_job)
-
-        assert result == 0
-
-    def test_blocks_dependent_jobs(self):
-        """Test dependent jobs are blocked."""
-        mock_db = MagicMock()
-        failed_job = MagicMock()
-        failed_job.id = 1
-        failed_job.project_id = 1
-
-        dependent_job = MagicMock()
-        dependent_job.id = 2
-        dependent_job.depends = {"1": "failed-job"}
-        dependent_job.status = JobStatus.PENDING
-
-        # First iteration finds dependent_job, second returns empty
-        mock_db.query.return_value.filter.return_value.all.side_effect = [[dependent_job], []]
-
-        result = propagate_failure(mock_db, failed_job)
-
-        assert result == 1
-        assert dependent_job.status == JobStatus.BLOCKED
-
-
-class TestGetJobsWithCompletedDependencies:
-    """Tests for get_jobs_with_completed_dependencies function."""
-
-    def test_no_pending_jobs(self):
-        """Test no pending jobs."""
-        mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = []
-
-        result = get_jobs_with_completed_dependencies(mock_db, 1)
-
-        assert result == []
-
-    def test_job_with_no_deps(self):
-        """Test job with no dependencies is returned."""
-        mock_db = MagicMock()
-
-        job = MagicMock()
-        job.depends = None
-        job.status = JobStatus.PENDING
-
-        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [job]
-
-        result = get_jobs_with_completed_dependencies(mock_db, 1)
-
-        assert job in result
-
-    def test_job_with_completed_deps(self):
-        """Test job with completed dependencies is returned."""
-        mock_db = MagicMock()
-
-        job = MagicMock()
-        job.depends = {"1": "prereq"}
-        job.status = JobStatus.PENDING
-
-        prereq = MagicMock()
-        prereq.status = JobStatus.COMPLETED
-
-        # For pending jobs query
-        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [job]
-        # For dependency check
-        mock_db.query.return_value.filter.return_value.all.return_value = [prereq]
-        # For failed dependency check
-        mock_db.query.return_value.filter.return_value.count.return_value = 0
-
-        result = get_jobs_with_completed_dependencies(mock_db, 1)
-
-        assert job in result
-
-    def test_job_with_resource_filtering(self):
-        """Test job filtering by resources."""
-        mock_db = MagicMock()
-
-        job = MagicMock()
-        job.depends = None
-        job.task_id = 1
-        job.status = JobStatus.PENDING
-
-        task = MagicMock()
-        task.required_cpu = 4
-        task.required_accelerators = 1
-
-        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [job]
-        mock_db.query.return_value.filter.return_value.first.return_value = task
-
-        # Client has 2 CPUs - not enough
-        result = get_jobs_with_completed_dependencies(mock_db, 1, available_cpu=2)
-
-        assert job not in result
-
-    def test_job_with_sufficient_resources(self):
-        """Test job passes resource filtering."""
-        mock_db = MagicMock()
-
-        job = MagicMock()
-        job.depends = None
-        job.task_id = 1
-        job.status = JobStatus.PENDING
-
-        task = MagicMock()
-        task.required_cpu = 4
-        task.required_accelerators = 1
-
-        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [job]
-        mock_db.query.return_value.filter.return_value.first.return_value = task
-
-        # Client has 8 CPUs - enough
-        result = get_jobs_with_completed_dependencies(mock_db, 1, available_cpu=8, available_accelerators=2)
-
-        assert job in result
-
-    def test_job_blocked_on_failed_dependency(self):
-        """Test job with failed dependency is blocked."""
-        mock_db = MagicMock()
-
-        job = MagicMock()
-        job.depends = {"1": "failed-job"}
-        job.status = JobStatus.PENDING
-
-        prereq = MagicMock()
-        prereq.status = JobStatus.FAILED
-
-        mock_db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [job]
-        mock_db.query.return_value.filter.return_value.all.return_value = [prereq]
-        mock_db.query.return_value.filter.return_value.count.return_value = 1
-
-        result = get_jobs_with_completed_dependencies(mock_db, 1)
+        failed = add_job(project, "failed", status=JobStatus.FAILED)
+
+        assert propagate_failure(pg_db, failed) == 0
+
+    def test_blocks_dependent_jobs(self, pg_db, project, add_job):
+        """Test direct and transitive dependents are blocked."""
+        failed = add_job(project, "failed", status=JobStatus.FAILED)
+        child = add_job(project, "child", depends_on=[failed])
+        grandchild = add_job(project, "grandchild", depends_on=[child])
+        unrelated = add_job(project, "unrelated")
+        pg_db.commit()
+
+        assert propagate_failure(pg_db, failed) == 2
+        pg_db.commit()
+
+        assert child.status == JobStatus.BLOCKED
+        assert grandchild.status == JobStatus.BLOCKED
+        assert unrelated.status == JobStatus.PENDING
+
+    def test_skips_non_pending_dependents(self, pg_db, project, add_job):
+        """Test dependents that already started are left alone."""
+        failed = add_job(project, "failed", status=JobStatus.FAILED)
+        running = add_job(project, "running", depends_on=[failed], status=JobStatus.RUNNING)
+        pg_db.commit()
+
+        assert propagate_failure(pg_db, failed) == 0
+        pg_db.commit()
+        assert running.status == JobStatus.RUNNING
+
+    def test_stops_at_non_pending_dependents(self, pg_db, project, add_job):
+        """Test blocking does not pass through a dependent that already started."""
+        failed = add_job(project, "failed", status=JobStatus.FAILED)
+        running = add_job(project, "running", depends_on=[failed], status=JobStatus.RUNNING)
+        downstream = add_job(project, "downstream", depends_on=[running])
+        pg_db.commit()
+
+        assert propagate_failure(pg_db, failed) == 0
+        pg_db.commit()
+        assert downstream.status == JobStatus.PENDING
+
+    def test_diamond_counts_each_job_once(self, pg_db, project, add_job):
+        """Test a job reachable along several paths is blocked and counted once."""
+        failed = add_job(project, "failed", status=JobStatus.FAILED)
+        left = add_job(project, "left", depends_on=[failed])
+        right = add_job(project, "right", depends_on=[failed])
+        join = add_job(project, "join", depends_on=[left, right])
+        pg_db.commit()
+
+        assert propagate_failure(pg_db, failed) == 3
+        pg_db.commit()
+        assert join.status == JobStatus.BLOCKED
+
+    def test_deep_chain(self, pg_db, project, add_job):
+        """Test a long chain of dependents is blocked in full."""
+        failed = add_job(project, "failed", status=JobStatus.FAILED)
+        previous = failed
+        for i in range(200):
+            previous = add_job(project, f"chain-{i}", depends_on=[previous])
+        pg_db.commit()
+
+        assert propagate_failure(pg_db, failed) == 200
+        pg_db.commit()
+        assert previous.status == JobStatus.BLOCKED
+
+    def test_update_onto_failed_dependency_blocks(self, pg_db, project, add_job):
+        """Test a job updated to depend on a failed job is blocked along with its dependents."""
+        failed = add_job(project, "failed", status=JobStatus.FAILED)
+        job = add_job(project, "job")
+        dependent = add_job(project, "dependent", depends_on=[job])
+        pg_db.commit()
+
+        update = schemas.JobUpdate(
+            name="job",
+            project_id=project.id,
+            task_id=project.task.id,
+            parameters={},
+            status="PENDING",
+            priority=0,
+            depends={str(failed.id): failed.name},
+        )
+        update_job(job.id, update, pg_db)
+        pg_db.refresh(job)
+        pg_db.refresh(dependent)
 
-        assert job not in result
         assert job.status == JobStatus.BLOCKED
+        assert dependent.status == JobStatus.BLOCKED
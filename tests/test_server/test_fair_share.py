@@ -0,0 +1,91 @@
+"""Tests for weighted fair sharing between projects."""
+
+import pytest
+from sqlalchemy import text, update
+
+from whatsnext.api.server import models
+from whatsnext.api.server.fair_share import claim_fair_share, get_usage, record_usage, share_order
+
+HALF_LIFE = 3600
+
+
+class TestShareOrder:
+    """Tests for share_order."""
+
+    def test_lowest_usage_per_weight_first(self):
+        """Test projects are ordered by consumption per unit of weight."""
+        assert share_order({1: 6.0, 2: 1.0, 3: 4.0}, {1: 3.0, 2: 1.0, 3: 1.0}) == [2, 1, 3]
+
+    def test_ties_prefer_larger_weight(self):
+        """Test equal consumption per weight goes to the larger weight first."""
+        assert share_order({1: 0.0, 2: 0.0}, {1: 1.0, 2: 2.0}) == [2, 1]
+
+    def test_ties_keep_request_order(self):
+        """Test fully tied projects keep the order they were listed in."""
+        assert share_order({5: 0.0, 3: 0.0, 4: 0.0}, {5: 1.0, 3: 1.0, 4: 1.0}) == [5, 3, 4]
+
+
+@pytest.mark.integration
+class TestClaimFairShare:
+    """Tests for claim_fair_share and the usage accounting."""
+
+    def test_usage_starts_at_zero(self, pg_db, make_project):
+        """Test projects that never consumed anything have no usage."""
+        project = make_project("fresh")
+
+        assert get_usage(pg_db, [project.id], HALF_LIFE) == {project.id: 0.0}
+
+    def test_record_usage_accumulates(self, pg_db, make_project):
+        """Test recorded consumption adds up."""
+        project = make_project("busy")
+
+        record_usage(pg_db, project.id, 1, HALF_LIFE)
+        record_usage(pg_db, project.id, 2, HALF_LIFE)
+
+        assert get_usage(pg_db, [project.id], HALF_LIFE)[project.id] == pytest.approx(3, rel=1e-3)
+
+    def test_usage_decays(self, pg_db, make_project):
+        """Test consumption recorded one half-life ago counts half."""
+        project = make_project("old")
+        record_usage(pg_db, project.id, 4, HALF_LIFE)
+        pg_db.execute(
+            update(models.ProjectUsage)
+            .where(models.ProjectUsage.project_id == project.id)
+            .values(updated_at=models.ProjectUsage.updated_at - text(f"interval '{HALF_LIFE} seconds'"))
+        )
+
+        assert get_usage(pg_db, [project.id], HALF_LIFE)[project.id] == pytest.approx(2, rel=1e-3)
+
+    def test_shares_follow_weights(self, pg_db, make_project, add_jobs):
+        """Test claims are split between projects in proportion to their weights."""
+        heavy = make_project("heavy")
+        light = make_project("light")
+        add_jobs(heavy, 20)
+        add_jobs(light, 20)
+        pg_db.commit()
+
+        claimed = [claim_fair_share(pg_db, {heavy.id: 3.0, light.id: 1.0}, HALF_LIFE).project_id for _ in range(12)]
+        pg_db.commit()
+
+        assert claimed.count(heavy.id) == 9
+        assert claimed.count(light.id) == 3
+
+    def test_idle_project_does_not_block(self, pg_db, make_project, add_jobs):
+        """Test a project without ready jobs is skipped."""
+        empty = make_project("empty")
+        busy = make_project("busy")
+        add_jobs(busy, 2)
+        pg_db.commit()
+
+        job = claim_fair_share(pg_db, {empty.id: 10.0, busy.id: 1.0}, HALF_LIFE)
+        pg_db.commit()
+
+        assert job.project_id == busy.id
+        assert get_usage(pg_db, [empty.id, busy.id], HALF_LIFE)[empty.id] == 0.0
+
+    def test_nothing_ready(self, pg_db, make_project):
+        """Test None is returned when no project has a ready job."""
+        project = make_project("none")
+        pg_db.commit()
+
+        assert claim_fair_share(pg_db, {project.id: 1.0}, HALF_LIFE) is None
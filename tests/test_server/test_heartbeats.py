@@ -0,0 +1,149 @@
+"""Tests for the client heartbeat buffer."""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from whatsnext.api.server import models
+from whatsnext.api.server.heartbeats import HeartbeatBuffer
+from whatsnext.api.server.models import JobStatus
+from whatsnext.api.server.scheduler import claim_next_job
+
+
+class TestHeartbeatBuffer:
+    """Tests for HeartbeatBuffer without a database."""
+
+    def test_empty_flush_writes_nothing(self):
+        """Test flushing an empty buffer issues no statement."""
+        db = MagicMock()
+
+        assert HeartbeatBuffer().flush(db) == 0
+        db.scalars.assert_not_called()
+        db.execute.assert_not_called()
+
+    @patch("whatsnext.api.server.heartbeats.renew_leases")
+    def test_heartbeats_coalesce(self, mock_renew):
+        """Test repeated heartbeats of a client are written once, with the latest time."""
+        buffer = HeartbeatBuffer()
+        db = MagicMock()
+        db.scalars.return_value = ["a", "b"]
+        for _ in range(3):
+            buffer.record("a")
+        buffer.record("b")
+
+        assert buffer.flush(db) == 2
+        db.scalars.assert_called_once()
+        (_, heartbeats), _ = mock_renew.call_args
+        assert set(heartbeats) == {"a", "b"}
+        assert buffer.flush(db) == 0
+
+    @patch("whatsnext.api.server.heartbeats.renew_leases")
+    def test_missing_clients_are_forgotten(self, mock_renew):
+        """Test a client no longer in the database is dropped from the known clients."""
+        buffer = HeartbeatBuffer()
+        buffer.add_known("gone")
+        buffer.add_known("alive")
+        buffer.record("gone")
+        buffer.record("alive")
+        db = MagicMock()
+        db.scalars.return_value = ["alive"]
+
+        assert buffer.flush(db) == 1
+        assert not buffer.is_known("gone")
+        assert buffer.is_known("alive")
+
+    def test_failed_flush_keeps_heartbeats(self):
+        """Test heartbeats are put back when writing them fails."""
+        buffer = HeartbeatBuffer()
+        buffer.record("a")
+        db = MagicMock()
+        db.scalars.side_effect = RuntimeError("connection lost")
+
+        with pytest.raises(RuntimeError):
+            buffer.flush(db)
+
+        db.scalars.side_effect = None
+        db.scalars.return_value = ["a"]
+        with patch("whatsnext.api.server.heartbeats.renew_leases"):
+            assert buffer.flush(db) == 1
+
+    @patch("whatsnext.api.server.heartbeats.renew_leases")
+    def test_failed_commit_keeps_heartbeats(self, mock_renew):
+        """Test heartbeats are put back when committing them fails."""
+        buffer = HeartbeatBuffer()
+        buffer.record("a")
+        db = MagicMock()
+        db.scalars.return_value = ["a"]
+        db.commit.side_effect = RuntimeError("connection lost")
+
+        with pytest.raises(RuntimeError):
+            buffer.flush(db)
+
+        db.commit.side_effect = None
+        assert buffer.flush(db) == 1
+        assert db.commit.call_count == 2
+
+    def test_forget_drops_pending_heartbeat(self):
+        """Test a deleted client's buffered heartbeat is not written."""
+        buffer = HeartbeatBuffer()
+        buffer.add_known("a")
+        buffer.record("a")
+        buffer.forget("a")
+
+        assert not buffer.is_known("a")
+        assert buffer.flush(MagicMock()) == 0
+
+    def test_stop_flushes(self):
+        """Test stopping the flush thread writes what is still buffered."""
+        buffer = HeartbeatBuffer()
+        db = MagicMock()
+        db.scalars.return_value = []
+        session_factory = MagicMock()
+        session_factory.return_value.__enter__.return_value = db
+
+        buffer.start(session_factory, interval=60)
+        assert buffer.running
+        buffer.record("a")
+        buffer.stop()
+
+        assert not buffer.running
+        db.scalars.assert_called_once()
+        db.commit.assert_called_once()
+
+
+@pytest.mark.integration
+class TestHeartbeatFlush:
+    """Tests for flushing heartbeats to PostgreSQL."""
+
+    def test_flush_updates_clients_and_leases(self, pg_db):
+        """Test one flush writes the heartbeats of all clients and renews their leases."""
+        project = models.Project(name="heartbeats", description="")
+        pg_db.add(project)
+        pg_db.flush()
+        task = models.Task(name="train", project_id=project.id)
+        pg_db.add(task)
+        pg_db.flush()
+        stale = datetime.now(timezone.utc) - timedelta(hours=1)
+        for client_id in ("worker-1", "worker-2"):
+            pg_db.add(models.Client(id=client_id, name=client_id, entity="team", last_heartbeat=stale))
+            pg_db.add(models.Job(name=client_id, project_id=project.id, task_id=task.id, parameters={}))
+        pg_db.commit()
+        jobs = [claim_next_job(pg_db, project.id, lease_owner=client_id) for client_id in ("worker-1", "worker-2")]
+        for job in jobs:
+            job.lease_expires_at = stale
+        pg_db.commit()
+
+        buffer = HeartbeatBuffer()
+        buffer.record("worker-1")
+        buffer.record("worker-2")
+        buffer.record("unknown")
+        assert buffer.flush(pg_db) == 2
+
+        for client in pg_db.query(models.Client).all():
+            pg_db.refresh(client)
+            assert client.last_heartbeat > stale
+        for job in jobs:
+            pg_db.refresh(job)
+            assert job.status == JobStatus.QUEUED
+            assert job.lease_expires_at > datetime.now(timezone.utc)
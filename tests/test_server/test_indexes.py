@@ -0,0 +1,142 @@
+"""Integration tests checking the planner uses the scheduler indexes on the jobs table."""
+
+import pytest
+from sqlalchemy import delete, func, insert, select, text
+
+from whatsnext.api.server import models
+from whatsnext.api.server.scheduler import claim_jobs
+
+pytestmark = pytest.mark.integration
+
+
+@pytest.fixture
+def jobs_table(pg_db):
+    """Two projects with a few thousand jobs in mixed states, analyzed, with sequential scans disabled."""
+    statuses = list(models.JobStatus)
+    for project_id in (1, 2):
+        pg_db.add(models.Project(id=project_id, name=f"p{project_id}", description=""))
+    pg_db.flush()
+    pg_db.execute(
+        insert(models.Job),
+        [
+            {
+                "name": f"job-{i}",
+                "project_id": 1 + i % 2,
+                "parameters": {},
+                "status": statuses[i % len(statuses)],
+                "priority": i % 10,
+            }
+            for i in range(4000)
+        ],
+    )
+    pg_db.commit()
+    pg_db.execute(text("ANALYZE jobs"))
+    pg_db.execute(text("SET LOCAL enable_seqscan = off"))
+    yield pg_db
+    pg_db.rollback()
+
+
+def _plan(db, stmt) -> str:
+    compiled = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    return "\n".join(db.execute(text(f"EXPLAIN {compiled}")).scalars())
+
+
+def test_claim_uses_pending_index(jobs_table):
+    """Test claiming scans the partial index of PENDING jobs."""
+    stmt = (
+        select(models.Job.id)
+        .where(
+            models.Job.project_id == 1,
+            models.Job.status == models.JobStatus.PENDING,
+            models.Job.unmet_dependencies == 0,
+        )
+        .order_by(models.Job.claim_rank.desc(), models.Job.id)
+        .limit(1)
+    )
+
+    plan = _plan(jobs_table, stmt)
+
+    assert "ix_jobs_pending" in plan
+    assert "Sort" not in plan
+
+
+# Both lead with the project and only reach its PENDING jobs; which one the
+# planner picks depends on their sizes
+PENDING_INDEXES = ("ix_jobs_pending", "ix_jobs_project_status_priority")
+
+
+def test_pending_count_uses_pending_index(jobs_table):
+    """Test counting a project's pending jobs reads an index of its pending jobs."""
+    stmt = select(func.count()).where(models.Job.project_id == 1, models.Job.status == models.JobStatus.PENDING)
+
+    plan = _plan(jobs_table, stmt)
+
+    assert any(index in plan for index in PENDING_INDEXES)
+
+
+def test_clear_queue_uses_pending_index(jobs_table):
+    """Test clearing a queue finds its jobs through an index of the project's pending jobs."""
+    stmt = delete(models.Job).where(models.Job.project_id == 1, models.Job.status == models.JobStatus.PENDING)
+
+    plan = _plan(jobs_table, stmt)
+
+    assert any(index in plan for index in PENDING_INDEXES)
+
+
+def test_status_listing_uses_project_status_priority_index(jobs_table):
+    """Test listing a project's jobs of one status in priority order needs no sort."""
+    stmt = (
+        select(models.Job.id)
+        .where(models.Job.project_id == 1, models.Job.status == models.JobStatus.RUNNING)
+        .order_by(models.Job.priority.desc(), models.Job.id)
+        .limit(10)
+    )
+
+    plan = _plan(jobs_table, stmt)
+
+    assert "ix_jobs_project_status_priority" in plan
+    assert "Sort" not in plan
+
+
+def test_project_listing_uses_project_index(jobs_table):
+    """Test get_jobs filtered by project uses a project_id-leading index."""
+    stmt = select(models.Job).where(models.Job.project_id == 1).limit(10)
+
+    assert "ix_jobs_project_" in _plan(jobs_table, stmt)
+
+
+def test_project_page_reads_index_order(jobs_table):
+    """Test a deep keyset page of a project's jobs is read in index order, without sorting.
+
+    Either ``ix_jobs_project_id_id`` or the primary key can serve the page,
+    depending on the statistics, so the test does not name the index.
+    """
+    stmt = select(models.Job.id).where(models.Job.project_id == 1, models.Job.id > 3000).order_by(models.Job.id).limit(10)
+
+    plan = _plan(jobs_table, stmt)
+
+    assert "Index" in plan
+    assert "Sort" not in plan
+    # Project 1 holds the odd IDs (IDs start at 1)
+    assert jobs_table.scalars(stmt).all() == list(range(3001, 3021, 2))
+
+
+def test_recent_changes_use_updated_at_index(jobs_table):
+    """Test recently updated jobs of a project are read from the updated_at index."""
+    stmt = select(models.Job.id).where(models.Job.project_id == 1).order_by(models.Job.updated_at.desc()).limit(10)
+
+    plan = _plan(jobs_table, stmt)
+
+    assert "ix_jobs_project_updated_at" in plan
+    assert "Sort" not in plan
+
+
+def test_claim_sets_updated_at(jobs_table):
+    """Test status changes move updated_at, which the updated_at index relies on."""
+    before = jobs_table.scalar(select(func.max(models.Job.updated_at)))
+    jobs_table.execute(text("SELECT pg_sleep(0.01)"))
+    jobs_table.commit()
+
+    job = claim_jobs(jobs_table, 1, 1)[0]
+
+    assert job.updated_at > before
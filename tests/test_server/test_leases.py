@@ -0,0 +1,180 @@
+"""Integration tests for job leases and the lease reaper."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from whatsnext.api.server.database import SessionLocal
+from whatsnext.api.server.leases import LeaseReaper, reap_expired_leases, renew_leases
+from whatsnext.api.server.models import JobStatus
+from whatsnext.api.server.scheduler import claim_next_job
+
+pytestmark = pytest.mark.integration
+
+
+def _expire(db, job):
+    job.lease_expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    db.commit()
+
+
+class TestLeases:
+    """Tests for taking and renewing leases."""
+
+    def test_claim_takes_lease(self, pg_db, project, add_job):
+        """Test a claim for a client leases the job to it and counts the attempt."""
+        add_job(project, "job")
+        pg_db.commit()
+
+        job = claim_next_job(pg_db, project.id, lease_owner="worker-1")
+        pg_db.commit()
+        pg_db.refresh(job)
+
+        assert job.lease_owner == "worker-1"
+        assert job.lease_expires_at > datetime.now(timezone.utc)
+        assert job.attempts == 1
+
+    def test_anonymous_claim_has_no_lease(self, pg_db, project, add_job):
+        """Test a claim without a client takes no lease."""
+        add_job(project, "job")
+        pg_db.commit()
+
+        job = claim_next_job(pg_db, project.id)
+        pg_db.commit()
+        pg_db.refresh(job)
+
+        assert job.lease_owner is None
+        assert job.lease_expires_at is None
+        assert job.attempts == 1
+
+    def test_renew_extends_own_leases(self, pg_db, project, add_job):
+        """Test renewing only extends the leases of the given client."""
+        add_job(project, "mine")
+        add_job(project, "theirs")
+        pg_db.commit()
+        mine = claim_next_job(pg_db, project.id, lease_owner="worker-1")
+        theirs = claim_next_job(pg_db, project.id, lease_owner="worker-2")
+        pg_db.commit()
+        _expire(pg_db, mine)
+        _expire(pg_db, theirs)
+
+        assert renew_leases(pg_db, {"worker-1": datetime.now(timezone.utc)}) == 1
+        pg_db.commit()
+        pg_db.refresh(mine)
+        pg_db.refresh(theirs)
+
+        assert mine.lease_expires_at > datetime.now(timezone.utc)
+        assert theirs.lease_expires_at < datetime.now(timezone.utc)
+
+
+class TestReapExpiredLeases:
+    """Tests for reap_expired_leases."""
+
+    def test_requeues_expired_jobs(self, pg_db, project, add_job):
+        """Test jobs with an expired lease go back to PENDING and can be claimed again."""
+        add_job(project, "lost")
+        add_job(project, "alive")
+        pg_db.commit()
+        lost = claim_next_job(pg_db, project.id, lease_owner="dead-worker")
+        alive = claim_next_job(pg_db, project.id, lease_owner="live-worker")
+        pg_db.commit()
+        _expire(pg_db, lost)
+
+        assert reap_expired_leases(pg_db, max_attempts=3) == (1, 0)
+        pg_db.commit()
+        pg_db.refresh(lost)
+        pg_db.refresh(alive)
+
+        assert lost.status == JobStatus.PENDING
+        assert lost.lease_owner is None
+        assert alive.status == JobStatus.QUEUED
+        assert claim_next_job(pg_db, project.id, lease_owner="live-worker").id == lost.id
+
+    def test_fails_after_max_attempts(self, pg_db, project, add_job):
+        """Test a job whose lease expired on its last attempt fails and blocks its dependents."""
+        job = add_job(project, "crashy")
+        dependent = add_job(project, "dependent", depends_on=[job])
+        pg_db.commit()
+
+        for attempt in range(2):
+            assert claim_next_job(pg_db, project.id, lease_owner="worker").id == job.id
+            pg_db.commit()
+            _expire(pg_db, job)
+            reap_expired_leases(pg_db, max_attempts=2)
+            pg_db.commit()
+        pg_db.refresh(job)
+        pg_db.refresh(dependent)
+
+        assert job.status == JobStatus.FAILED
+        assert job.attempts == 2
+        assert dependent.status == JobStatus.BLOCKED
+
+    def test_unlimited_attempts(self, pg_db, project, add_job):
+        """Test max_attempts=0 always requeues."""
+        job = add_job(project, "job")
+        job.attempts = 100
+        pg_db.commit()
+        claim_next_job(pg_db, project.id, lease_owner="worker")
+        pg_db.commit()
+        _expire(pg_db, job)
+
+        assert reap_expired_leases(pg_db, max_attempts=0) == (1, 0)
+
+    def test_reaper_thread_session(self, pg_db, project, add_job):
+        """Test the reaper reaps and commits in its own session."""
+        job = add_job(project, "job")
+        pg_db.commit()
+        claim_next_job(pg_db, project.id, lease_owner="worker")
+        pg_db.commit()
+        _expire(pg_db, job)
+
+        assert LeaseReaper(SessionLocal, interval=60, max_attempts=3).reap() == (1, 0)
+        pg_db.refresh(job)
+        assert job.status == JobStatus.PENDING
+
+
+class TestReleaseJob:
+    """Tests for returning claimed jobs through POST /jobs/{id}/release."""
+
+    @pytest.fixture
+    def api(self, pg_db):
+        from fastapi.testclient import TestClient
+
+        from whatsnext.api.server.database import get_db
+        from whatsnext.api.server.main import app
+
+        app.dependency_overrides[get_db] = lambda: pg_db
+        yield TestClient(app)
+        app.dependency_overrides.clear()
+
+    def test_release_requeues_claimed_job(self, api, pg_db, project, add_job):
+        """Test a released job is PENDING again, without lease or counted attempt."""
+        job = add_job(project, "job")
+        pg_db.commit()
+        claim_next_job(pg_db, project.id, lease_owner="worker")
+        pg_db.commit()
+
+        response = api.post(f"/jobs/{job.id}/release")
+
+        assert response.status_code == 200
+        assert response.json()["id"] == job.id
+        pg_db.refresh(job)
+        assert job.status == JobStatus.PENDING
+        assert job.lease_owner is None
+        assert job.lease_expires_at is None
+        assert job.attempts == 0
+        assert claim_next_job(pg_db, project.id).id == job.id
+
+    def test_release_started_job_conflicts(self, api, pg_db, project, add_job):
+        """Test only QUEUED jobs can be released."""
+        job = add_job(project, "job", status=JobStatus.RUNNING)
+        pg_db.commit()
+
+        response = api.post(f"/jobs/{job.id}/release")
+
+        assert response.status_code == 409
+        pg_db.refresh(job)
+        assert job.status == JobStatus.RUNNING
+
+    def test_release_missing_job(self, api):
+        """Test releasing an unknown job is a 404."""
+        assert api.post("/jobs/999/release").status_code == 404
@@ -1,8 +1,7 @@
 """Tests for server middleware."""
 
 import asyncio
-import time
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
 import pytest
 
@@ -86,121 +85,132 @@ class TestGetApiKeyDependency:
         assert exc_info.value.status_code == 403
 
 
+class _App:
+    """ASGI app answering 200 and counting the requests it receives."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"response"})
+
+
+def _request(middleware, path="/protected", headers=None, client=("127.0.0.1", 50000)):
+    """Send one HTTP request through an ASGI middleware; return the response status and headers."""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": client,
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = sent[0]
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}
+
+
 class TestRateLimitMiddleware:
     """Tests for RateLimitMiddleware."""
 
     def test_init(self):
         """Test middleware initialization."""
-        mock_app = MagicMock()
+        middleware = RateLimitMiddleware(_App(), requests_per_minute=100)
 
-        middleware = RateLimitMiddleware(mock_app, requests_per_minute=100)
-
-        assert middleware.requests_per_minute == 100
-        assert middleware.window_size == 60
+        assert middleware.limits.default.limit == 100
+        assert middleware.limits.default.window == 60
 
     def test_get_client_ip_from_client(self):
-        """Test getting client IP from request.client."""
-        mock_app = MagicMock()
-        middleware = RateLimitMiddleware(mock_app)
-
-        mock_request = MagicMock()
-        mock_request.headers.get.return_value = None
-        mock_request.client.host = "192.168.1.1"
+        """Test getting client IP from the scope's client."""
+        middleware = RateLimitMiddleware(_App())
 
-        ip = middleware._get_client_ip(mock_request)
+        ip = middleware._get_client_ip({"type": "http", "headers": [], "client": ("192.168.1.1", 50000)})
 
         assert ip == "192.168.1.1"
 
     def test_get_client_ip_from_forwarded(self):
         """Test getting client IP from X-Forwarded-For."""
-        mock_app = MagicMock()
-        middleware = RateLimitMiddleware(mock_app)
-
-        mock_request = MagicMock()
-        mock_request.headers.get.return_value = "10.0.0.1, 192.168.1.1"
+        middleware = RateLimitMiddleware(_App())
 
-        ip = middleware._get_client_ip(mock_request)
+        scope = {"type": "http", "headers": [(b"x-forwarded-for", b"10.0.0.1, 192.168.1.1")], "client": ("127.0.0.1", 1)}
+        ip = middleware._get_client_ip(scope)
 
         assert ip == "10.0.0.1"
 
     def test_get_client_ip_unknown(self):
         """Test getting client IP when no info available."""
-        mock_app = MagicMock()
-        middleware = RateLimitMiddleware(mock_app)
+        middleware = RateLimitMiddleware(_App())
 
-        mock_request = MagicMock()
-        mock_request.headers.get.return_value = None
-        mock_request.client = None
-
-        ip = middleware._get_client_ip(mock_request)
+        ip = middleware._get_client_ip({"type": "http", "headers": [], "client": None})
 
         assert ip == "unknown"
 
-    def test_clean_old_requests(self):
-        """Test cleaning old request timestamps."""
-        mock_app = MagicMock()
-        middleware = RateLimitMiddleware(mock_app)
-
-        current_time = time.time()
-        middleware.request_times["127.0.0.1"] = [
-            current_time - 100,  # old, should be removed
-            current_time - 30,  # recent, should stay
-            current_time - 10,  # recent, should stay
-        ]
-
-        middleware._clean_old_requests("127.0.0.1", current_time)
-
-        assert len(middleware.request_times["127.0.0.1"]) == 2
-
-    def test_dispatch_rate_limit_disabled(self):
-        """Test dispatch when rate limiting is disabled."""
-        mock_app = MagicMock()
-        middleware = RateLimitMiddleware(mock_app, requests_per_minute=0)
-
-        mock_request = MagicMock()
+    def test_rate_limit_disabled(self):
+        """Test requests pass when rate limiting is disabled."""
+        app = _App()
+        middleware = RateLimitMiddleware(app, requests_per_minute=0)
 
-        async def mock_call_next(req):
-            return "response"
+        assert all(_request(middleware)[0] == 200 for _ in range(10))
+        assert app.calls == 10
 
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
+    def test_under_limit(self):
+        """Test requests under the rate limit reach the app."""
+        app = _App()
+        middleware = RateLimitMiddleware(app, requests_per_minute=100)
 
-        assert result == "response"
+        status, _ = _request(middleware)
 
-    def test_dispatch_under_limit(self):
-        """Test dispatch when under rate limit."""
-        mock_app = MagicMock()
-        middleware = RateLimitMiddleware(mock_app, requests_per_minute=100)
+        assert status == 200
+        assert app.calls == 1
 
-        mock_request = MagicMock()
-        mock_request.headers.get.return_value = None
-        mock_request.client.host = "127.0.0.1"
+    def test_over_limit(self):
+        """Test requests over the rate limit are answered 429 without reaching the app."""
+        app = _App()
+        middleware = RateLimitMiddleware(app, requests_per_minute=2)
 
-        async def mock_call_next(req):
-            return "response"
+        assert _request(middleware)[0] == 200
+        assert _request(middleware)[0] == 200
+        status, headers = _request(middleware)
 
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
+        assert status == 429
+        assert int(headers["retry-after"]) >= 1
+        assert app.calls == 2
 
-        assert result == "response"
+    def test_route_limits(self):
+        """Test route rules get their own limit and a limit of 0 exempts a route."""
+        middleware = RateLimitMiddleware(
+            _App(),
+            requests_per_minute=1,
+            route_limits=[("/clients/*/heartbeat", 0), ("/projects/*/fetch_job", 3)],
+        )
 
-    def test_dispatch_over_limit(self):
-        """Test dispatch when over rate limit."""
-        mock_app = MagicMock()
-        middleware = RateLimitMiddleware(mock_app, requests_per_minute=2)
+        assert all(_request(middleware, "/clients/w1/heartbeat")[0] == 200 for _ in range(10))
+        assert all(_request(middleware, "/projects/1/fetch_job")[0] == 200 for _ in range(3))
+        assert _request(middleware, "/projects/1/fetch_job")[0] == 429
+        assert _request(middleware, "/jobs/")[0] == 200
+        assert _request(middleware, "/jobs/")[0] == 429
 
-        mock_request = MagicMock()
-        mock_request.headers.get.return_value = None
-        mock_request.client.host = "127.0.0.1"
+    def test_non_http_passes(self):
+        """Test lifespan and other non-HTTP scopes go straight to the app."""
+        received = []
 
-        # Pre-fill request times to exceed limit
-        current_time = time.time()
-        middleware.request_times["127.0.0.1"] = [current_time, current_time]
+        async def app(scope, receive, send):
+            received.append(scope["type"])
 
-        async def mock_call_next(req):
-            return "response"
+        middleware = RateLimitMiddleware(app, requests_per_minute=1)
+        asyncio.run(middleware({"type": "lifespan"}, None, None))
 
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
-
-        assert result.status_code == 429
+        assert received == ["lifespan"]
 
 
 class TestAuthenticationMiddleware:
@@ -208,9 +218,7 @@ class TestAuthenticationMiddleware:
 
     def test_init(self):
         """Test middleware initialization."""
-        mock_app = MagicMock()
-
-        middleware = AuthenticationMiddleware(mock_app, api_keys=["key1"])
+        middleware = AuthenticationMiddleware(_App(), api_keys=["key1"])
 
         assert middleware.api_keys == ["key1"]
         assert "/" in middleware.excluded_paths
@@ -218,86 +226,44 @@ class TestAuthenticationMiddleware:
 
     def test_init_custom_excluded_paths(self):
         """Test middleware with custom excluded paths."""
-        mock_app = MagicMock()
-
-        middleware = AuthenticationMiddleware(mock_app, api_keys=["key1"], excluded_paths=["/custom"])
+        middleware = AuthenticationMiddleware(_App(), api_keys=["key1"], excluded_paths=["/custom"])
 
         assert middleware.excluded_paths == ["/custom"]
 
-    def test_dispatch_excluded_path(self):
-        """Test dispatch skips excluded paths."""
-        mock_app = MagicMock()
-        middleware = AuthenticationMiddleware(mock_app, api_keys=["key1"])
-
-        mock_request = MagicMock()
-        mock_request.url.path = "/"
-
-        async def mock_call_next(req):
-            return "response"
-
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
-
-        assert result == "response"
-
-    def test_dispatch_no_api_keys(self):
-        """Test dispatch when no API keys configured."""
-        mock_app = MagicMock()
-        middleware = AuthenticationMiddleware(mock_app, api_keys=[])
-
-        mock_request = MagicMock()
-        mock_request.url.path = "/protected"
-
-        async def mock_call_next(req):
-            return "response"
-
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
-
-        assert result == "response"
-
-    def test_dispatch_missing_key(self):
-        """Test dispatch when API key is missing."""
-        mock_app = MagicMock()
-        middleware = AuthenticationMiddleware(mock_app, api_keys=["valid-key"])
-
-        mock_request = MagicMock()
-        mock_request.url.path = "/protected"
-        mock_request.headers.get.return_value = None
-
-        async def mock_call_next(req):
-            return "response"
-
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
-
-        assert result.status_code == 401
-
-    def test_dispatch_invalid_key(self):
-        """Test dispatch when API key is invalid."""
-        mock_app = MagicMock()
-        middleware = AuthenticationMiddleware(mock_app, api_keys=["valid-key"])
+    def test_excluded_path(self):
+        """Test excluded paths need no API key."""
+        middleware = AuthenticationMiddleware(_App(), api_keys=["key1"])
 
-        mock_request = MagicMock()
-        mock_request.url.path = "/protected"
-        mock_request.headers.get.return_value = "wrong-key"
+        assert _request(middleware, "/")[0] == 200
 
-        async def mock_call_next(req):
-            return "response"
+    def test_no_api_keys(self):
+        """Test requests pass when no API keys are configured."""
+        middleware = AuthenticationMiddleware(_App(), api_keys=[])
 
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
+        assert _request(middleware)[0] == 200
 
-        assert result.status_code == 403
+    def test_missing_key(self):
+        """Test a request without API key is answered 401."""
+        app = _App()
+        middleware = AuthenticationMiddleware(app, api_keys=["valid-key"])
 
-    def test_dispatch_valid_key(self):
-        """Test dispatch when API key is valid."""
-        mock_app = MagicMock()
-        middleware = AuthenticationMiddleware(mock_app, api_keys=["valid-key"])
+        assert _request(middleware)[0] == 401
+        assert app.calls == 0
 
-        mock_request = MagicMock()
-        mock_request.url.path = "/protected"
-        mock_request.headers.get.return_value = "valid-key"
+    def test_invalid_key(self):
+        """Test a request with a wrong API key is answered 403."""
+        app = _App()
+        middleware = AuthenticationMiddleware(app, api_keys=["valid-key"])
 
-        async def mock_call_next(req):
-            return "response"
+        assert _request(middleware, headers={"X-API-Key": "wrong-key"})[0] == 403
+        assert _request(middleware, headers={"X-API-Key": "valid-ke"})[0] == 403
+        assert app.calls == 0
 
-        result = asyncio.run(middleware.dispatch(mock_request, mock_call_next))
+    def test_valid_key(self):
+        """Test a request with any of the valid API keys reaches the app."""
+        app = _App()
+        middleware = AuthenticationMiddleware(app, api_keys=["key1", "valid-key"])
 
-        assert result == "response"
+        assert _request(middleware, headers={"X-API-Key": "valid-key"})[0] == 200
+        assert _request(middleware, headers={"X-API-Key": "key1"})[0] == 200
+        assert app.calls == 2
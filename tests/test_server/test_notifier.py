@@ -0,0 +1,166 @@
+"""Tests for the long-poll job notifier."""
+
+import asyncio
+import threading
+
+import pytest
+
+from whatsnext.api.server.notifier import JobNotifier, PostgresListener, announce, notifier
+
+
+class TestJobNotifier:
+    """Tests for JobNotifier."""
+
+    def test_wait_times_out(self):
+        """Test waiting without a notification returns False."""
+        notifier = JobNotifier()
+
+        async def wait():
+            with notifier.subscribe(1) as subscription:
+                return await subscription.wait(0.05)
+
+        assert asyncio.run(wait()) is False
+
+    def test_notify_from_thread_wakes_waiter(self):
+        """Test a notification sent from another thread wakes the waiter."""
+        notifier = JobNotifier()
+
+        async def wait():
+            with notifier.subscribe(1) as subscription:
+                threading.Timer(0.05, notifier.notify, args=(1,)).start()
+                return await subscription.wait(5)
+
+        assert asyncio.run(wait()) is True
+
+    def test_notification_before_wait_is_kept(self):
+        """Test a notification between subscribing and waiting is not lost."""
+        notifier = JobNotifier()
+
+        async def wait():
+            with notifier.subscribe(1) as subscription:
+                notifier.notify(1)
+                return await subscription.wait(5)
+
+        assert asyncio.run(wait()) is True
+
+    def test_other_projects_not_woken(self):
+        """Test notifications are scoped to their project."""
+        notifier = JobNotifier()
+
+        async def wait():
+            with notifier.subscribe(1) as subscription:
+                notifier.notify(2)
+                return await subscription.wait(0.05)
+
+        assert asyncio.run(wait()) is False
+
+    def test_multi_project_subscription(self):
+        """Test a subscription to several projects wakes on any of them and unsubscribes from all."""
+        notifier = JobNotifier()
+
+        async def wait():
+            with notifier.subscribe(1, 2) as subscription:
+                notifier.notify(2)
+                woken = await subscription.wait(5)
+            return woken, notifier._subscriptions
+
+        assert asyncio.run(wait()) == (True, {})
+
+    def test_callbacks_receive_project(self):
+        """Test registered callbacks run on every notification."""
+        notifier = JobNotifier()
+        received = []
+        notifier.add_callback(received.append)
+
+        notifier.notify(3)
+        notifier.notify(None)
+
+        assert received == [3, None]
+
+    def test_unsubscribe_on_exit(self):
+        """Test subscriptions are removed when the context exits."""
+        notifier = JobNotifier()
+
+        async def subscribe():
+            with notifier.subscribe(1):
+                assert notifier._subscriptions
+            assert not notifier._subscriptions
+
+        asyncio.run(subscribe())
+
+
+class TestPostgresListenerDispatch:
+    """Tests for PostgresListener payload handling."""
+
+    def test_dispatches_other_instances(self):
+        """Test announcements from other processes are forwarded."""
+        job_notifier = JobNotifier()
+        received = []
+        job_notifier.add_callback(received.append)
+        listener = PostgresListener("", job_notifier=job_notifier, instance_id="me")
+
+        listener._dispatch("5:other")
+        listener._dispatch("6:me")
+        listener._dispatch("garbage:other")
+
+        assert received == [5]
+
+
+@pytest.fixture
+def change_feed(pg_db):
+    """A listener on the test database acting as another server process."""
+    from whatsnext.api.server.database import SQLALCHEMY_DATABASE_URL
+
+    job_notifier = JobNotifier()
+    received = []
+    arrived = threading.Event()
+
+    def record(project_id):
+        received.append(project_id)
+        arrived.set()
+
+    job_notifier.add_callback(record)
+    listener = PostgresListener(SQLALCHEMY_DATABASE_URL, job_notifier=job_notifier, instance_id="other-process", poll_timeout=0.1)
+    listener.start()
+    assert listener.wait_until_listening(5)
+    yield received, arrived
+    listener.stop()
+
+
+@pytest.mark.integration
+class TestPostgresChangeFeed:
+    """Tests for announce and PostgresListener against PostgreSQL."""
+
+    def test_commit_reaches_other_process(self, pg_db, change_feed):
+        """Test an announcement is delivered to other processes on commit."""
+        received, arrived = change_feed
+
+        announce(pg_db, 7)
+        pg_db.commit()
+
+        assert arrived.wait(5)
+        assert received == [7]
+
+    def test_rollback_sends_nothing(self, pg_db, change_feed):
+        """Test announcements of rolled back transactions are dropped."""
+        received, arrived = change_feed
+
+        announce(pg_db, 8)
+        pg_db.rollback()
+        announce(pg_db, 9)
+        pg_db.commit()
+
+        assert arrived.wait(5)
+        assert received == [9]
+
+    def test_commit_notifies_this_process(self, pg_db):
+        """Test the local notifier is told once the session commits."""
+        received = []
+        notifier.add_callback(received.append)
+        try:
+            announce(pg_db, 4)
+            assert received == []
+            pg_db.commit()
+            assert received == [4]
+        finally:
+            notifier._callbacks.remove(received.append)
@@ -0,0 +1,139 @@
+"""Tests for keyset pagination."""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+
+from whatsnext.api.server import models
+from whatsnext.api.server.pagination import after, decode_cursor, encode_cursor, keyset_page
+
+ID_ORDER = [(models.Job.id, False)]
+PRIORITY_ORDER = [(models.Job.priority, True), (models.Job.id, False)]
+UPDATED_ORDER = [(models.Job.updated_at, True), (models.Job.id, False)]
+
+
+class TestCursor:
+    """Tests for encoding and decoding cursors."""
+
+    def test_round_trip(self):
+        """Test a cursor decodes to the sort key it was made from."""
+        assert decode_cursor(encode_cursor([5, 123]), PRIORITY_ORDER) == [5, 123]
+        assert decode_cursor(encode_cursor(["worker-1"]), [(models.Client.id, False)]) == ["worker-1"]
+
+    def test_timestamp_round_trip(self):
+        """Test timestamps are encoded as ISO 8601 strings and decoded back."""
+        updated_at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+        assert decode_cursor(encode_cursor([updated_at, 7]), UPDATED_ORDER) == [updated_at, 7]
+
+    def test_cursor_is_url_safe(self):
+        """Test cursors need no escaping in a query string."""
+        cursor = encode_cursor(["a/b+c?d=e&f", 10**12])
+
+        assert cursor.replace("-", "").replace("_", "").isalnum()
+
+    @pytest.mark.parametrize(
+        "cursor, keys",
+        [
+            ("", ID_ORDER),
+            ("!!!", ID_ORDER),
+            (encode_cursor({"id": 1}), ID_ORDER),
+            (encode_cursor([1, 2]), ID_ORDER),
+            (encode_cursor(["id"]), ID_ORDER),
+            (encode_cursor([1.5]), ID_ORDER),
+            (encode_cursor([True]), ID_ORDER),
+            (encode_cursor([None]), ID_ORDER),
+            (encode_cursor([5, "42"]), PRIORITY_ORDER),
+            (encode_cursor([1]), [(models.Client.id, False)]),
+            (encode_cursor(["yesterday", 1]), UPDATED_ORDER),
+            (encode_cursor([0, 1]), UPDATED_ORDER),
+        ],
+        ids=[
+            "empty",
+            "not-base64",
+            "not-a-list",
+            "too-long",
+            "string-id",
+            "float-id",
+            "bool-id",
+            "null-id",
+            "string-in-second-key",
+            "int-client-id",
+            "bad-timestamp",
+            "int-timestamp",
+        ],
+    )
+    def test_invalid_cursor(self, cursor, keys):
+        """Test malformed cursors, cursors of another sort key and values of the wrong type are rejected with 400."""
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(cursor, keys)
+
+        assert error.value.status_code == 400
+
+
+class TestAfter:
+    """Tests for the keyset condition."""
+
+    def _sql(self, clause):
+        return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    def test_single_key(self):
+        """Test a single ascending key is a plain comparison."""
+        assert self._sql(after([(models.Job.id, False)], [42])) == "jobs.id > 42"
+
+    def test_mixed_directions(self):
+        """Test priority descending then ID ascending, with the index bound on priority."""
+        sql = self._sql(after(PRIORITY_ORDER, [5, 42]))
+
+        assert sql == "jobs.priority <= 5 AND (jobs.priority < 5 OR jobs.priority = 5 AND jobs.id > 42)"
+
+
+@pytest.mark.integration
+class TestKeysetPage:
+    """Tests for paging through jobs in PostgreSQL."""
+
+    @pytest.fixture
+    def project(self, pg_db):
+        project = models.Project(name="pages", description="")
+        pg_db.add(project)
+        pg_db.flush()
+        pg_db.execute(
+            insert(models.Job),
+            [{"name": f"job-{i}", "project_id": project.id, "parameters": {}, "priority": i % 3} for i in range(25)],
+        )
+        pg_db.commit()
+        return project
+
+    def _all_pages(self, db, project, keys, limit):
+        query = db.query(models.Job).filter(models.Job.project_id == project.id)
+        rows, cursor = keyset_page(query, keys, limit)
+        pages = [rows]
+        while cursor is not None:
+            rows, cursor = keyset_page(query, keys, limit, cursor=cursor)
+            pages.append(rows)
+        return pages
+
+    def test_pages_by_id(self, pg_db, project):
+        """Test paging by ID returns every job once, in order, and ends without a cursor."""
+        pages = self._all_pages(pg_db, project, [(models.Job.id, False)], 10)
+
+        assert [len(page) for page in pages] == [10, 10, 5]
+        ids = [job.id for page in pages for job in page]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == 25
+
+    def test_pages_by_priority(self, pg_db, project):
+        """Test paging by priority matches a single ordered query across page boundaries."""
+        pages = self._all_pages(pg_db, project, PRIORITY_ORDER, 4)
+
+        expected = pg_db.query(models.Job.id).filter(models.Job.project_id == project.id).order_by(models.Job.priority.desc(), models.Job.id)
+        assert [job.id for page in pages for job in page] == [row.id for row in expected]
+
+    def test_exact_last_page_has_no_cursor(self, pg_db, project):
+        """Test a page ending exactly at the last row sends no cursor."""
+        pages = self._all_pages(pg_db, project, [(models.Job.id, False)], 25)
+
+        assert [len(page) for page in pages] == [25]
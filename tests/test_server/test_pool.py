@@ -0,0 +1,57 @@
+"""Tests for connection pool instrumentation."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from whatsnext.api.server.pool import PoolMetrics, instrumented_pool
+
+
+@pytest.fixture
+def metrics():
+    return PoolMetrics()
+
+
+@pytest.fixture
+def pool(metrics):
+    """A pool of one connection plus one overflow connection to a fake database."""
+    return instrumented_pool(QueuePool, metrics)(MagicMock, pool_size=1, max_overflow=1, timeout=0.05)
+
+
+class TestInstrumentedPool:
+    """Tests for checkout timing and counting."""
+
+    def test_counts_checkouts_and_overflow(self, pool, metrics):
+        """Test checkouts beyond pool_size are counted as overflow."""
+        first = pool.connect()
+        second = pool.connect()
+
+        assert metrics.checkouts == 2
+        assert metrics.overflow_checkouts == 1
+        stats = metrics.snapshot(pool)
+        assert stats["size"] == 1
+        assert stats["checked_out"] == 2
+        assert stats["overflow"] == 1
+        first.close()
+        second.close()
+        assert metrics.snapshot(pool)["checked_out"] == 0
+
+    def test_counts_timeouts(self, pool, metrics):
+        """Test a checkout from an exhausted pool is counted as a timeout with its wait."""
+        held = [pool.connect(), pool.connect()]
+
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+
+        assert metrics.timeouts == 1
+        assert metrics.wait_max >= 0.05
+        for connection in held:
+            connection.close()
+
+    def test_metrics_survive_recreate(self, pool, metrics):
+        """Test a recreated pool, e.g. after engine.dispose(), keeps recording."""
+        pool.recreate().connect().close()
+
+        assert metrics.checkouts == 1
@@ -0,0 +1,122 @@
+"""Tests for the sliding window rate limiter."""
+
+import pytest
+
+from whatsnext.api.server.config import Settings
+from whatsnext.api.server.ratelimit import RouteLimits, SlidingWindowLimiter, retry_after_seconds
+
+
+class TestSlidingWindowLimiter:
+    """Tests for SlidingWindowLimiter."""
+
+    def test_allows_up_to_limit(self):
+        """Test a key gets exactly ``limit`` requests in one window."""
+        limiter = SlidingWindowLimiter(3, window=60)
+
+        assert [limiter.hit("a", now=t) for t in (0, 1, 2)] == [0, 0, 0]
+        assert limiter.hit("a", now=3) > 0
+
+    def test_keys_are_independent(self):
+        """Test one key's requests do not count against another key."""
+        limiter = SlidingWindowLimiter(1, window=60)
+
+        assert limiter.hit("a", now=0) == 0
+        assert limiter.hit("b", now=0) == 0
+        assert limiter.hit("a", now=1) > 0
+
+    def test_rejected_requests_are_not_counted(self):
+        """Test requests over the limit do not extend the wait."""
+        limiter = SlidingWindowLimiter(2, window=60)
+        limiter.hit("a", now=0)
+        limiter.hit("a", now=0)
+
+        first = limiter.hit("a", now=10)
+        for _ in range(100):
+            limiter.hit("a", now=10)
+
+        assert limiter.hit("a", now=10) == first
+
+    def test_previous_window_slides_out(self):
+        """Test the previous slot counts in proportion to its overlap with the window."""
+        limiter = SlidingWindowLimiter(10, window=60)
+        for _ in range(10):
+            assert limiter.hit("a", now=0) == 0
+
+        # Half of the previous slot is still in the window: 5 of its requests count
+        assert [limiter.hit("a", now=90) for _ in range(5)] == [0] * 5
+        assert limiter.hit("a", now=90) > 0
+
+    def test_retry_after_is_when_room_returns(self):
+        """Test the returned wait is when the next request would be allowed."""
+        limiter = SlidingWindowLimiter(10, window=60)
+        for _ in range(10):
+            limiter.hit("a", now=0)
+
+        wait = limiter.hit("a", now=30)
+
+        assert limiter.hit("a", now=30 + wait - 0.5) > 0
+        assert limiter.hit("a", now=30 + wait + 0.01) == 0
+
+    def test_idle_keys_are_evicted(self):
+        """Test keys unseen for two windows are forgotten."""
+        limiter = SlidingWindowLimiter(5, window=60)
+        limiter.hit("idle", now=0)
+        limiter.hit("busy", now=100)
+
+        limiter.hit("busy", now=130)
+
+        assert len(limiter) == 1
+
+    def test_key_count_is_bounded(self):
+        """Test the least recently seen key is dropped beyond ``max_keys``."""
+        limiter = SlidingWindowLimiter(1, window=60, max_keys=2)
+        limiter.hit("a", now=0)
+        limiter.hit("b", now=0)
+        limiter.hit("c", now=0)
+
+        assert len(limiter) == 2
+        assert limiter.hit("a", now=1) == 0
+        assert limiter.hit("c", now=1) > 0
+
+
+class TestRouteLimits:
+    """Tests for choosing the limiter of a path."""
+
+    def test_first_matching_rule_wins(self):
+        """Test rules match one path segment per ``*`` and fall back to the default."""
+        limits = RouteLimits(60, [("/clients/*/heartbeat", 600), ("/clients/*", 0)])
+
+        assert limits.limiter_for("/clients/w1/heartbeat").limit == 600
+        assert limits.limiter_for("/clients/w1") is None
+        assert limits.limiter_for("/clients/w1/x/heartbeat") is limits.default
+        assert limits.limiter_for("/projects/") is limits.default
+
+    def test_default_disabled(self):
+        """Test paths matching no rule are unlimited without a default limit."""
+        limits = RouteLimits(0, [("/jobs/", 10)])
+
+        assert limits.limiter_for("/projects/") is None
+        assert limits.limiter_for("/jobs/").limit == 10
+
+
+def test_retry_after_seconds():
+    """Test waits round up to whole seconds, at least one."""
+    assert retry_after_seconds(0.2) == 1
+    assert retry_after_seconds(1.5) == 2
+    assert retry_after_seconds(30) == 30
+
+
+class TestRateLimitRoutesSetting:
+    """Tests for parsing the rate_limit_routes setting."""
+
+    def test_parse(self):
+        """Test rules are parsed in order."""
+        settings = Settings(rate_limit_routes=" /clients/*/heartbeat=600, /projects/*/fetch_job=0 ,")
+
+        assert settings.get_rate_limit_routes() == [("/clients/*/heartbeat", 600), ("/projects/*/fetch_job", 0)]
+
+    @pytest.mark.parametrize("rule", ["/jobs/", "/jobs/=many", "=5"])
+    def test_invalid_rule(self, rule):
+        """Test malformed rules are rejected."""
+        with pytest.raises(ValueError):
+            Settings(rate_limit_routes=rule).get_rate_limit_routes()
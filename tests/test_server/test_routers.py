@@ -1,14 +1,20 @@
 """Tests for server routers using FastAPI TestClient with mocked database."""
 
+import threading
+import time
 from datetime import datetime
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import exc
 
 from whatsnext.api.server import models
-from whatsnext.api.server.database import get_db
+from whatsnext.api.server.database import AsyncSessionRunner, get_db, get_session_runner
+from whatsnext.api.server.heartbeats import HeartbeatBuffer
 from whatsnext.api.server.main import app
+from whatsnext.api.server.notifier import notifier
+from whatsnext.api.server.summary import summary_cache
 
 
 # Create a mock database session
@@ -18,14 +24,26 @@ def mock_db():
     return MagicMock()
 
 
-@pytest.fixture
-def client(mock_db):
-    """Create a test client with mocked database."""
+class AsyncSessionStub:
+    """Stands in for an AsyncSession, running work on the mocked session like ``run_sync``."""
+
+    def __init__(self, sync_session):
+        self.sync_session = sync_session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.sync_session, *args, **kwargs)
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, mock_db):
+    """Create a test client with mocked database, in sync and in async database mode."""
 
     def override_get_db():
         return mock_db
 
     app.dependency_overrides[get_db] = override_get_db
+    if request.param == "async":
+        app.dependency_overrides[get_session_runner] = lambda: AsyncSessionRunner(AsyncSessionStub(mock_db))
     yield TestClient(app)
     app.dependency_overrides.clear()
 
@@ -42,6 +60,7 @@ class TestProjectRoutes:
         mock_project.status = models.ProjectStatus.ACTIVE
         mock_project.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_project.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_project.priority_aging = 0.0
 
         mock_db.query.return_value.filter.return_value.first.return_value = mock_project
 
@@ -69,6 +88,7 @@ class TestProjectRoutes:
         mock_project.status = models.ProjectStatus.ACTIVE
         mock_project.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_project.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_project.priority_aging = 0.0
 
         mock_db.query.return_value.filter.return_value.first.return_value = mock_project
 
@@ -84,6 +104,39 @@ class TestProjectRoutes:
 
         assert response.status_code == 404
 
+    @patch("whatsnext.api.server.routers.projects.count_pending_by_priority")
+    @patch("whatsnext.api.server.routers.projects.count_jobs_by_task")
+    @patch("whatsnext.api.server.routers.projects.get_job_counts")
+    def test_get_project_stats(self, mock_counts, mock_by_task, mock_by_priority, client, mock_db):
+        """Test the stats of a project combine the counts by status, task and priority band."""
+        mock_db.query.return_value.filter.return_value.first.return_value = MagicMock(id=1)
+        mock_counts.return_value = {**dict.fromkeys(models.JobStatus, 0), models.JobStatus.PENDING: 3, models.JobStatus.COMPLETED: 2}
+        mock_by_task.return_value = [(7, "train", 4), (None, None, 1)]
+        mock_by_priority.return_value = ([(20, 1), (-5, 2)], 90.5)
+
+        response = client.get("/projects/1/stats?band_width=5")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 5
+        assert data["by_status"]["PENDING"] == 3
+        assert data["by_status"]["RUNNING"] == 0
+        assert data["by_task"] == [{"task_id": 7, "task_name": "train", "n": 4}, {"task_id": None, "task_name": None, "n": 1}]
+        assert data["pending_by_priority"] == [
+            {"min_priority": 20, "max_priority": 24, "n": 1},
+            {"min_priority": -5, "max_priority": -1, "n": 2},
+        ]
+        assert data["oldest_pending_age"] == 90.5
+        mock_by_priority.assert_called_once_with(mock_db, 1, 5)
+
+    def test_get_project_stats_not_found(self, client, mock_db):
+        """Test the stats of a non-existent project."""
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+
+        response = client.get("/projects/999/stats")
+
+        assert response.status_code == 404
+
     def test_list_projects(self, client, mock_db):
         """Test listing projects."""
         mock_project1 = MagicMock()
@@ -93,8 +146,9 @@ class TestProjectRoutes:
         mock_project1.status = models.ProjectStatus.ACTIVE
         mock_project1.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_project1.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_project1.priority_aging = 0.0
 
-        mock_db.query.return_value.filter.return_value.limit.return_value.offset.return_value.all.return_value = [mock_project1]
+        mock_db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_project1]
 
         response = client.get("/projects/")
 
@@ -139,6 +193,15 @@ class TestProjectRoutes:
         response = client.put("/projects/1", json={"name": "updated", "description": "Updated desc", "status": "ACTIVE"})
 
         assert response.status_code == 200
+        # Fields left out, such as priority_aging, keep their value
+        expected = {"name": "updated", "description": "Updated desc", "status": "active"}
+        mock_query.update.assert_called_once_with(expected, synchronize_session=False)
+
+    def test_create_project_negative_aging(self, client, mock_db):
+        """Test priority aging cannot be negative."""
+        response = client.post("/projects/", json={"name": "new-project", "priority_aging": -1})
+
+        assert response.status_code == 422
 
     def test_update_project_not_found(self, client, mock_db):
         """Test updating a non-existent project."""
@@ -233,11 +296,11 @@ class TestProjectRoutes:
 
         assert response.status_code == 404
 
-    @patch("whatsnext.api.server.routers.projects.get_jobs_with_completed_dependencies")
-    def test_fetch_job_empty(self, mock_get_jobs, client, mock_db):
+    @patch("whatsnext.api.server.routers.projects.claim_next_job")
+    def test_fetch_job_empty(self, mock_claim, client, mock_db):
         """Test fetching job when queue is empty."""
-        mock_get_jobs.return_value = []
-        mock_db.query.return_value.filter.return_value.filter.return_value.count.return_value = 0
+        mock_claim.return_value = None
+        mock_db.scalar.return_value = 0
 
         response = client.get("/projects/1/fetch_job")
 
@@ -245,9 +308,10 @@ class TestProjectRoutes:
         data = response.json()
         assert data["job"] is None
         assert data["num_pending"] == 0
+        mock_db.commit.assert_called_once()
 
-    @patch("whatsnext.api.server.routers.projects.get_jobs_with_completed_dependencies")
-    def test_fetch_job_success(self, mock_get_jobs, client, mock_db):
+    @patch("whatsnext.api.server.routers.projects.claim_next_job")
+    def test_fetch_job_success(self, mock_claim, client, mock_db):
         """Test fetching a job successfully."""
         mock_job = MagicMock()
         mock_job.id = 1
@@ -255,37 +319,152 @@ class TestProjectRoutes:
         mock_job.project_id = 1
         mock_job.task_id = 1
         mock_job.parameters = {}
-        mock_job.status = models.JobStatus.PENDING
+        mock_job.status = models.JobStatus.QUEUED
         mock_job.priority = 0
         mock_job.depends = {}
         mock_job.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_job.task_name = "train"
 
-        mock_task = MagicMock()
-        mock_task.name = "train"
-
-        mock_get_jobs.return_value = [mock_job]
-        mock_db.query.return_value.filter.return_value.filter.return_value.count.return_value = 1
-        mock_db.query.return_value.filter.return_value.first.return_value = mock_task
-        mock_db.query.return_value.filter.return_value.update.return_value = 1
+        mock_claim.return_value = mock_job
+        mock_db.scalar.return_value = 1
 
         response = client.get("/projects/1/fetch_job")
 
         assert response.status_code == 200
+        data = response.json()
+        assert data["job"]["id"] == 1
+        assert data["job"]["task_name"] == "train"
+        assert data["num_pending"] == 1
+        mock_db.commit.assert_called_once()
+
+    @patch("whatsnext.api.server.routers.projects.claim_next_job")
+    def test_fetch_job_passes_resources(self, mock_claim, client, mock_db):
+        """Test resource filters are forwarded to the claim."""
+        mock_claim.return_value = None
+        mock_db.scalar.return_value = 0
+
+        client.get("/projects/1/fetch_job?available_cpu=4&available_accelerators=2")
+
+        mock_claim.assert_called_once_with(mock_db, 1, available_cpu=4, available_accelerators=2, lease_owner=None)
+
+    @patch("whatsnext.api.server.routers.projects.claim_next_job")
+    def test_fetch_job_leases_to_client(self, mock_claim, client, mock_db):
+        """Test a claim made for a client is leased to it."""
+        mock_claim.return_value = None
+        mock_db.scalar.return_value = 0
+
+        client.get("/projects/1/fetch_job?client_id=worker-1")
+
+        mock_claim.assert_called_once_with(mock_db, 1, available_cpu=0, available_accelerators=0, lease_owner="worker-1")
+
+    @patch("whatsnext.api.server.routers.projects.claim_next_job")
+    def test_fetch_job_wait_returns_when_notified(self, mock_claim, client, mock_db):
+        """Test a long-polling fetch returns as soon as a job is announced."""
+        mock_job = MagicMock()
+        mock_job.id = 1
+        mock_job.name = "test-job"
+        mock_job.project_id = 1
+        mock_job.task_id = 1
+        mock_job.parameters = {}
+        mock_job.created_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_job.task_name = "train"
+
+        mock_claim.side_effect = [None, mock_job]
+        mock_db.scalar.return_value = 1
+
+        threading.Timer(0.2, notifier.notify, args=(1,)).start()
+        started = time.monotonic()
+        response = client.get("/projects/1/fetch_job?wait=10")
+
+        assert response.status_code == 200
+        assert response.json()["job"]["id"] == 1
+        assert time.monotonic() - started < 5
+        assert mock_claim.call_count == 2
+        # Each attempt commits, so no connection is held while waiting
+        assert mock_db.commit.call_count == 2
+
+    @patch("whatsnext.api.server.routers.projects.claim_next_job")
+    def test_fetch_job_wait_times_out(self, mock_claim, client, mock_db):
+        """Test a long-polling fetch returns an empty result after the timeout."""
+        mock_claim.return_value = None
+        mock_db.scalar.return_value = 0
+
+        started = time.monotonic()
+        response = client.get("/projects/1/fetch_job?wait=0.2")
+
+        assert response.status_code == 200
+        assert response.json()["job"] is None
+        assert time.monotonic() - started >= 0.2
+
+    @patch("whatsnext.api.server.notifier.settings")
+    @patch("whatsnext.api.server.routers.projects.claim_next_job")
+    def test_fetch_job_wait_capped(self, mock_claim, mock_settings, client, mock_db):
+        """Test waits above the configured maximum are shortened to it."""
+        mock_settings.max_fetch_wait = 0.1
+        mock_claim.return_value = None
+        mock_db.scalar.return_value = 0
+
+        started = time.monotonic()
+        response = client.get("/projects/1/fetch_job?wait=100000")
+
+        assert response.status_code == 200
+        assert time.monotonic() - started < 5
+
+    @patch("whatsnext.api.server.routers.projects.claim_jobs")
+    def test_fetch_jobs_success(self, mock_claim, client, mock_db):
+        """Test fetching several jobs in one request."""
+        mock_jobs = []
+        for i in range(2):
+            mock_job = MagicMock()
+            mock_job.id = i + 1
+            mock_job.name = f"job-{i}"
+            mock_job.project_id = 1
+            mock_job.task_id = 1
+            mock_job.parameters = {}
+            mock_job.created_at = datetime(2024, 1, 1, 0, 0, 0)
+            mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+            mock_job.task_name = "train"
+            mock_jobs.append(mock_job)
+
+        mock_claim.return_value = mock_jobs
+        mock_db.scalar.return_value = 5
+
+        response = client.get("/projects/1/fetch_jobs?max=2&available_cpu=4")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [job["id"] for job in data["jobs"]] == [1, 2]
+        assert all(job["task_name"] == "train" for job in data["jobs"])
+        assert data["num_pending"] == 5
+        mock_claim.assert_called_once_with(mock_db, 1, 2, available_cpu=4, available_accelerators=0, lease_owner=None, sequential=False)
+        mock_db.commit.assert_called_once()
+
+    @patch("whatsnext.api.server.routers.projects.claim_jobs")
+    def test_fetch_jobs_empty(self, mock_claim, client, mock_db):
+        """Test fetching several jobs when none is ready."""
+        mock_claim.return_value = []
+        mock_db.scalar.return_value = 0
 
-    def test_add_jobs_batch(self, client, mock_db):
+        response = client.get("/projects/1/fetch_jobs")
+
+        assert response.status_code == 200
+        assert response.json() == {"jobs": [], "num_pending": 0}
+
+    def test_fetch_jobs_invalid_max(self, client, mock_db):
+        """Test max must be between 1 and the server limit."""
+        assert client.get("/projects/1/fetch_jobs?max=0").status_code == 422
+        assert client.get("/projects/1/fetch_jobs?max=100000").status_code == 422
+
+    @patch("whatsnext.api.server.routers.projects.insert_jobs")
+    def test_add_jobs_batch(self, mock_insert, client, mock_db):
         """Test adding batch of jobs."""
         mock_project = MagicMock()
         mock_project.id = 1
         mock_db.query.return_value.filter.return_value.first.return_value = mock_project
-
-        job_id_counter = [0]
-
-        def add_side_effect(obj):
-            job_id_counter[0] += 1
-            obj.id = job_id_counter[0]
-
-        mock_db.add.side_effect = add_side_effect
+        mock_db.scalars.return_value = [1]
+        mock_insert.return_value = [1, 2]
 
         response = client.post(
             "/projects/1/jobs/batch",
@@ -298,6 +477,24 @@ class TestProjectRoutes:
         )
 
         assert response.status_code == 201
+        assert response.json() == {"created": 2, "job_ids": [1, 2]}
+        mock_db.commit.assert_called_once()
+
+    def test_add_jobs_batch_unknown_task(self, client, mock_db):
+        """Test a batch referring to a task of another project is rejected."""
+        mock_project = MagicMock()
+        mock_project.id = 1
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_project
+        mock_db.scalars.return_value = [1]
+
+        response = client.post(
+            "/projects/1/jobs/batch",
+            json={"jobs": [{"name": "job1", "task_id": 1, "parameters": {}}, {"name": "job2", "task_id": 7, "parameters": {}}]},
+        )
+
+        assert response.status_code == 400
+        assert "[7]" in response.json()["detail"]
+        mock_db.commit.assert_not_called()
 
     def test_add_jobs_batch_project_not_found(self, client, mock_db):
         """Test adding batch to non-existent project."""
@@ -308,6 +505,92 @@ class TestProjectRoutes:
         assert response.status_code == 404
 
 
+class TestSchedulingRoutes:
+    """Tests for the cross-project fetch route."""
+
+    @patch("whatsnext.api.server.routers.scheduling.claim_fair_share")
+    def test_fetch_job_success(self, mock_claim, client, mock_db):
+        """Test fetching a job from several projects with weights."""
+        mock_job = MagicMock()
+        mock_job.id = 7
+        mock_job.name = "test-job"
+        mock_job.project_id = 2
+        mock_job.task_id = 1
+        mock_job.parameters = {}
+        mock_job.created_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_job.task_name = "train"
+        mock_claim.return_value = mock_job
+        mock_db.scalar.return_value = 5
+
+        response = client.get("/fetch_job?project_id=1&weight=3&project_id=2&weight=1&available_cpu=4")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["job"]["id"] == 7
+        assert data["num_pending"] == 5
+        mock_claim.assert_called_once_with(mock_db, {1: 3.0, 2: 1.0}, ANY, available_cpu=4, available_accelerators=0, lease_owner=None)
+        mock_db.commit.assert_called_once()
+
+    @patch("whatsnext.api.server.routers.scheduling.claim_fair_share")
+    def test_fetch_job_default_weights(self, mock_claim, client, mock_db):
+        """Test projects without weights share equally."""
+        mock_claim.return_value = None
+        mock_db.scalar.return_value = 0
+
+        response = client.get("/fetch_job?project_id=1&project_id=2")
+
+        assert response.status_code == 200
+        assert response.json()["job"] is None
+        mock_claim.assert_called_once_with(mock_db, {1: 1.0, 2: 1.0}, ANY, available_cpu=0, available_accelerators=0, lease_owner=None)
+
+    @patch("whatsnext.api.server.routers.scheduling.claim_fair_share")
+    def test_fetch_job_wait_wakes_on_any_project(self, mock_claim, client, mock_db):
+        """Test a long poll over several projects wakes when any of them is announced."""
+        mock_job = MagicMock()
+        mock_job.id = 1
+        mock_job.name = "test-job"
+        mock_job.project_id = 2
+        mock_job.task_id = 1
+        mock_job.parameters = {}
+        mock_job.created_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+        mock_job.task_name = "train"
+
+        mock_claim.side_effect = [None, mock_job]
+        mock_db.scalar.return_value = 1
+
+        threading.Timer(0.2, notifier.notify, args=(2,)).start()
+        started = time.monotonic()
+        response = client.get("/fetch_job?project_id=1&project_id=2&wait=10")
+
+        assert response.status_code == 200
+        assert response.json()["job"]["project_id"] == 2
+        assert time.monotonic() - started < 5
+        assert mock_claim.call_count == 2
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "project_id=1&project_id=1",
+            "project_id=1&project_id=2&weight=1",
+            "project_id=1&weight=0",
+            "project_id=1&weight=-2",
+        ],
+        ids=["duplicate-project", "weight-count", "zero-weight", "negative-weight"],
+    )
+    def test_fetch_job_invalid_shares(self, query, client, mock_db):
+        """Test invalid project and weight lists are rejected."""
+        response = client.get(f"/fetch_job?{query}")
+
+        assert response.status_code == 400
+        mock_db.commit.assert_not_called()
+
+    def test_fetch_job_requires_project(self, client, mock_db):
+        """Test at least one project is required."""
+        assert client.get("/fetch_job").status_code == 422
+
+
 class TestJobRoutes:
     """Tests for job routes."""
 
@@ -355,7 +638,7 @@ class TestJobRoutes:
         mock_job.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
 
-        mock_db.query.return_value.filter.return_value.limit.return_value.offset.return_value.all.return_value = [mock_job]
+        mock_db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_job]
 
         response = client.get("/jobs/?project_id=1")
 
@@ -375,11 +658,55 @@ class TestJobRoutes:
         mock_job.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
 
-        mock_db.query.return_value.limit.return_value.offset.return_value.all.return_value = [mock_job]
+        mock_db.query.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_job]
 
         response = client.get("/jobs/")
 
         assert response.status_code == 200
+        assert [job["id"] for job in response.json()] == [1]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_list_jobs_next_cursor(self, client, mock_db):
+        """Test a full page sends the cursor of the next page and the next page filters after it."""
+        jobs = []
+        for job_id in (1, 2, 3):
+            job = MagicMock()
+            job.id = job_id
+            job.name = f"job{job_id}"
+            job.project_id = 1
+            job.task_id = 1
+            job.parameters = {}
+            job.status = models.JobStatus.PENDING
+            job.priority = 5
+            job.depends = {}
+            job.created_at = datetime(2024, 1, 1, 0, 0, 0)
+            job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
+            jobs.append(job)
+        mock_db.query.return_value.order_by.return_value.limit.return_value.all.return_value = jobs
+
+        response = client.get("/jobs/?limit=2&order=priority")
+
+        assert response.status_code == 200
+        assert [job["id"] for job in response.json()] == [1, 2]
+        cursor = response.headers["X-Next-Cursor"]
+        mock_db.query.return_value.order_by.return_value.limit.assert_called_with(3)
+
+        mock_db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = jobs[2:]
+        response = client.get(f"/jobs/?limit=2&order=priority&cursor={cursor}")
+
+        assert [job["id"] for job in response.json()] == [3]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_list_jobs_invalid_cursor(self, client, mock_db):
+        """Test a malformed cursor, or one of another sort order, is rejected."""
+        response = client.get("/jobs/?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+        response = client.get("/jobs/?cursor=WzUsMl0")  # [5,2], a priority cursor
+        assert response.status_code == 400
+
+        response = client.get("/jobs/?cursor=WyJpZCJd")  # ["id"], a string where the ID goes
+        assert response.status_code == 400
 
     @patch("whatsnext.api.server.routers.jobs.validate_project_exists")
     @patch("whatsnext.api.server.routers.jobs.validate_task_in_project_exists")
@@ -418,8 +745,9 @@ class TestJobRoutes:
 
     @patch("whatsnext.api.server.routers.jobs.validate_project_exists")
     @patch("whatsnext.api.server.routers.jobs.validate_task_in_project_exists")
+    @patch("whatsnext.api.server.routers.jobs.validate_dependencies_exist")
     @patch("whatsnext.api.server.routers.jobs.detect_circular_dependency")
-    def test_create_job_circular_dep(self, mock_detect, mock_validate_task, mock_validate_project, client, mock_db):
+    def test_create_job_circular_dep(self, mock_detect, mock_validate_deps, mock_validate_task, mock_validate_project, client, mock_db):
         """Test creating a job with circular dependency."""
         mock_validate_project.return_value = MagicMock()
         mock_validate_task.return_value = MagicMock()
@@ -453,7 +781,7 @@ class TestJobRoutes:
         mock_job.status = models.JobStatus.PENDING
 
         mock_query = MagicMock()
-        mock_query.first.return_value = mock_job
+        mock_query.with_for_update.return_value.first.return_value = mock_job
         mock_db.query.return_value.filter.return_value = mock_query
 
         response = client.put(
@@ -462,6 +790,58 @@ class TestJobRoutes:
         )
 
         assert response.status_code == 200
+        # A running job keeps its lease
+        assert "lease_owner" not in mock_query.update.call_args[0][0]
+
+    @patch("whatsnext.api.server.routers.jobs.validate_project_exists")
+    @patch("whatsnext.api.server.routers.jobs.detect_circular_dependency")
+    def test_update_job_finished_drops_lease(self, mock_detect, mock_validate_project, client, mock_db):
+        """Test a job leaving QUEUED/RUNNING drops its lease."""
+        mock_validate_project.return_value = MagicMock()
+        mock_detect.return_value = False
+
+        mock_job = MagicMock()
+        mock_job.id = 1
+        mock_job.status = models.JobStatus.RUNNING
+
+        mock_query = MagicMock()
+        mock_query.with_for_update.return_value.first.return_value = mock_job
+        mock_db.query.return_value.filter.return_value = mock_query
+
+        response = client.put(
+            "/jobs/1",
+            json={"name": "job", "project_id": 1, "task_id": 1, "parameters": {}, "status": "COMPLETED", "priority": 0, "depends": {}},
+        )
+
+        assert response.status_code == 200
+        values = mock_query.update.call_args[0][0]
+        assert values["lease_owner"] is None
+        assert values["lease_expires_at"] is None
+
+    @patch("whatsnext.api.server.routers.jobs.propagate_failure")
+    @patch("whatsnext.api.server.routers.jobs.has_failed_dependency")
+    @patch("whatsnext.api.server.routers.jobs.validate_project_exists")
+    def test_update_job_with_failed_dependency(self, mock_validate_project, mock_has_failed, mock_propagate, client, mock_db):
+        """Test a PENDING job depending on a failed job is stored as BLOCKED and blocks its dependents."""
+        mock_validate_project.return_value = MagicMock()
+        mock_has_failed.return_value = True
+
+        mock_job = MagicMock()
+        mock_job.id = 1
+        mock_job.status = models.JobStatus.FAILED
+
+        mock_query = MagicMock()
+        mock_query.with_for_update.return_value.first.return_value = mock_job
+        mock_db.query.return_value.filter.return_value = mock_query
+
+        response = client.put(
+            "/jobs/1",
+            json={"name": "job", "project_id": 1, "task_id": 1, "parameters": {}, "status": "PENDING", "priority": 0, "depends": {}},
+        )
+
+        assert response.status_code == 200
+        assert mock_query.update.call_args[0][0]["status"] == models.JobStatus.BLOCKED
+        mock_propagate.assert_called_once_with(mock_db, mock_job)
 
     @patch("whatsnext.api.server.routers.jobs.validate_project_exists")
     def test_update_job_not_found(self, mock_validate_project, client, mock_db):
@@ -469,7 +849,7 @@ class TestJobRoutes:
         mock_validate_project.return_value = MagicMock()
 
         mock_query = MagicMock()
-        mock_query.first.return_value = None
+        mock_query.with_for_update.return_value.first.return_value = None
         mock_db.query.return_value.filter.return_value = mock_query
 
         response = client.put(
@@ -479,10 +859,11 @@ class TestJobRoutes:
 
         assert response.status_code == 404
 
+    @patch("whatsnext.api.server.routers.jobs.propagate_failure")
     @patch("whatsnext.api.server.routers.jobs.validate_project_exists")
     @patch("whatsnext.api.server.routers.jobs.detect_circular_dependency")
-    def test_update_job_to_failed_status(self, mock_detect, mock_validate_project, client, mock_db):
-        """Test updating a job to FAILED status."""
+    def test_update_job_to_failed_status(self, mock_detect, mock_validate_project, mock_propagate, client, mock_db):
+        """Test updating a job to FAILED status blocks its dependents before the one commit."""
         mock_validate_project.return_value = MagicMock()
         mock_detect.return_value = False
 
@@ -499,9 +880,11 @@ class TestJobRoutes:
         mock_job.updated_at = datetime(2024, 1, 1, 0, 0, 0)
 
         mock_query = MagicMock()
-        mock_query.first.return_value = mock_job
+        mock_query.with_for_update.return_value.first.return_value = mock_job
         mock_query.update.return_value = 1
         mock_db.query.return_value.filter.return_value = mock_query
+        # Dependents are blocked before the status change is committed
+        mock_propagate.side_effect = lambda db, failed_job: db.commit.assert_not_called()
 
         response = client.put(
             "/jobs/1",
@@ -509,6 +892,8 @@ class TestJobRoutes:
         )
 
         assert response.status_code == 200
+        mock_propagate.assert_called_once_with(mock_db, mock_job)
+        mock_db.commit.assert_called_once()
 
     @patch("whatsnext.api.server.routers.jobs.get_dependency_ids")
     @patch("whatsnext.api.server.routers.jobs.are_dependencies_completed")
@@ -663,7 +1048,7 @@ class TestTaskRoutes:
         mock_task.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_task.updated_at = datetime(2024, 1, 1, 0, 0, 0)
 
-        mock_db.query.return_value.filter.return_value.limit.return_value.offset.return_value.all.return_value = [mock_task]
+        mock_db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_task]
 
         response = client.get("/tasks/?project_id=1")
 
@@ -776,11 +1161,12 @@ class TestClientRoutes:
         mock_client.created_at = datetime(2024, 1, 1, 0, 0, 0)
         mock_client.last_heartbeat = datetime(2024, 1, 1, 0, 0, 0)
 
-        mock_db.query.return_value.limit.return_value.offset.return_value.all.return_value = [mock_client]
+        mock_db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [mock_client]
 
         response = client.get("/clients/")
 
         assert response.status_code == 200
+        assert [c["id"] for c in response.json()] == ["client-1"]
 
     def test_register_client(self, client, mock_db):
         """Test registering a client."""
@@ -856,18 +1242,39 @@ class TestClientRoutes:
 
         assert response.status_code == 404
 
-    def test_client_heartbeat(self, client, mock_db):
-        """Test client heartbeat."""
+    @patch("whatsnext.api.server.heartbeats.renew_leases")
+    @patch("whatsnext.api.server.routers.clients.heartbeat_buffer", new_callable=HeartbeatBuffer)
+    def test_client_heartbeat(self, buffer, mock_renew, client, mock_db):
+        """Test client heartbeat without a flush thread is written and renews the leases of its jobs."""
         mock_client_obj = MagicMock()
         mock_query = MagicMock()
         mock_query.first.return_value = mock_client_obj
         mock_db.query.return_value.filter.return_value = mock_query
+        mock_db.scalars.return_value = ["client-123"]
+
+        response = client.post("/clients/client-123/heartbeat")
+
+        assert response.status_code == 200
+        mock_renew.assert_called_once_with(mock_db, {"client-123": ANY})
+        mock_db.commit.assert_called_once()
+        assert buffer.is_known("client-123")
+
+    @patch("whatsnext.api.server.routers.clients.heartbeat_buffer")
+    def test_client_heartbeat_buffered(self, buffer, client, mock_db):
+        """Test heartbeat of a known client is only buffered while the flush thread runs."""
+        buffer.is_known.return_value = True
+        buffer.running = True
 
         response = client.post("/clients/client-123/heartbeat")
 
         assert response.status_code == 200
+        buffer.record.assert_called_once_with("client-123")
+        buffer.flush.assert_not_called()
+        mock_db.query.assert_not_called()
+        mock_db.commit.assert_not_called()
 
-    def test_client_heartbeat_not_found(self, client, mock_db):
+    @patch("whatsnext.api.server.routers.clients.heartbeat_buffer", new_callable=HeartbeatBuffer)
+    def test_client_heartbeat_not_found(self, buffer, client, mock_db):
         """Test heartbeat for non-existent client."""
         mock_query = MagicMock()
         mock_query.first.return_value = None
@@ -876,6 +1283,7 @@ class TestClientRoutes:
         response = client.post("/clients/nonexistent/heartbeat")
 
         assert response.status_code == 404
+        assert not buffer.is_known("nonexistent")
 
     def test_deactivate_client(self, client, mock_db):
         """Test deactivating a client."""
@@ -897,3 +1305,90 @@ class TestClientRoutes:
         response = client.post("/clients/nonexistent/deactivate")
 
         assert response.status_code == 404
+
+
+class TestPoolRoutes:
+    """Tests for connection pool reporting and exhaustion."""
+
+    def test_pool_metrics(self, client):
+        """Test the pool metrics report the sync pool."""
+        response = client.get("/metrics/pool")
+
+        assert response.status_code == 200
+        stats = response.json()["sync"]
+        assert {"checkouts", "overflow_checkouts", "timeouts", "wait_seconds_max", "checked_out"} <= stats.keys()
+
+    def test_pool_timeout_is_503(self, client, mock_db):
+        """Test an exhausted pool answers 503 with Retry-After instead of 500."""
+        mock_db.query.side_effect = exc.TimeoutError("QueuePool limit reached")
+
+        response = client.get("/projects/1")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+SUMMARY = {
+    "server": {"status": "healthy", "database": "connected"},
+    "generated_at": datetime(2024, 1, 1, 0, 0, 0),
+    "recent_window": 3600,
+    "projects": [
+        {
+            "id": 1,
+            "name": "test-project",
+            "status": "ACTIVE",
+            "total": 3,
+            "by_status": {"PENDING": 2, "COMPLETED": 1},
+            "recent_completed": 1,
+            "recent_failed": 0,
+        }
+    ],
+    "clients": {"total": 2, "active": 1, "active_cpu": 8, "active_accelerators": 0},
+}
+
+
+class TestStatusRoutes:
+    """Tests for the status dashboard snapshot route."""
+
+    @pytest.fixture(autouse=True)
+    def _clear_summary_cache(self):
+        summary_cache.clear()
+        yield
+        summary_cache.clear()
+
+    @patch("whatsnext.api.server.routers.status.build_summary")
+    def test_status_summary(self, mock_build, client, mock_db):
+        """Test the summary is built once and then served from the cache."""
+        mock_build.return_value = SUMMARY
+
+        first = client.get("/status/summary")
+        second = client.get("/status/summary")
+
+        assert first.status_code == 200
+        assert second.json() == first.json()
+        assert first.json()["projects"][0]["by_status"]["PENDING"] == 2
+        assert first.json()["clients"]["active_cpu"] == 8
+        mock_build.assert_called_once_with(mock_db)
+
+    @patch("whatsnext.api.server.routers.status.settings")
+    @patch("whatsnext.api.server.routers.status.build_summary")
+    def test_database_down_serves_last_summary_unhealthy(self, mock_build, mock_settings, client, mock_db):
+        """Test a failed rebuild serves the previous snapshot with the server marked unhealthy."""
+        mock_build.side_effect = [SUMMARY, exc.OperationalError("SELECT", {}, Exception("connection refused"))]
+        mock_settings.status_summary_ttl = 0
+
+        client.get("/status/summary")
+        response = client.get("/status/summary")
+
+        assert response.status_code == 200
+        assert response.json()["server"] == {"status": "unhealthy", "database": "disconnected"}
+        assert response.json()["projects"][0]["total"] == 3
+
+    @patch("whatsnext.api.server.routers.status.build_summary")
+    def test_database_down_without_summary(self, mock_build, client, mock_db):
+        """Test a failed first build answers 503."""
+        mock_build.side_effect = exc.OperationalError("SELECT", {}, Exception("connection refused"))
+
+        response = client.get("/status/summary")
+
+        assert response.status_code == 503
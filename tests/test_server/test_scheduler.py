@@ -0,0 +1,256 @@
+"""Integration tests for atomic job claiming against PostgreSQL."""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from whatsnext.api.server import models
+from whatsnext.api.server.database import SessionLocal
+from whatsnext.api.server.dependencies import apply_status_change
+from whatsnext.api.server.scheduler import claim_jobs, claim_next_job
+
+pytestmark = pytest.mark.integration
+
+
+class TestClaimNextJob:
+    """Tests for claim_next_job."""
+
+    def test_claims_highest_priority(self, pg_db, make_project, add_job):
+        """Test the highest priority job is claimed and marked QUEUED."""
+        project = make_project()
+        add_job(project, "low", priority=1)
+        high = add_job(project, "high", priority=5)
+        pg_db.commit()
+
+        job = claim_next_job(pg_db, project.id)
+        pg_db.commit()
+
+        assert job.id == high.id
+        assert job.status == models.JobStatus.QUEUED
+
+    def test_empty_queue(self, pg_db, make_project):
+        """Test None is returned when nothing is pending."""
+        project = make_project()
+        pg_db.commit()
+
+        assert claim_next_job(pg_db, project.id) is None
+
+    def test_skips_jobs_with_unmet_dependencies(self, pg_db, make_project, add_job):
+        """Test jobs are only claimed once their dependencies completed."""
+        project = make_project()
+        first = add_job(project, "first")
+        add_job(project, "second", priority=10, depends_on=[first])
+        pg_db.commit()
+
+        job = claim_next_job(pg_db, project.id)
+        pg_db.commit()
+        assert job.id == first.id
+        assert claim_next_job(pg_db, project.id) is None
+
+        first.status = models.JobStatus.COMPLETED
+        apply_status_change(pg_db, first.id, models.JobStatus.QUEUED, models.JobStatus.COMPLETED)
+        pg_db.commit()
+        assert claim_next_job(pg_db, project.id).name == "second"
+
+    def test_resource_filter(self, pg_db, make_project, add_job):
+        """Test jobs needing more resources than available are skipped."""
+        project = make_project(required_cpu=8, required_accelerators=1)
+        add_job(project, "big")
+        pg_db.commit()
+
+        assert claim_next_job(pg_db, project.id, available_cpu=4) is None
+        assert claim_next_job(pg_db, project.id, available_cpu=8, available_accelerators=1) is not None
+
+    def test_returns_task_name(self, pg_db, make_project, add_job):
+        """Test the claim sets the task name from the same statement."""
+        project = make_project()
+        add_job(project, "job")
+        pg_db.commit()
+
+        job = claim_next_job(pg_db, project.id)
+
+        assert job.task_name == "train"
+
+    def test_concurrent_claims_never_duplicate(self, pg_db, make_project, add_job, run_workers):
+        """Test concurrent workers each receive distinct jobs and drain the queue."""
+        project = make_project()
+        expected = {add_job(project, f"job-{i}", priority=i % 7).id for i in range(200)}
+        pg_db.commit()
+        # Read before the threads start: they must not touch the shared session
+        project_id = project.id
+
+        claimed = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(16)
+
+        def worker():
+            session = SessionLocal()
+            try:
+                barrier.wait()
+                while True:
+                    job = claim_next_job(session, project_id)
+                    if job is None:
+                        session.commit()
+                        return
+                    job_id = job.id
+                    session.commit()
+                    with lock:
+                        claimed.append(job_id)
+            finally:
+                session.close()
+
+        run_workers(worker, 16)
+
+        assert len(claimed) == len(set(claimed))
+        assert set(claimed) == expected
+
+
+class TestClaimJobs:
+    """Tests for claim_jobs."""
+
+    def test_claims_up_to_max_in_priority_order(self, pg_db, make_project, add_job):
+        """Test at most max_jobs jobs are claimed, highest priority first."""
+        project = make_project()
+        for i in range(5):
+            add_job(project, f"job-{i}", priority=i)
+        pg_db.commit()
+
+        jobs = claim_jobs(pg_db, project.id, 3)
+        pg_db.commit()
+
+        assert [job.name for job in jobs] == ["job-4", "job-3", "job-2"]
+        assert all(job.status == models.JobStatus.QUEUED for job in jobs)
+        assert [job.name for job in claim_jobs(pg_db, project.id, 10)] == ["job-1", "job-0"]
+
+    def test_batch_fits_resource_budget(self, pg_db, make_project, add_job):
+        """Test the combined requirements of a batch stay within the budget."""
+        project = make_project(required_cpu=2, required_accelerators=1)
+        for i in range(4):
+            add_job(project, f"job-{i}")
+        pg_db.commit()
+
+        assert len(claim_jobs(pg_db, project.id, 10, available_cpu=5)) == 2
+        assert len(claim_jobs(pg_db, project.id, 10, available_cpu=8, available_accelerators=1)) == 1
+
+    def test_sequential_batch_fits_budget_per_job(self, pg_db, make_project, add_job):
+        """Test a batch run one job after another only needs each job to fit the budget."""
+        project = make_project(required_cpu=2, required_accelerators=1)
+        for i in range(4):
+            add_job(project, f"job-{i}")
+        pg_db.commit()
+
+        assert len(claim_jobs(pg_db, project.id, 3, available_cpu=2, available_accelerators=1, sequential=True)) == 3
+        assert claim_jobs(pg_db, project.id, 3, available_cpu=1, sequential=True) == []
+
+    def test_skips_jobs_larger_than_budget(self, pg_db, make_project, add_job):
+        """Test a job that can never fit does not end the batch."""
+        project = make_project(required_cpu=1)
+        big = models.Task(name="big", project_id=project.id, required_cpu=16)
+        pg_db.add(big)
+        pg_db.flush()
+        add_job(project, "big", priority=9, task=big)
+        add_job(project, "small-1", priority=1)
+        add_job(project, "small-2")
+        pg_db.commit()
+
+        jobs = claim_jobs(pg_db, project.id, 10, available_cpu=4)
+
+        assert [job.name for job in jobs] == ["small-1", "small-2"]
+
+    def test_concurrent_batches_never_duplicate(self, pg_db, make_project, add_job, run_workers):
+        """Test concurrent batch claims receive disjoint jobs and drain the queue."""
+        project = make_project()
+        expected = {add_job(project, f"job-{i}", priority=i % 5).id for i in range(200)}
+        pg_db.commit()
+        project_id = project.id
+
+        claimed = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(8)
+
+        def worker():
+            session = SessionLocal()
+            try:
+                barrier.wait()
+                while True:
+                    job_ids = [job.id for job in claim_jobs(session, project_id, 7)]
+                    session.commit()
+                    if not job_ids:
+                        return
+                    with lock:
+                        claimed.extend(job_ids)
+            finally:
+                session.close()
+
+        run_workers(worker, 8)
+
+        assert len(claimed) == len(set(claimed))
+        assert set(claimed) == expected
+
+
+class TestPriorityAging:
+    """Tests for priority aging in the claim query."""
+
+    @pytest.fixture
+    def add_old_job(self, pg_db, add_job):
+        """Factory for jobs created ``hours_ago`` hours ago."""
+
+        def add(project, name, priority, hours_ago):
+            job = add_job(project, name, priority=priority)
+            job.created_at = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+            pg_db.flush()
+            return job
+
+        return add
+
+    def test_strict_priority_without_aging(self, pg_db, add_old_job, make_project, add_job):
+        """Test waiting time does not matter when the project does not age priorities."""
+        project = make_project()
+        add_old_job(project, "old-low", priority=0, hours_ago=100)
+        add_job(project, "new-high", priority=5)
+        pg_db.commit()
+
+        assert claim_next_job(pg_db, project.id).name == "new-high"
+
+    def test_old_jobs_overtake_with_aging(self, pg_db, add_old_job, make_project, add_job):
+        """Test a long-waiting low priority job overtakes newer high priority jobs."""
+        project = make_project()
+        project.priority_aging = 1.0
+        add_old_job(project, "old-low", priority=0, hours_ago=10)
+        add_old_job(project, "recent-low", priority=0, hours_ago=1)
+        add_job(project, "new-high", priority=5)
+        pg_db.commit()
+
+        jobs = claim_jobs(pg_db, project.id, 3)
+
+        # Effective priorities: 10, 5 and 1
+        assert [job.name for job in jobs] == ["old-low", "new-high", "recent-low"]
+
+    def test_changing_aging_reranks_pending_jobs(self, pg_db, make_project, add_job, add_old_job):
+        """Test turning aging on for a project reorders the jobs already waiting."""
+        project = make_project()
+        add_old_job(project, "old-low", priority=0, hours_ago=10)
+        add_job(project, "new-high", priority=5)
+        pg_db.commit()
+
+        project.priority_aging = 1.0
+        pg_db.commit()
+
+        assert claim_next_job(pg_db, project.id).name == "old-low"
+
+    def test_requeued_job_is_ranked(self, pg_db, make_project, add_job, add_old_job):
+        """Test a job put back to PENDING is ranked by the aging rate set while it was claimed."""
+        project = make_project()
+        old = add_old_job(project, "old-low", priority=0, hours_ago=10)
+        pg_db.commit()
+        assert claim_next_job(pg_db, project.id).id == old.id
+        add_job(project, "new-high", priority=5)
+        project.priority_aging = 1.0
+        pg_db.commit()
+
+        pg_db.execute(update(models.Job).where(models.Job.id == old.id).values(status=models.JobStatus.PENDING))
+        pg_db.commit()
+
+        assert claim_next_job(pg_db, project.id).id == old.id
@@ -0,0 +1,174 @@
+"""Tests for rate limits shared between server processes."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import select, update
+
+from whatsnext.api.server import models
+from whatsnext.api.server.ratelimit import RouteLimits
+from whatsnext.api.server.shared_ratelimit import RateLimitSync, SharedWindowLimiter
+
+
+class TestSharedWindowLimiter:
+    """Tests for SharedWindowLimiter without a database."""
+
+    def test_allows_up_to_limit(self):
+        """Test a key gets exactly ``limit`` requests in one slot and they are pending."""
+        limiter = SharedWindowLimiter("default", 3)
+
+        assert [limiter.hit("a", now=t) for t in (600, 601, 602)] == [0, 0, 0]
+        assert limiter.hit("a", now=603) > 0
+        pending, keys = limiter.take_pending()
+        assert pending == {("a", 600): 3}
+        assert keys == ["a"]
+
+    def test_slots_are_aligned(self):
+        """Test slots start at multiples of the window, so all processes agree on them."""
+        limiter = SharedWindowLimiter("default", 10)
+        limiter.hit("a", now=659)
+        limiter.hit("a", now=661)
+
+        pending, _ = limiter.take_pending()
+
+        assert pending == {("a", 600): 1, ("a", 660): 1}
+
+    def test_totals_of_other_processes_count(self):
+        """Test counts read back from the database limit this process too."""
+        limiter = SharedWindowLimiter("default", 5)
+        limiter.hit("a", now=600)
+        _, keys = limiter.take_pending()
+
+        limiter.hit("a", now=601)  # admitted during the sync
+        limiter.apply_totals(keys, {"a": {600: 4}})
+
+        assert limiter.hit("a", now=602) > 0
+
+    def test_restore_pending(self):
+        """Test requests of a failed sync are written by the next one."""
+        limiter = SharedWindowLimiter("default", 5)
+        limiter.hit("a", now=600)
+        pending, _ = limiter.take_pending()
+        limiter.hit("a", now=601)
+
+        limiter.restore_pending(pending)
+
+        assert limiter.take_pending()[0] == {("a", 600): 2}
+
+    def test_unsynced_key_gets_process_share(self):
+        """Test a key is held to this process's share of the limit until its first sync."""
+        limiter = SharedWindowLimiter("default", 6, processes=3)
+
+        assert [limiter.hit("a", now=600) for _ in range(2)] == [0, 0]
+        assert limiter.hit("a", now=600) > 0
+
+        _, keys = limiter.take_pending()
+        limiter.apply_totals(keys, {"a": {600: 2}})
+
+        assert [limiter.hit("a", now=601) for _ in range(4)] == [0, 0, 0, 0]
+        assert limiter.hit("a", now=601) > 0
+
+    def test_evicted_key_is_unsynced_again(self):
+        """Test a key seen again after eviction gets the process share until it is synced again."""
+        limiter = SharedWindowLimiter("default", 4, processes=2)
+        limiter.hit("a", now=600)
+        _, keys = limiter.take_pending()
+        limiter.apply_totals(keys, {"a": {600: 1}})
+
+        assert [limiter.hit("a", now=800) for _ in range(2)] == [0, 0]
+        assert limiter.hit("a", now=800) > 0
+
+    def test_idle_keys_are_evicted(self):
+        """Test keys without requests in the last two slots are forgotten."""
+        limiter = SharedWindowLimiter("default", 5)
+        limiter.hit("idle", now=600)
+        limiter.hit("busy", now=700)
+
+        limiter.hit("busy", now=725)
+
+        assert len(limiter) == 1
+
+
+class TestRateLimitSync:
+    """Tests for RateLimitSync without a database."""
+
+    def test_factory_registers_limiters(self):
+        """Test RouteLimits creates its limiters through the sync."""
+        sync = RateLimitSync()
+
+        limits = RouteLimits(60, [("/clients/*/heartbeat", 600), ("/jobs/", 0)], limiter_factory=sync.limiter)
+
+        assert [(limiter.name, limiter.limit) for limiter in sync.limiters] == [("default", 60), ("/clients/*/heartbeat", 600)]
+        assert limits.limiters() == sync.limiters
+
+    def test_burst_before_first_sync_stays_within_limit(self):
+        """Test processes splitting a new client's burst admit the limit once in total."""
+        syncs = [RateLimitSync(processes=3) for _ in range(3)]
+        limiters = [sync.limiter("default", 6) for sync in syncs]
+
+        admitted = sum(limiter.hit("a", now=600) == 0 for limiter in limiters for _ in range(6))
+
+        assert admitted == 6
+
+    def test_failed_sync_restores_pending(self):
+        """Test requests are kept when writing them fails."""
+        sync = RateLimitSync()
+        limiter = sync.limiter("default", 5)
+        limiter.hit("a", now=600)
+        db = MagicMock()
+        db.execute.side_effect = RuntimeError("database down")
+
+        with pytest.raises(RuntimeError):
+            sync.sync(db, now=601)
+
+        assert limiter.take_pending()[0] == {("a", 600): 1}
+
+    def test_failed_commit_restores_pending(self):
+        """Test requests are kept when committing them fails, and totals are not applied."""
+        sync = RateLimitSync()
+        limiter = sync.limiter("default", 5)
+        limiter.hit("a", now=600)
+        db = MagicMock()
+        db.execute.return_value = []
+        db.commit.side_effect = RuntimeError("connection lost")
+
+        with pytest.raises(RuntimeError):
+            sync.sync(db, now=601)
+
+        assert limiter.take_pending()[0] == {("a", 600): 1}
+
+
+@pytest.mark.integration
+class TestSharedRateLimits:
+    """Tests for sharing counts through PostgreSQL."""
+
+    def test_processes_share_the_limit(self, pg_db):
+        """Test two processes together admit the limit once, not once each."""
+        first, second = RateLimitSync(), RateLimitSync()
+        first_limiter, second_limiter = first.limiter("default", 6), second.limiter("default", 6)
+        assert all(first_limiter.hit("a", now=600) == 0 for _ in range(3))
+        assert all(second_limiter.hit("a", now=600) == 0 for _ in range(2))
+
+        assert first.sync(pg_db, now=601) == 1
+        second.sync(pg_db, now=601)
+        first.sync(pg_db, now=601)
+
+        assert pg_db.scalar(select(models.RateLimitCounter.n)) == 5
+        assert first_limiter.hit("a", now=602) == 0
+        assert first_limiter.hit("a", now=602) > 0
+        assert second_limiter.hit("a", now=602) == 0  # not synced yet: off by at most one interval
+
+    def test_sync_drops_expired_slots(self, pg_db):
+        """Test counter rows older than the previous slot are deleted."""
+        sync = RateLimitSync()
+        limiter = sync.limiter("default", 6)
+        limiter.hit("a", now=600)
+        sync.sync(pg_db, now=600)
+        pg_db.execute(update(models.RateLimitCounter).values(slot_start=480))
+        pg_db.commit()
+
+        limiter.hit("a", now=601)
+        sync._next_cleanup = 0
+        sync.sync(pg_db, now=601)
+
+        assert pg_db.execute(select(models.RateLimitCounter.slot_start, models.RateLimitCounter.n)).all() == [(600, 1)]
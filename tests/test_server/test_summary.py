@@ -0,0 +1,95 @@
+"""Tests for the status dashboard snapshot."""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from whatsnext.api.server import models
+from whatsnext.api.server.summary import SummaryCache, build_summary
+
+
+class TestSummaryCache:
+    """Tests for SummaryCache without a database."""
+
+    def test_serves_snapshot_until_expiry(self):
+        """Test the snapshot is built once and served until the TTL passes."""
+        cache = SummaryCache()
+        build = MagicMock(side_effect=[{"n": 1}, {"n": 2}])
+
+        with patch("whatsnext.api.server.summary.time.monotonic", return_value=100.0):
+            assert cache.get(build, 5) == {"n": 1}
+            assert cache.get(build, 5) == {"n": 1}
+        with patch("whatsnext.api.server.summary.time.monotonic", return_value=105.0):
+            assert cache.get(build, 5) == {"n": 2}
+        assert build.call_count == 2
+
+    def test_zero_ttl_rebuilds(self):
+        """Test a TTL of 0 rebuilds the snapshot on every call."""
+        cache = SummaryCache()
+        build = MagicMock(return_value={})
+
+        cache.get(build, 0)
+        cache.get(build, 0)
+
+        assert build.call_count == 2
+
+    def test_clear(self):
+        """Test a cleared cache rebuilds on the next call."""
+        cache = SummaryCache()
+        build = MagicMock(return_value={})
+
+        cache.get(build, 60)
+        cache.clear()
+        cache.get(build, 60)
+
+        assert build.call_count == 2
+
+    def test_failed_build_is_not_cached(self):
+        """Test a failing build leaves the cache empty, so the next call retries."""
+        cache = SummaryCache()
+        build = MagicMock(side_effect=[RuntimeError("database down"), {"n": 1}])
+
+        with pytest.raises(RuntimeError):
+            cache.get(build, 60)
+
+        assert cache.get(build, 60) == {"n": 1}
+
+
+@pytest.mark.integration
+class TestBuildSummary:
+    """Tests for build_summary against PostgreSQL."""
+
+    def test_summary(self, pg_db):
+        """Test the snapshot counts jobs per project, recent throughput and active client resources."""
+        project = models.Project(name="summary", description="")
+        empty = models.Project(name="empty", description="")
+        pg_db.add_all([project, empty])
+        pg_db.flush()
+        statuses = [models.JobStatus.PENDING] * 3 + [models.JobStatus.COMPLETED] * 2 + [models.JobStatus.FAILED]
+        jobs = [models.Job(name=f"job-{i}", project_id=project.id, parameters={}, status=s) for i, s in enumerate(statuses)]
+        pg_db.add_all(jobs)
+        pg_db.flush()
+        jobs[3].updated_at = datetime.now(timezone.utc) - timedelta(days=1)
+        pg_db.add_all(
+            [
+                models.Client(id="a", name="a", entity="e", available_cpu=4, available_accelerators=1),
+                models.Client(id="b", name="b", entity="e", available_cpu=8),
+                models.Client(id="c", name="c", entity="e", available_cpu=16, is_active=0),
+            ]
+        )
+        pg_db.commit()
+
+        summary = build_summary(pg_db)
+
+        first, second = summary["projects"]
+        assert first["name"] == "summary"
+        assert first["status"] == "ACTIVE"
+        assert first["total"] == 6
+        assert first["by_status"]["PENDING"] == 3
+        assert first["by_status"]["RUNNING"] == 0
+        assert first["recent_completed"] == 1
+        assert first["recent_failed"] == 1
+        assert second["name"] == "empty"
+        assert second["total"] == 0
+        assert summary["clients"] == {"total": 3, "active": 2, "active_cpu": 12, "active_accelerators": 1}
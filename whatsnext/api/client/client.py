@@ -2,17 +2,19 @@ from __future__ import annotations
 
 import logging
 import signal
+import threading
 import time
 from datetime import datetime
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
 
 from .exceptions import EmptyQueueError
 from .formatter import Formatter
+from .project import Project
 from .resource import Resource
 from .utils import random_string
 
 if TYPE_CHECKING:
-    from .project import Project
+    from .job import Job
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +31,7 @@ class Client:
         entity: str,
         name: str,
         description: str,
-        project: "Project",
+        project: Project,
         formatter: Formatter,
         available_cpu: int = 1,
         available_accelerators: int = 0,
@@ -110,19 +112,43 @@ class Client:
         poll_interval: float = 5.0,
         run_forever: bool = False,
         use_resource_filter: bool = True,
+        batch_size: int = 1,
+        shares: Optional[Sequence[Tuple[Project, float]]] = None,
+        heartbeat_interval: float = 60.0,
     ) -> int:
         """Continuously fetch and execute jobs until queue is empty.
 
         Args:
             resource: Resource to use for job execution. If None, allocates
                 a default resource with 1 CPU and no accelerators.
-            poll_interval: Seconds to wait between polling when run_forever=True.
+            poll_interval: Seconds to wait for new jobs when run_forever=True. The
+                server holds each fetch open for up to this long and returns as
+                soon as a job becomes ready.
             run_forever: If True, wait for new jobs instead of exiting on empty queue.
             use_resource_filter: If True, only fetch jobs that match client's resources.
+            batch_size: Maximum number of jobs to claim per request. With more
+                than 1, jobs are claimed with ``fetch_jobs`` and run one after
+                another, so with ``use_resource_filter`` each of them must fit
+                the client's resources on its own.
+            shares: Serve several projects instead of ``self.project``, as
+                (project, weight) pairs. Each job comes from the project
+                furthest below its weighted fair share of recent work, so
+                projects share the worker in proportion to their weights.
+                Cannot be combined with ``batch_size`` above 1.
+            heartbeat_interval: Seconds between heartbeats of a registered
+                client (0 = none). Jobs it claims are leased to it, and the
+                server requeues them if the heartbeats stop for longer than
+                its ``job_lease_seconds``.
 
         Returns:
             Number of jobs executed.
+
+        Raises:
+            ValueError: If ``shares`` is combined with a ``batch_size`` above 1.
         """
+        if shares and batch_size > 1:
+            raise ValueError("Fetching by fair share claims one job at a time; use batch_size=1")
+
         # Set up signal handlers for graceful shutdown
         original_sigint = signal.signal(signal.SIGINT, self._signal_handler)
         original_sigterm = signal.signal(signal.SIGTERM, self._signal_handler)
@@ -134,30 +160,53 @@ class Client:
         jobs_executed = 0
         self._shutdown_requested = False
 
-        logger.info(f"Worker started for project {self.project.id}")
+        heartbeat_stop = threading.Event()
+        if self._registered and heartbeat_interval > 0:
+            threading.Thread(target=self._heartbeat, args=(heartbeat_stop, heartbeat_interval), name="whatsnext-heartbeat", daemon=True).start()
+
+        if shares:
+            logger.info(f"Worker started for projects {', '.join(str(project.id) for project, _ in shares)}")
+        else:
+            logger.info(f"Worker started for project {self.project.id}")
 
         try:
             while not self._shutdown_requested:
+                claimed: List[Job] = []
+                fetch_started = time.monotonic()
                 try:
-                    # Fetch job with resource filtering if enabled
+                    # Fetch jobs with resource filtering if enabled
+                    fetch_args: Dict[str, Any] = {}
                     if use_resource_filter:
-                        job = self.project.fetch_job(
-                            available_cpu=self.available_cpu,
-                            available_accelerators=self.available_accelerators,
-                        )
-                    else:
-                        job = self.project.fetch_job()
-                    logger.info(f"Fetched job {job.id}: {job.name}")
-                    exit_code = job.run(resource)
-                    jobs_executed += 1
-                    if exit_code == 0:
-                        logger.info(f"Job {job.id} completed successfully")
+                        fetch_args["available_cpu"] = self.available_cpu
+                        fetch_args["available_accelerators"] = self.available_accelerators
+                    if run_forever:
+                        # Long poll: the server answers as soon as a job is ready
+                        fetch_args["wait"] = poll_interval
+                    if self._registered:
+                        # Claims are leased to this client and kept alive by its heartbeats
+                        fetch_args["client_id"] = self.id
+                    if shares:
+                        claimed = [self.fetch_shared_job(shares, **fetch_args)]
+                    elif batch_size > 1:
+                        claimed = self.project.fetch_jobs(max_jobs=batch_size, sequential=True, **fetch_args)
                     else:
-                        logger.warning(f"Job {job.id} failed with exit code {exit_code}")
+                        claimed = [self.project.fetch_job(**fetch_args)]
+                    while claimed and not self._shutdown_requested:
+                        job = claimed.pop(0)
+                        logger.info(f"Fetched job {job.id}: {job.name}")
+                        exit_code = job.run(resource)
+                        jobs_executed += 1
+                        if exit_code == 0:
+                            logger.info(f"Job {job.id} completed successfully")
+                        else:
+                            logger.warning(f"Job {job.id} failed with exit code {exit_code}")
                 except EmptyQueueError:
                     if run_forever:
-                        logger.debug(f"Queue empty, waiting {poll_interval}s...")
-                        time.sleep(poll_interval)
+                        # Servers without long polling answer at once; keep the poll rate bounded
+                        remaining = poll_interval - (time.monotonic() - fetch_started)
+                        if remaining > 0:
+                            logger.debug(f"Queue empty, waiting {remaining:.1f}s...")
+                            time.sleep(remaining)
                     else:
                         logger.info("Queue empty, worker exiting")
                         break
@@ -165,7 +214,12 @@ class Client:
                     logger.exception(f"Error processing job: {e}")
                     if not run_forever:
                         break
+                finally:
+                    # Jobs of a batch left unrun by a shutdown or an error
+                    self._release_jobs(claimed)
         finally:
+            heartbeat_stop.set()
+
             # Restore original signal handlers
             signal.signal(signal.SIGINT, original_sigint)
             signal.signal(signal.SIGTERM, original_sigterm)
@@ -180,6 +234,57 @@ class Client:
 
         return jobs_executed
 
+    def fetch_shared_job(
+        self,
+        shares: Sequence[Tuple[Project, float]],
+        available_cpu: int = 0,
+        available_accelerators: int = 0,
+        wait: float = 0,
+        client_id: Optional[str] = None,
+    ) -> Job:
+        """Claim the next job of any of several projects by weighted fair share.
+
+        Args:
+            shares: The projects to serve with their positive weights.
+            available_cpu: Filter jobs by available CPU (0 = no filter).
+            available_accelerators: Filter jobs by available accelerators (0 = no filter).
+            wait: Seconds the server may hold the request until a job is ready (0 = no wait).
+            client_id: Registered client claiming the job, which then holds a lease on it.
+
+        Returns:
+            The next job to execute.
+
+        Raises:
+            EmptyQueueError: If no job is ready in any of the projects.
+        """
+        server = self.project._check_server()
+        return_value = server.fetch_shared_job(
+            shares,
+            available_cpu=available_cpu,
+            available_accelerators=available_accelerators,
+            wait=wait,
+            client_id=client_id,
+        )
+        return Project._job_from_response(return_value["job"], server)
+
+    def _heartbeat(self, stop: threading.Event, interval: float) -> None:
+        """Send heartbeats every ``interval`` seconds until ``stop`` is set."""
+        server = self.project._check_server()
+        while not stop.wait(interval):
+            try:
+                server.client_heartbeat(self.id)
+            except Exception as e:
+                logger.warning(f"Failed to send heartbeat: {e}")
+
+    def _release_jobs(self, jobs: List[Job]) -> None:
+        """Return claimed jobs that will not be run to the queue."""
+        for job in jobs:
+            try:
+                job.release()
+                logger.info(f"Returned job {job.id} to the queue")
+            except Exception as e:
+                logger.warning(f"Failed to return job {job.id} to the queue: {e}")
+
     def stop(self) -> None:
         """Request the worker to stop gracefully."""
         self._shutdown_requested = True
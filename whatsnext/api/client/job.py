@@ -48,6 +48,13 @@ class Job:
         self._server._job_connector.set_status(self, status)
         self.status = status
 
+    def release(self) -> None:
+        """Return the claimed job to the queue without running it."""
+        if self._server is None:
+            raise RuntimeError("Job is not bound to a server")
+        self._server._job_connector.release(self)
+        self.status = "PENDING"
+
     def set_priority_to(self, priority: int) -> None:
         """Update job priority on the server."""
         if self._server is None:
@@ -64,26 +64,73 @@ class Project:
         self,
         available_cpu: int = 0,
         available_accelerators: int = 0,
+        wait: float = 0,
+        client_id: Optional[str] = None,
     ) -> Job:
         """Fetch the next pending job from the queue.
 
         Args:
             available_cpu: Filter jobs by available CPU (0 = no filter).
             available_accelerators: Filter jobs by available accelerators (0 = no filter).
+            wait: Seconds the server may hold the request until a job is ready (0 = no wait).
+            client_id: Registered client claiming the work, which then holds a lease on it.
 
         Returns:
             The next job to execute.
 
         Raises:
-            EmptyQueueError: If no jobs are pending.
+            EmptyQueueError: If no job is ready.
         """
         server = self._check_server()
         return_value = server.fetch_job(
             self,
             available_cpu=available_cpu,
             available_accelerators=available_accelerators,
+            wait=wait,
+            client_id=client_id,
         )
-        job_data = return_value["job"]
+        return self._job_from_response(return_value["job"], server)
+
+    def fetch_jobs(
+        self,
+        max_jobs: int = 10,
+        available_cpu: int = 0,
+        available_accelerators: int = 0,
+        wait: float = 0,
+        client_id: Optional[str] = None,
+        sequential: bool = False,
+    ) -> List[Job]:
+        """Fetch up to ``max_jobs`` pending jobs from the queue in one request.
+
+        Args:
+            max_jobs: Maximum number of jobs to claim.
+            available_cpu: CPU budget for all returned jobs together (0 = no filter).
+            available_accelerators: Accelerator budget for all returned jobs together (0 = no filter).
+            wait: Seconds the server may hold the request until a job is ready (0 = no wait).
+            client_id: Registered client claiming the work, which then holds a lease on it.
+            sequential: The jobs will be run one after another, so the budget applies to each job on its own.
+
+        Returns:
+            The claimed jobs, highest priority first.
+
+        Raises:
+            EmptyQueueError: If no job could be claimed.
+        """
+        server = self._check_server()
+        return_value = server.fetch_jobs(
+            self,
+            max_jobs=max_jobs,
+            available_cpu=available_cpu,
+            available_accelerators=available_accelerators,
+            wait=wait,
+            client_id=client_id,
+            sequential=sequential,
+        )
+        return [self._job_from_response(job_data, server) for job_data in return_value["jobs"]]
+
+    @staticmethod
+    def _job_from_response(job_data: Dict[str, Any], server: Server) -> Job:
+        """Build a bound Job from a fetch response entry."""
         # Transform server response to Job constructor args
         del job_data["project_id"]
         del job_data["task_id"]
@@ -104,6 +151,9 @@ class Project:
     def extend_queue(self, jobs: List[Job]) -> List[int]:
         """Add multiple jobs to the queue.
 
+        Jobs may depend (``Job.depends``) on other jobs of the same list as
+        well as on jobs submitted before, so a DAG is added in one request.
+
         Args:
             jobs: List of Job objects to add.
 
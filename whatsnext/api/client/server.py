@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import requests
 from requests.exceptions import ConnectionError, Timeout
@@ -17,6 +17,12 @@ logger = logging.getLogger(__name__)
 # Default timeout for HTTP requests (seconds)
 DEFAULT_TIMEOUT = 30
 
+# Largest page the server returns from list endpoints
+MAX_PAGE_SIZE = 1000
+
+# Response header carrying the cursor of the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 class ProjectConnector:
     """Handles project-related HTTP requests to the server."""
@@ -104,6 +110,13 @@ class JobConnector:
         )
         r.raise_for_status()
 
+    def release(self, job: Job) -> None:
+        r = requests.post(
+            f"{self._server.base_url}/jobs/{job.id}/release",
+            timeout=DEFAULT_TIMEOUT,
+        )
+        r.raise_for_status()
+
     def set_priority_to(self, job: Job, priority: int) -> None:
         data = self._get_job_data(job)
         data["priority"] = priority
@@ -246,21 +259,67 @@ class Server:
         return False
 
     def get_queue(self, project: Project) -> List[Dict[str, Any]]:
-        """Get all pending jobs for a project."""
-        r = requests.get(
-            f"{self.base_url}/jobs",
-            params={"project_id": project.id},
-            timeout=DEFAULT_TIMEOUT,
-        )
-        if r.ok:
-            return r.json()
-        return []
+        """Get all jobs of a project."""
+        return list(self.iter_jobs(project_id=project.id))
+
+    def iter_pages(self, path: str, params: Optional[Dict[str, Any]] = None, page_size: int = MAX_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """Iterate over all items of a list endpoint, fetching pages lazily.
+
+        Follows the ``X-Next-Cursor`` header of each page, so every page
+        costs the server the same however deep it is. Stops with an error
+        logged if a page cannot be fetched.
+
+        Args:
+            path: List endpoint, e.g. ``/jobs``.
+            params: Query parameters of the endpoint, such as filters.
+            page_size: Items per request (at most 1000).
+
+        Yields:
+            The items as returned by the server.
+        """
+        params = {**(params or {}), "limit": page_size}
+        while True:
+            r = requests.get(f"{self.base_url}{path}", params=params, timeout=DEFAULT_TIMEOUT)
+            if not r.ok:
+                logger.error(f"Failed to retrieve {path}: HTTP {r.status_code}")
+                return
+            page = r.json()
+            yield from page
+            cursor = r.headers.get(NEXT_CURSOR_HEADER)
+            if not cursor or len(page) < page_size:
+                return
+            # A new dict per request, so no request shares its parameters with another
+            params = {**params, "cursor": cursor}
+
+    def iter_jobs(
+        self,
+        project_id: Optional[int] = None,
+        status: Optional[str] = None,
+        order: str = "id",
+        page_size: int = MAX_PAGE_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over all jobs, optionally of one project and status, fetching pages lazily.
+
+        Args:
+            project_id: Only jobs of this project.
+            status: Only jobs in this status.
+            order: ``"id"``, or ``"priority"`` for the highest priority first.
+            page_size: Jobs per request (at most 1000).
+        """
+        params: Dict[str, Any] = {"order": order}
+        if project_id is not None:
+            params["project_id"] = project_id
+        if status is not None:
+            params["status_filter"] = status
+        return self.iter_pages("/jobs", params, page_size)
 
     def fetch_job(
         self,
         project: Project,
         available_cpu: int = 0,
         available_accelerators: int = 0,
+        wait: float = 0,
+        client_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Fetch the next pending job from the queue.
 
@@ -268,24 +327,128 @@ class Server:
             project: The project to fetch jobs from.
             available_cpu: Filter jobs by available CPU (0 = no filter).
             available_accelerators: Filter jobs by available accelerators (0 = no filter).
+            wait: Seconds the server may hold the request until a job is ready (0 = no wait).
+            client_id: Registered client claiming the work; the server leases it to the
+                client and requeues it if the client's heartbeats stop.
 
         Raises:
-            EmptyQueueError: If no jobs are pending.
+            EmptyQueueError: If no job is ready.
         """
         params: Dict[str, Any] = {}
         if available_cpu > 0:
             params["available_cpu"] = available_cpu
         if available_accelerators > 0:
             params["available_accelerators"] = available_accelerators
+        if wait > 0:
+            params["wait"] = wait
+        if client_id is not None:
+            params["client_id"] = client_id
 
         r = requests.get(
             f"{self.base_url}/projects/{project.id}/fetch_job",
             params=params,
-            timeout=DEFAULT_TIMEOUT,
+            timeout=DEFAULT_TIMEOUT + wait,
+        )
+        r.raise_for_status()
+        data = r.json()
+        if data["num_pending"] == 0 or data["job"] is None:
+            raise EmptyQueueError("No jobs in queue")
+        return data
+
+    def fetch_jobs(
+        self,
+        project: Project,
+        max_jobs: int = 10,
+        available_cpu: int = 0,
+        available_accelerators: int = 0,
+        wait: float = 0,
+        client_id: Optional[str] = None,
+        sequential: bool = False,
+    ) -> Dict[str, Any]:
+        """Fetch up to ``max_jobs`` pending jobs from the queue in one request.
+
+        Args:
+            project: The project to fetch jobs from.
+            max_jobs: Maximum number of jobs to claim.
+            available_cpu: CPU budget for all returned jobs together (0 = no filter).
+            available_accelerators: Accelerator budget for all returned jobs together (0 = no filter).
+            wait: Seconds the server may hold the request until a job is ready (0 = no wait).
+            client_id: Registered client claiming the work; the server leases it to the
+                client and requeues it if the client's heartbeats stop.
+            sequential: The jobs will be run one after another, so the budget applies
+                to each job on its own instead of to all of them together.
+
+        Raises:
+            EmptyQueueError: If no job could be claimed.
+        """
+        params: Dict[str, Any] = {"max": max_jobs}
+        if available_cpu > 0:
+            params["available_cpu"] = available_cpu
+        if available_accelerators > 0:
+            params["available_accelerators"] = available_accelerators
+        if wait > 0:
+            params["wait"] = wait
+        if client_id is not None:
+            params["client_id"] = client_id
+        if sequential:
+            params["sequential"] = True
+
+        r = requests.get(
+            f"{self.base_url}/projects/{project.id}/fetch_jobs",
+            params=params,
+            timeout=DEFAULT_TIMEOUT + wait,
         )
         r.raise_for_status()
         data = r.json()
-        if data["num_pending"] == 0:
+        if not data["jobs"]:
+            raise EmptyQueueError("No jobs in queue")
+        return data
+
+    def fetch_shared_job(
+        self,
+        shares: Sequence[Tuple[Project, float]],
+        available_cpu: int = 0,
+        available_accelerators: int = 0,
+        wait: float = 0,
+        client_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Fetch the next pending job of any of several projects by fair share.
+
+        The server picks the project with the lowest recent consumption per
+        unit of weight that has a ready job.
+
+        Args:
+            shares: The projects to serve with their positive weights.
+            available_cpu: Filter jobs by available CPU (0 = no filter).
+            available_accelerators: Filter jobs by available accelerators (0 = no filter).
+            wait: Seconds the server may hold the request until a job is ready (0 = no wait).
+            client_id: Registered client claiming the work; the server leases it to the
+                client and requeues it if the client's heartbeats stop.
+
+        Raises:
+            EmptyQueueError: If no job is ready.
+        """
+        params: Dict[str, Any] = {
+            "project_id": [project.id for project, _ in shares],
+            "weight": [weight for _, weight in shares],
+        }
+        if available_cpu > 0:
+            params["available_cpu"] = available_cpu
+        if available_accelerators > 0:
+            params["available_accelerators"] = available_accelerators
+        if wait > 0:
+            params["wait"] = wait
+        if client_id is not None:
+            params["client_id"] = client_id
+
+        r = requests.get(
+            f"{self.base_url}/fetch_job",
+            params=params,
+            timeout=DEFAULT_TIMEOUT + wait,
+        )
+        r.raise_for_status()
+        data = r.json()
+        if data["num_pending"] == 0 or data["job"] is None:
             raise EmptyQueueError("No jobs in queue")
         return data
 
@@ -345,6 +508,11 @@ class Server:
     def extend_queue(self, project: Project, jobs: List[Job]) -> List[int]:
         """Add multiple jobs to a project's queue.
 
+        ``Job.depends`` may list jobs of the same call as well as jobs that
+        were submitted before, so a whole DAG is created in one request. Jobs
+        whose task does not exist are skipped, together with the jobs that
+        depend on them. The created jobs get their IDs set.
+
         Args:
             project: The project to add jobs to.
             jobs: List of Job objects to add.
@@ -352,25 +520,48 @@ class Server:
         Returns:
             List of created job IDs.
         """
-        # Get task IDs for each job
-        job_items = []
-        for job in jobs:
+        # Look up each task once
+        task_ids: Dict[str, Optional[int]] = {}
+        for task in dict.fromkeys(job.task for job in jobs):
             r = requests.get(
-                f"{self.base_url}/tasks/name/{job.task}",
+                f"{self.base_url}/tasks/name/{task}",
                 params={"project_id": project.id},
                 timeout=DEFAULT_TIMEOUT,
             )
             if not r.ok:
-                logger.error(f"Task '{job.task}' not found for project")
-                continue
-            task_id = r.json()["id"]
+                logger.error(f"Task '{task}' not found for project")
+            task_ids[task] = r.json()["id"] if r.ok else None
+
+        # Skip jobs without a task and, transitively, the jobs depending on them
+        in_batch = {id(job) for job in jobs}
+        skipped = {id(job) for job in jobs if task_ids[job.task] is None}
+        for job in jobs:
+            for dep in job.depends or []:
+                if id(dep) not in in_batch and dep.id is None:
+                    logger.error(f"Job '{job.name}' depends on '{dep.name}', which was never submitted")
+                    skipped.add(id(job))
+        changed = True
+        while changed:
+            changed = False
+            for job in jobs:
+                if id(job) not in skipped and any(id(dep) in skipped for dep in job.depends or []):
+                    logger.error(f"Skipping job '{job.name}' because a dependency was skipped")
+                    skipped.add(id(job))
+                    changed = True
+
+        submitted = [job for job in jobs if id(job) not in skipped]
+        positions = {id(job): position for position, job in enumerate(submitted)}
+        job_items = []
+        for job in submitted:
+            deps = job.depends or []
             job_items.append(
                 {
                     "name": job.name,
-                    "task_id": task_id,
+                    "task_id": task_ids[job.task],
                     "parameters": job.parameters,
                     "priority": job.priority,
-                    "depends": {},
+                    "depends": {str(dep.id): dep.name for dep in deps if id(dep) not in positions},
+                    "depends_on_items": [positions[id(dep)] for dep in deps if id(dep) in positions],
                 }
             )
 
@@ -384,6 +575,8 @@ class Server:
         )
         if r.status_code == 201:
             data = r.json()
+            for job, job_id in zip(submitted, data["job_ids"]):
+                job.id = job_id
             logger.info(f"Added {data['created']} jobs to project {project.id}")
             return data["job_ids"]
         logger.error(f"Failed to add jobs: HTTP {r.status_code}")
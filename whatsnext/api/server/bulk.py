@@ -0,0 +1,184 @@
+"""Set-based job creation for batch submissions.
+
+Batches are written with a fixed number of statements however many jobs
+they hold: the jobs go in as multi-row ``INSERT ... RETURNING id``
+statements (SQLAlchemy's "insertmanyvalues" batching) and their dependency
+edges in one executemany. Each job's ``unmet_dependencies`` and initial
+status are computed up front from one locked read of the dependencies, so
+no row is touched twice.
+
+A batch can be a whole DAG: besides existing jobs, items may depend on other
+items of the same batch, by position or by name. These references are
+resolved with :func:`resolve_batch_dependencies`, which also rejects cycles
+with one topological sort of the batch. Existing jobs cannot depend on jobs
+that do not exist yet, so a cycle-free batch cannot close a cycle with the
+rest of the project.
+"""
+
+from collections import deque
+from itertools import chain
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .dependencies import parse_dependency_ids
+
+# Dependency states that block a new job from ever running
+_FAILED_STATES = (models.JobStatus.FAILED, models.JobStatus.BLOCKED)
+
+
+def resolve_batch_dependencies(items: Sequence[schemas.JobBatchItem]) -> List[List[int]]:
+    """Resolve the in-batch dependencies of each item to item positions.
+
+    Args:
+        items: The jobs of the batch.
+
+    Returns:
+        For each item, the positions of the items it depends on, without duplicates.
+
+    Raises:
+        HTTPException: 400 if a reference is out of range, names no item or
+            more than one item, points at the item itself, or the batch
+            contains a cycle.
+    """
+    positions_by_name: Dict[str, List[int]] = {}
+    for position, item in enumerate(items):
+        positions_by_name.setdefault(item.name, []).append(position)
+
+    batch_deps = []
+    for position, item in enumerate(items):
+        deps = []
+        for dep in item.depends_on_items:
+            if not 0 <= dep < len(items):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Job {position} depends on item {dep}, which is not in the batch.",
+                )
+            deps.append(dep)
+        for name in item.depends_on_names:
+            named = positions_by_name.get(name, [])
+            if len(named) != 1:
+                problem = "no job" if not named else f"{len(named)} jobs"
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Job {position} depends on '{name}', which names {problem} in the batch.",
+                )
+            deps.append(named[0])
+        deps = list(dict.fromkeys(deps))
+        if position in deps:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Job {position} cannot depend on itself.")
+        batch_deps.append(deps)
+
+    if len(topological_order(batch_deps)) < len(items):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Circular dependency detected. Cannot create jobs with these dependencies.",
+        )
+    return batch_deps
+
+
+def topological_order(batch_deps: Sequence[Sequence[int]]) -> List[int]:
+    """Order batch positions so every item comes after its dependencies.
+
+    Args:
+        batch_deps: For each item, the positions of the items it depends on.
+
+    Returns:
+        Positions in dependency order. Items on a cycle, and items
+        downstream of one, are left out.
+    """
+    dependents: List[List[int]] = [[] for _ in batch_deps]
+    remaining = [len(deps) for deps in batch_deps]
+    for position, deps in enumerate(batch_deps):
+        for dep in deps:
+            dependents[dep].append(position)
+
+    ready = deque(position for position, count in enumerate(remaining) if count == 0)
+    order = []
+    while ready:
+        position = ready.popleft()
+        order.append(position)
+        for dependent in dependents[position]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+    return order
+
+
+def insert_jobs(
+    db: Session,
+    project_id: int,
+    items: Sequence[schemas.JobBatchItem],
+    batch_deps: Optional[Sequence[Sequence[int]]] = None,
+) -> List[int]:
+    """Insert a batch of jobs with their dependency edges.
+
+    Dependencies on existing jobs must already exist in the project. They
+    are locked ``FOR SHARE`` while the batch is written, so a dependency
+    completing concurrently either is counted as completed here or sees the
+    new edges when it decrements its dependents. Jobs with a FAILED or
+    BLOCKED dependency, directly or through other jobs of the batch, are
+    created as BLOCKED.
+
+    Args:
+        db: Database session.
+        project_id: The project the jobs belong to.
+        items: The jobs to create.
+        batch_deps: In-batch dependencies as returned by
+            :func:`resolve_batch_dependencies` (None = no in-batch dependencies).
+
+    Returns:
+        IDs of the created jobs, in the order of ``items``.
+
+    Raises:
+        HTTPException: 400 if a dependency no longer exists.
+    """
+    if not items:
+        return []
+    if batch_deps is None:
+        batch_deps = [[] for _ in items]
+
+    dep_ids_per_item = [parse_dependency_ids(item.depends) for item in items]
+    all_dep_ids = list(dict.fromkeys(chain.from_iterable(dep_ids_per_item)))
+    dep_statuses: Dict[int, models.JobStatus] = {}
+    if all_dep_ids:
+        dep_statuses = dict(
+            db.execute(select(models.Job.id, models.Job.status).where(models.Job.id.in_(all_dep_ids)).with_for_update(read=True)).all()
+        )
+        # A dependency deleted since it was validated has no row left to lock
+        missing = sorted(set(all_dep_ids) - dep_statuses.keys())
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Dependency jobs {missing} not found for project id {project_id}.",
+            )
+
+    # New jobs are never COMPLETED, so every in-batch dependency is unmet
+    rows: List[Dict] = [{} for _ in items]
+    for position in topological_order(batch_deps):
+        item = items[position]
+        statuses = [dep_statuses[dep_id] for dep_id in dep_ids_per_item[position]]
+        statuses += [rows[dep]["status"] for dep in batch_deps[position]]
+        blocked = any(dep_status in _FAILED_STATES for dep_status in statuses)
+        rows[position] = {
+            "name": item.name,
+            "project_id": project_id,
+            "task_id": item.task_id,
+            "parameters": item.parameters,
+            "priority": item.priority,
+            "status": models.JobStatus.BLOCKED if blocked else models.JobStatus.PENDING,
+            "unmet_dependencies": sum(1 for dep_status in statuses if dep_status != models.JobStatus.COMPLETED),
+        }
+    job_ids = list(db.scalars(insert(models.Job).returning(models.Job.id, sort_by_parameter_order=True), rows))
+
+    edges = [
+        {"job_id": job_ids[position], "depends_on_id": dep_id}
+        for position, dep_ids in enumerate(dep_ids_per_item)
+        for dep_id in chain(dep_ids, (job_ids[dep] for dep in batch_deps[position]))
+    ]
+    if edges:
+        db.execute(insert(models.JobDependency), edges)
+    return job_ids
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional, Tuple
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -12,6 +12,16 @@ class Settings(BaseSettings):
     database_user: str = "postgres"
     database_password: str = "postgres"
     database_name: str = "whatsnext"
+    # Connection pool per engine: kept connections, extra connections under load,
+    # seconds to wait for a free connection, seconds after which connections are replaced
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30
+    database_pool_recycle: int = 3600
+    # Longest a single SQL statement may run before PostgreSQL cancels it (seconds, 0 = no limit)
+    database_statement_timeout: float = 0
+    # Serve fetch and heartbeat routes on an AsyncSession with asyncpg instead of the threadpool
+    async_database: bool = False
 
     # API key authentication (optional - if not set, authentication is disabled)
     api_keys: Optional[str] = None  # Comma-separated list of valid API keys
@@ -24,6 +34,36 @@ class Settings(BaseSettings):
 
     # Rate limiting (requests per minute, 0 = disabled)
     rate_limit_per_minute: int = 0
+    # Comma-separated "<path pattern>=<requests per minute>" limits overriding rate_limit_per_minute,
+    # "*" matching one path segment, e.g. "/clients/*/heartbeat=600,/projects/*/fetch_job=0" (0 = unlimited)
+    rate_limit_routes: str = ""
+    # Most client IPs each rate limit tracks; the least recently seen are forgotten first
+    rate_limit_max_clients: int = 10000
+    # Where rate limits count requests: "local" per server process, or "postgres" shared by all processes
+    rate_limit_backend: Literal["local", "postgres"] = "local"
+    # How often each server process syncs its counts with the postgres backend (seconds)
+    rate_limit_sync_interval: float = 1
+    # Server processes sharing the postgres backend (workers times hosts); each admits its share
+    # of a client's limit until the client's counts are first synced
+    rate_limit_processes: int = 1
+
+    # Longest long-poll wait accepted by fetch_job / fetch_jobs (seconds)
+    max_fetch_wait: int = 60
+    # Share job changes between server processes via PostgreSQL LISTEN/NOTIFY
+    job_notifications: bool = True
+    # Half-life of the recent consumption used to share workers between projects (seconds)
+    fair_share_half_life: int = 3600
+
+    # Lease of a job claimed by a registered client, renewed by its heartbeats (seconds)
+    job_lease_seconds: int = 300
+    # How often each server process requeues jobs with expired leases (seconds, 0 = never)
+    lease_reap_interval: int = 30
+    # Claims after which a job whose lease expires is FAILED instead of requeued (0 = unlimited)
+    max_job_attempts: int = 3
+    # How often each server process writes buffered client heartbeats (seconds, 0 = write each heartbeat immediately)
+    heartbeat_flush_interval: float = 5
+    # How long each server process serves the same GET /status/summary snapshot (seconds, 0 = never cached)
+    status_summary_ttl: float = 5
 
     def get_api_keys(self) -> List[str]:
         """Return list of valid API keys, or empty list if auth is disabled."""
@@ -31,6 +71,18 @@ class Settings(BaseSettings):
             return []
         return [key.strip() for key in self.api_keys.split(",") if key.strip()]
 
+    def get_rate_limit_routes(self) -> List[Tuple[str, int]]:
+        """Return the (path pattern, requests per minute) rules of rate_limit_routes."""
+        routes = []
+        for rule in self.rate_limit_routes.split(","):
+            if not rule.strip():
+                continue
+            pattern, sep, limit = rule.rpartition("=")
+            if not sep or not pattern.strip() or not limit.strip().isdigit():
+                raise ValueError(f"Invalid rate_limit_routes rule {rule.strip()!r}, expected '<path pattern>=<requests per minute>'")
+            routes.append((pattern.strip(), int(limit)))
+        return routes
+
     def get_cors_origins(self) -> List[str]:
         """Return list of allowed CORS origins."""
         if self.cors_origins == "*":
@@ -45,6 +97,11 @@ class DBSettings:
         self.user = settings.database_user
         self.password = settings.database_password
         self.database = settings.database_name
+        self.pool_size = settings.database_pool_size
+        self.max_overflow = settings.database_max_overflow
+        self.pool_timeout = settings.database_pool_timeout
+        self.pool_recycle = settings.database_pool_recycle
+        self.statement_timeout = settings.database_statement_timeout
 
 
 settings = Settings()
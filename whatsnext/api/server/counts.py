@@ -0,0 +1,157 @@
+"""Per-project job counts by status, task and priority.
+
+``project_job_counts`` holds the number of jobs per (project, status), split
+over :data:`models.JOB_COUNT_STRIPES` stripes. Statement triggers on ``jobs``
+(see :data:`models.JOB_COUNTS_TRIGGERS`) apply every insert, delete and status
+change to it in the same transaction, so a count is the sum of at most that
+many rows found with a primary key range scan, instead of a ``COUNT(*)``
+over the project's jobs.
+
+Statements that change jobs of a project update the counter rows of their
+backend's stripe and hold those locks until commit, so concurrent claims
+of one project only wait for each other when their backends share a
+stripe. :func:`recount_jobs` rebuilds the table from ``jobs`` should it
+ever drift.
+
+Counts by task and by priority are not maintained; :func:`count_jobs_by_task`
+and :func:`count_pending_by_priority` aggregate them with ``GROUP BY`` in
+the database, so only one row per group leaves it.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def get_job_counts(db: Session, project_id: int) -> Dict[models.JobStatus, int]:
+    """Get the number of jobs of a project in each status.
+
+    Args:
+        db: Database session.
+        project_id: The project to count.
+
+    Returns:
+        Mapping of every job status to its number of jobs.
+    """
+    rows = db.execute(
+        select(models.ProjectJobCount.status, func.sum(models.ProjectJobCount.n))
+        .where(models.ProjectJobCount.project_id == project_id)
+        .group_by(models.ProjectJobCount.status)
+    ).all()
+    counts = dict.fromkeys(models.JobStatus, 0)
+    counts.update({job_status: n for job_status, n in rows})
+    return counts
+
+
+def count_jobs(db: Session, project_id: int, job_status: models.JobStatus) -> int:
+    """Get the number of jobs of a project in one status.
+
+    Args:
+        db: Database session.
+        project_id: The project to count.
+        job_status: The status to count.
+
+    Returns:
+        Number of jobs of the project in ``job_status``.
+    """
+    return count_jobs_of_projects(db, [project_id], job_status)
+
+
+def count_jobs_of_projects(db: Session, project_ids: Sequence[int], job_status: models.JobStatus) -> int:
+    """Get the number of jobs of several projects together in one status.
+
+    Args:
+        db: Database session.
+        project_ids: The projects to count.
+        job_status: The status to count.
+
+    Returns:
+        Number of jobs of all the projects in ``job_status``.
+    """
+    return db.scalar(
+        select(func.coalesce(func.sum(models.ProjectJobCount.n), 0)).where(
+            models.ProjectJobCount.project_id.in_(project_ids),
+            models.ProjectJobCount.status == job_status,
+        )
+    )
+
+
+def count_jobs_by_task(db: Session, project_id: int) -> List[Tuple[Optional[int], Optional[str], int]]:
+    """Get the number of jobs of a project per task.
+
+    Args:
+        db: Database session.
+        project_id: The project to count.
+
+    Returns:
+        ``(task_id, task_name, n)`` per task that has jobs, the most jobs first.
+        Jobs without a task are counted under ``(None, None)``.
+    """
+    n = func.count().label("n")
+    rows = db.execute(
+        select(models.Job.task_id, models.Task.name, n)
+        .outerjoin(models.Task, models.Task.id == models.Job.task_id)
+        .where(models.Job.project_id == project_id)
+        .group_by(models.Job.task_id, models.Task.name)
+        .order_by(n.desc(), models.Job.task_id)
+    ).all()
+    return [(task_id, name, count) for task_id, name, count in rows]
+
+
+def count_pending_by_priority(db: Session, project_id: int, band_width: int) -> Tuple[List[Tuple[int, int]], Optional[float]]:
+    """Get the number of pending jobs of a project per priority band, and the age of the oldest.
+
+    Both come from one pass over the project's pending jobs.
+
+    Args:
+        db: Database session.
+        project_id: The project to count.
+        band_width: Number of priority values per band; a band starts at a
+            multiple of it.
+
+    Returns:
+        ``(lowest priority of the band, n)`` per non-empty band, the highest
+        band first, and the seconds since the oldest pending job was created
+        (None without pending jobs).
+    """
+    band = (func.floor(models.Job.priority / float(band_width)) * band_width).label("band")
+    rows = db.execute(
+        select(band, func.count(), func.extract("epoch", func.now() - func.min(models.Job.created_at)))
+        .where(models.Job.project_id == project_id, models.Job.status == models.JobStatus.PENDING)
+        .group_by(band)
+        .order_by(band.desc())
+    ).all()
+    ages = [age for _, _, age in rows]
+    return [(int(lowest), n) for lowest, n, _ in rows], float(max(ages)) if ages else None
+
+
+def recount_jobs(db: Session, project_id: Optional[int] = None) -> int:
+    """Recompute job counts from the jobs table.
+
+    Takes a ``SHARE`` lock on ``jobs`` until the caller commits, so jobs
+    cannot change while the counts are rebuilt; reads are not blocked. The
+    counts are written to stripe 0.
+
+    Args:
+        db: Database session.
+        project_id: Only recount this project (None = all projects).
+
+    Returns:
+        Number of counter rows written.
+    """
+    db.execute(text("LOCK TABLE jobs IN SHARE MODE"))
+    stale = delete(models.ProjectJobCount)
+    counted = select(models.Job.project_id, models.Job.status, func.count()).group_by(models.Job.project_id, models.Job.status)
+    if project_id is not None:
+        stale = stale.where(models.ProjectJobCount.project_id == project_id)
+        counted = counted.where(models.Job.project_id == project_id)
+    db.execute(stale)
+    result = db.execute(
+        insert(models.ProjectJobCount).from_select(
+            [models.ProjectJobCount.project_id, models.ProjectJobCount.status, models.ProjectJobCount.n], counted
+        )
+    )
+    return result.rowcount
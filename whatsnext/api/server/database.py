@@ -1,23 +1,60 @@
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-from .config import db
+from .config import db, settings
+from .pool import PoolMetrics, instrumented_pool
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{db.user}:{db.password}@{db.hostname}:{db.port}/{db.database}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{db.user}:{db.password}@{db.hostname}:{db.port}/{db.database}"
+
+# PostgreSQL takes statement_timeout in milliseconds
+STATEMENT_TIMEOUT_MS = int(db.statement_timeout * 1000)
+
+# Checkout counters of the sync and async pools, reported by GET /metrics/pool
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
 
 # Configure connection pool for production use
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    pool_size=5,  # Number of connections to keep in the pool
-    max_overflow=10,  # Max additional connections beyond pool_size
+    poolclass=instrumented_pool(QueuePool, pool_metrics),
+    pool_size=db.pool_size,  # Number of connections to keep in the pool
+    max_overflow=db.max_overflow,  # Max additional connections beyond pool_size
+    pool_timeout=db.pool_timeout,  # Seconds to wait for a connection before failing
     pool_pre_ping=True,  # Verify connections are alive before using
-    pool_recycle=3600,  # Recycle connections after 1 hour to prevent stale connections
+    pool_recycle=db.pool_recycle,  # Recycle connections to prevent stale connections
+    connect_args={"options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"} if STATEMENT_TIMEOUT_MS else {},
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the hot routes (fetching jobs, heartbeats), only with the async_database setting
+async_engine = None
+AsyncSessionLocal = None
+if settings.async_database:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=instrumented_pool(AsyncAdaptedQueuePool, async_pool_metrics),
+        pool_size=db.pool_size,
+        max_overflow=db.max_overflow,
+        pool_timeout=db.pool_timeout,
+        pool_pre_ping=True,
+        pool_recycle=db.pool_recycle,
+        connect_args={"server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}} if STATEMENT_TIMEOUT_MS else {},
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 Base = declarative_base()
 
+T = TypeVar("T")
+
 
 def get_db():
     db = SessionLocal()
@@ -25,3 +62,45 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+class SessionRunner:
+    """Runs a request's database work from an ``async def`` route.
+
+    The work is a plain function taking a :class:`Session` as its first
+    argument, so the scheduler, lease and notification code is shared by
+    both database modes. This runner calls it in the threadpool.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``fn(session, *args, **kwargs)`` without blocking the event loop."""
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+
+class AsyncSessionRunner(SessionRunner):
+    """Runs a request's database work on an ``AsyncSession``.
+
+    ``AsyncSession.run_sync`` runs the work on the event loop with the async
+    driver, so a request waiting on the database occupies no thread.
+    """
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``fn(session, *args, **kwargs)`` on the event loop."""
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+
+async def get_session_runner(db: Session = Depends(get_db)) -> AsyncIterator[SessionRunner]:
+    """Provide a runner for the configured database mode.
+
+    In sync mode it wraps the session of :func:`get_db`. In async mode that
+    session stays unused, and since sessions only connect on first use, it
+    costs no connection.
+    """
+    if AsyncSessionLocal is None:
+        yield SessionRunner(db)
+        return
+    async with AsyncSessionLocal() as session:
+        yield AsyncSessionRunner(session)
@@ -1,25 +1,152 @@
-"""Job dependency resolution and validation utilities."""
+"""Job dependency resolution and validation utilities.
 
-from typing import Dict, List, Set
+Dependencies are stored as edges in the ``job_dependencies`` table, indexed in
+both directions, so "what does X wait for" and "who waits for X" are both
+index lookups.
 
-from sqlalchemy.orm import Session
+Each job also carries ``unmet_dependencies``, the number of its dependencies
+that are not COMPLETED. It is kept up to date in the same transaction as the
+change that affects it (see :func:`set_dependencies`,
+:func:`apply_status_change` and :func:`release_dependents`), so a job is
+ready exactly when it is PENDING with ``unmet_dependencies == 0``.
+"""
+
+from typing import Any, Dict, List
+
+from sqlalchemy import Select, delete, exists, func, insert, select, update
+from sqlalchemy.orm import Session, aliased
 
 from . import models
 
 
-def get_dependency_ids(job: models.Job) -> List[int]:
-    """Extract dependency job IDs from a job's depends field.
+def parse_dependency_ids(depends: Dict[str, Any]) -> List[int]:
+    """Extract dependency job IDs from an API ``depends`` mapping.
+
+    Args:
+        depends: Dependencies as sent by clients, ``{str(job_id): job_name}``.
+
+    Returns:
+        List of job IDs, without duplicates.
+    """
+    if not depends:
+        return []
+    return list(dict.fromkeys(int(job_id) for job_id in depends.keys()))
+
+
+def get_dependency_ids(db: Session, job: models.Job) -> List[int]:
+    """Get the IDs of the jobs a job depends on.
 
     Args:
+        db: Database session.
         job: The job to get dependencies for.
 
     Returns:
         List of job IDs that this job depends on.
     """
-    if not job.depends:
-        return []
-    # depends is stored as {str(job_id): job_name}
-    return [int(job_id) for job_id in job.depends.keys()]
+    return list(db.scalars(select(models.JobDependency.depends_on_id).where(models.JobDependency.job_id == job.id)))
+
+
+def set_dependencies(db: Session, job_id: int, dep_ids: List[int]) -> None:
+    """Replace the dependency edges of a job and recount its unmet dependencies.
+
+    The dependency rows are locked ``FOR SHARE`` while counting, so a
+    dependency completing concurrently either is counted as completed here or
+    sees the new edge when it decrements its dependents.
+
+    Args:
+        db: Database session.
+        job_id: The job whose dependencies are replaced.
+        dep_ids: IDs of the jobs it should depend on.
+    """
+    db.execute(delete(models.JobDependency).where(models.JobDependency.job_id == job_id))
+    unmet = 0
+    if dep_ids:
+        db.execute(insert(models.JobDependency), [{"job_id": job_id, "depends_on_id": dep_id} for dep_id in dep_ids])
+        statuses = db.scalars(select(models.Job.status).where(models.Job.id.in_(dep_ids)).with_for_update(read=True))
+        unmet = sum(1 for dep_status in statuses if dep_status != models.JobStatus.COMPLETED)
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(unmet_dependencies=unmet).execution_options(synchronize_session=False))
+
+
+def apply_status_change(db: Session, job_id: int, old_status: models.JobStatus, new_status: models.JobStatus) -> None:
+    """Update the unmet dependency counts of a job's dependents after a status change.
+
+    Dependents lose one unmet dependency when the job becomes COMPLETED and
+    gain one back when it leaves COMPLETED. Call this in the transaction that
+    changes the status.
+
+    Args:
+        db: Database session.
+        job_id: The job whose status changed.
+        old_status: Status before the change.
+        new_status: Status after the change.
+    """
+    was_completed = old_status == models.JobStatus.COMPLETED
+    is_completed = new_status == models.JobStatus.COMPLETED
+    if was_completed == is_completed:
+        return
+
+    delta = -1 if is_completed else 1
+    dependents = select(models.JobDependency.job_id).where(models.JobDependency.depends_on_id == job_id)
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id.in_(dependents))
+        .values(unmet_dependencies=models.Job.unmet_dependencies + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_dependents(db: Session, job_ids: Select) -> None:
+    """Drop jobs that are about to be deleted from their dependents' unmet counts.
+
+    Deleting a job removes its dependency edges, so dependents stop waiting
+    for it. Call this before deleting, in the same transaction.
+
+    Args:
+        db: Database session.
+        job_ids: SELECT of the IDs of the jobs being deleted.
+    """
+    dependency = aliased(models.Job)
+    released = (
+        select(models.JobDependency.job_id, func.count().label("released"))
+        .join(dependency, dependency.id == models.JobDependency.depends_on_id)
+        .where(models.JobDependency.depends_on_id.in_(job_ids), dependency.status != models.JobStatus.COMPLETED)
+        .group_by(models.JobDependency.job_id)
+        .subquery()
+    )
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == released.c.job_id)
+        .values(unmet_dependencies=models.Job.unmet_dependencies - released.c.released)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def dependencies_completed_clause(job_id_column=models.Job.id):
+    """SQL condition that is true when every dependency of a job is COMPLETED.
+
+    Args:
+        job_id_column: Column holding the ID of the job being tested.
+    """
+    dependency = aliased(models.Job)
+    return ~exists().where(
+        models.JobDependency.job_id == job_id_column,
+        models.JobDependency.depends_on_id == dependency.id,
+        dependency.status != models.JobStatus.COMPLETED,
+    )
+
+
+def failed_dependency_clause(job_id_column=models.Job.id):
+    """SQL condition that is true when any dependency of a job is FAILED or BLOCKED.
+
+    Args:
+        job_id_column: Column holding the ID of the job being tested.
+    """
+    dependency = aliased(models.Job)
+    return exists().where(
+        models.JobDependency.job_id == job_id_column,
+        models.JobDependency.depends_on_id == dependency.id,
+        dependency.status.in_([models.JobStatus.FAILED, models.JobStatus.BLOCKED]),
+    )
 
 
 def are_dependencies_completed(db: Session, job: models.Job) -> bool:
@@ -32,18 +159,7 @@ def are_dependencies_completed(db: Session, job: models.Job) -> bool:
     Returns:
         True if all dependencies are COMPLETED, False otherwise.
     """
-    dep_ids = get_dependency_ids(job)
-    if not dep_ids:
-        return True
-
-    # Query all dependency jobs
-    dep_jobs = db.query(models.Job).filter(models.Job.id.in_(dep_ids)).all()
-
-    # All dependencies must exist and be COMPLETED
-    if len(dep_jobs) != len(dep_ids):
-        return False  # Some dependencies don't exist
-
-    return all(dep.status == models.JobStatus.COMPLETED for dep in dep_jobs)
+    return bool(db.scalar(select(dependencies_completed_clause(job.id))))
 
 
 def has_failed_dependency(db: Session, job: models.Job) -> bool:
@@ -56,31 +172,23 @@ def has_failed_dependency(db: Session, job: models.Job) -> bool:
     Returns:
         True if any dependency is FAILED or BLOCKED, False otherwise.
     """
-    dep_ids = get_dependency_ids(job)
-    if not dep_ids:
-        return False
-
-    # Check if any dependency is FAILED or BLOCKED
-    failed_count = (
-        db.query(models.Job)
-        .filter(
-            models.Job.id.in_(dep_ids),
-            models.Job.status.in_([models.JobStatus.FAILED, models.JobStatus.BLOCKED]),
-        )
-        .count()
-    )
-
-    return failed_count > 0
+    return bool(db.scalar(select(failed_dependency_clause(job.id))))
 
 
 def detect_circular_dependency(
     db: Session,
     job_id: int,
-    new_depends: Dict[str, str],
+    new_depends: Dict[str, Any],
     project_id: int,
 ) -> bool:
     """Detect if adding new dependencies would create a circular dependency.
 
+    A cycle appears exactly when the job is among the transitive
+    dependencies of one of its new dependencies. Only those dependencies are
+    walked, with a ``WITH RECURSIVE`` query over the indexed edge table that
+    stops as soon as the job is reached, so the cost depends on the size of
+    the affected subgraph rather than of the project.
+
     Args:
         db: Database session.
         job_id: The ID of the job being updated (0 for new jobs).
@@ -93,47 +201,31 @@ def detect_circular_dependency(
     if not new_depends:
         return False
 
-    new_dep_ids = {int(dep_id) for dep_id in new_depends.keys()}
+    new_dep_ids = parse_dependency_ids(new_depends)
 
     # If we're adding a dependency on ourselves, that's circular
     if job_id in new_dep_ids:
         return True
-
-    # Build the dependency graph for this project
-    all_jobs = db.query(models.Job).filter(models.Job.project_id == project_id).all()
-    job_deps: Dict[int, Set[int]] = {}
-
-    for job in all_jobs:
-        job_deps[job.id] = set(get_dependency_ids(job))
-
-    # Add/update the proposed dependencies
-    job_deps[job_id] = new_dep_ids
-
-    # DFS to detect cycles
-    visited: Set[int] = set()
-    rec_stack: Set[int] = set()
-
-    def has_cycle(node: int) -> bool:
-        visited.add(node)
-        rec_stack.add(node)
-
-        for dep_id in job_deps.get(node, set()):
-            if dep_id not in visited:
-                if has_cycle(dep_id):
-                    return True
-            elif dep_id in rec_stack:
-                return True
-
-        rec_stack.remove(node)
+    # Nothing depends on a new job yet, so it cannot close a cycle
+    if not job_id:
         return False
 
-    # Check for cycles starting from the job being updated
-    return has_cycle(job_id)
+    ancestors = (
+        select(models.Job.id.label("id"))
+        .where(models.Job.id.in_(new_dep_ids), models.Job.project_id == project_id)
+        .cte("ancestors", recursive=True)
+    )
+    ancestors = ancestors.union(select(models.JobDependency.depends_on_id).join(ancestors, models.JobDependency.job_id == ancestors.c.id))
+    return db.scalar(select(ancestors.c.id).where(ancestors.c.id == job_id).limit(1)) is not None
 
 
 def propagate_failure(db: Session, failed_job: models.Job) -> int:
     """Mark all jobs that depend on a failed job as BLOCKED.
 
+    The downstream closure is computed and blocked in one ``WITH RECURSIVE``
+    statement. Blocking follows PENDING dependents only, so jobs that already
+    started, and everything downstream of them, are left alone.
+
     Args:
         db: Database session.
         failed_job: The job that failed.
@@ -141,82 +233,19 @@ def propagate_failure(db: Session, failed_job: models.Job) -> int:
     Returns:
         Number of jobs marked as BLOCKED.
     """
-    blocked_count = 0
-    failed_job_id: int = failed_job.id  # type: ignore[assignment]
-    jobs_to_check: List[int] = [failed_job_id]
-    processed: Set[int] = set()
-
-    while jobs_to_check:
-        current_id = jobs_to_check.pop(0)
-        if current_id in processed:
-            continue
-        processed.add(current_id)
-
-        # Find all PENDING jobs that depend on this job
-        dependent_jobs = (
-            db.query(models.Job)
-            .filter(
-                models.Job.project_id == failed_job.project_id,
-                models.Job.status == models.JobStatus.PENDING,
-            )
-            .all()
-        )
-
-        for job in dependent_jobs:
-            dep_ids = get_dependency_ids(job)
-            if current_id in dep_ids:
-                # This job depends on the failed job, mark it as BLOCKED
-                job.status = models.JobStatus.BLOCKED
-                blocked_count += 1
-                # Also propagate to jobs that depend on this one
-                job_id: int = job.id  # type: ignore[assignment]
-                jobs_to_check.append(job_id)
-
-    return blocked_count
-
-
-def get_jobs_with_completed_dependencies(
-    db: Session,
-    project_id: int,
-    available_cpu: int = 0,
-    available_accelerators: int = 0,
-) -> List[models.Job]:
-    """Get all PENDING jobs whose dependencies are all COMPLETED.
-
-    Args:
-        db: Database session.
-        project_id: The project to query.
-        available_cpu: Filter by CPU requirement (0 = no filter).
-        available_accelerators: Filter by accelerator requirement (0 = no filter).
-
-    Returns:
-        List of jobs ready to be executed.
-    """
-    pending_jobs = (
-        db.query(models.Job)
-        .filter(
-            models.Job.project_id == project_id,
-            models.Job.status == models.JobStatus.PENDING,
-        )
-        .order_by(models.Job.priority.desc())
-        .all()
+    pending_dependents = (
+        select(models.JobDependency.job_id.label("id"))
+        .join(models.Job, models.Job.id == models.JobDependency.job_id)
+        .where(models.Job.status == models.JobStatus.PENDING)
     )
-
-    ready_jobs = []
-    for job in pending_jobs:
-        if are_dependencies_completed(db, job):
-            # Check resource requirements if filters are provided
-            if available_cpu > 0 or available_accelerators > 0:
-                task = db.query(models.Task).filter(models.Task.id == job.task_id).first()
-                if task:
-                    if available_cpu > 0 and task.required_cpu > available_cpu:
-                        continue  # Job requires more CPU than available
-                    if available_accelerators > 0 and task.required_accelerators > available_accelerators:
-                        continue  # Job requires more accelerators than available
-            ready_jobs.append(job)
-        elif has_failed_dependency(db, job):
-            # Mark as blocked if a dependency failed
-            job.status = models.JobStatus.BLOCKED
-            db.flush()
-
-    return ready_jobs
+    downstream = pending_dependents.where(models.JobDependency.depends_on_id == failed_job.id).cte("downstream", recursive=True)
+    downstream = downstream.union(pending_dependents.join(downstream, models.JobDependency.depends_on_id == downstream.c.id))
+
+    blocked_ids = db.scalars(
+        update(models.Job)
+        .where(models.Job.id.in_(select(downstream.c.id)), models.Job.status == models.JobStatus.PENDING)
+        .values(status=models.JobStatus.BLOCKED)
+        .returning(models.Job.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return len(blocked_ids)
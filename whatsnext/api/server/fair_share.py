@@ -0,0 +1,123 @@
+"""Weighted fair sharing of workers between projects.
+
+A worker serving several projects asks for the next job of any of them.
+Each project's recent consumption is kept in ``project_usage``: the number
+of jobs claimed through this path, decayed exponentially with the
+``fair_share_half_life`` setting. The next job comes from the project with
+the lowest consumption per unit of weight that has a job the worker can
+run, so over time every project receives a share of the workers in
+proportion to its weight, and a project without ready jobs never leaves the
+worker idle.
+
+Because usage lives in the database, all server processes and all workers
+serving the same projects share one account.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .scheduler import claim_next_job
+
+
+def _decay(age_seconds, half_life: float):
+    """SQL factor that decays a value recorded ``age_seconds`` ago."""
+    return func.power(0.5, age_seconds / half_life)
+
+
+def get_usage(db: Session, project_ids: Sequence[int], half_life: float) -> Dict[int, float]:
+    """Get the decayed recent consumption of projects.
+
+    Args:
+        db: Database session.
+        project_ids: The projects to read.
+        half_life: Seconds after which consumption counts half.
+
+    Returns:
+        Consumption per project; projects that never consumed anything are 0.
+    """
+    age = func.extract("epoch", func.now() - models.ProjectUsage.updated_at)
+    rows = db.execute(
+        select(models.ProjectUsage.project_id, models.ProjectUsage.usage * _decay(age, half_life)).where(
+            models.ProjectUsage.project_id.in_(project_ids)
+        )
+    ).all()
+    usage = dict.fromkeys(project_ids, 0.0)
+    usage.update({project_id: value for project_id, value in rows})
+    return usage
+
+
+def record_usage(db: Session, project_id: int, amount: float, half_life: float) -> None:
+    """Add consumption to a project, decaying what was recorded before.
+
+    Args:
+        db: Database session.
+        project_id: The project that consumed.
+        amount: Consumption to add, e.g. the number of jobs claimed.
+        half_life: Seconds after which consumption counts half.
+    """
+    table = models.ProjectUsage.__table__
+    age = func.extract("epoch", func.now() - table.c.updated_at)
+    stmt = insert(table).values(project_id=project_id, usage=amount, updated_at=func.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.project_id],
+        set_={"usage": table.c.usage * _decay(age, half_life) + stmt.excluded.usage, "updated_at": func.now()},
+    )
+    db.execute(stmt)
+
+
+def share_order(usage: Dict[int, float], weights: Dict[int, float]) -> List[int]:
+    """Order projects by how far they are below their fair share.
+
+    Projects are ordered by consumption per unit of weight. Ties go to the
+    project with the larger weight, then to the one listed first.
+
+    Args:
+        usage: Recent consumption per project.
+        weights: Positive weight per project, in the caller's order.
+
+    Returns:
+        Project IDs, the most underserved first.
+    """
+    position = {project_id: i for i, project_id in enumerate(weights)}
+    return sorted(weights, key=lambda project_id: (usage[project_id] / weights[project_id], -weights[project_id], position[project_id]))
+
+
+def claim_fair_share(
+    db: Session,
+    weights: Dict[int, float],
+    half_life: float,
+    available_cpu: int = 0,
+    available_accelerators: int = 0,
+    lease_owner: Optional[str] = None,
+) -> Optional[models.Job]:
+    """Claim the next job from several projects by weighted fair share.
+
+    Projects are tried in :func:`share_order`; the first project with a
+    ready job that fits the resources wins and its consumption grows by one
+    job. The usage row is updated in the claim's transaction, so a claim
+    that is rolled back is not accounted.
+
+    Args:
+        db: Database session.
+        weights: Positive weight per project.
+        half_life: Seconds after which consumption counts half.
+        available_cpu: Only claim jobs needing at most this many CPUs (0 = no filter).
+        available_accelerators: Only claim jobs needing at most this many accelerators (0 = no filter).
+        lease_owner: ID of the client claiming the job (None = no lease).
+
+    Returns:
+        The claimed job, or None if no project has a ready job.
+    """
+    usage = get_usage(db, list(weights), half_life)
+    for project_id in share_order(usage, weights):
+        job = claim_next_job(
+            db, project_id, available_cpu=available_cpu, available_accelerators=available_accelerators, lease_owner=lease_owner
+        )
+        if job is not None:
+            record_usage(db, project_id, 1, half_life)
+            return job
+    return None
@@ -0,0 +1,134 @@
+"""Write-coalescing buffer for client heartbeats.
+
+Workers heartbeat every few seconds, and writing each heartbeat in its own
+transaction turns a large fleet into a constant stream of tiny writes and
+dead ``clients`` tuples. Instead, each server process keeps the latest
+heartbeat time per client in memory and writes all of them every
+``heartbeat_flush_interval`` seconds: one ``UPDATE clients ... FROM
+(VALUES ...)`` for ``last_heartbeat`` and one for the clients' job leases,
+however many heartbeats arrived.
+
+``last_heartbeat`` is the time the heartbeat was received, not the time it
+was written, so liveness reads are at most one flush interval stale. The
+existence check that lets an unknown client get a 404 is served from a
+per-process set of known client IDs; a client deleted through another
+process is dropped from the set by the first flush that no longer finds it.
+"""
+
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from sqlalchemy import TIMESTAMP, String, column, update, values
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .leases import renew_leases
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatBuffer:
+    """Per-process buffer of client heartbeats, flushed in bulk."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[str, datetime] = {}
+        self._known: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether a background thread flushes the buffer."""
+        return self._thread is not None
+
+    def is_known(self, client_id: str) -> bool:
+        """Check whether a client is known to exist, without a query."""
+        with self._lock:
+            return client_id in self._known
+
+    def add_known(self, client_id: str) -> None:
+        """Remember that a client exists."""
+        with self._lock:
+            self._known.add(client_id)
+
+    def forget(self, client_id: str) -> None:
+        """Forget a deleted client and drop its buffered heartbeat."""
+        with self._lock:
+            self._known.discard(client_id)
+            self._pending.pop(client_id, None)
+
+    def record(self, client_id: str) -> None:
+        """Buffer a heartbeat received now."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending[client_id] = now
+
+    def flush(self, db: Session) -> int:
+        """Write the buffered heartbeats, renew the clients' job leases and commit.
+
+        If writing or committing fails, the heartbeats are put back unless
+        newer ones arrived meanwhile.
+
+        Args:
+            db: Database session.
+
+        Returns:
+            Number of clients written.
+        """
+        with self._lock:
+            heartbeats, self._pending = self._pending, {}
+        if not heartbeats:
+            return 0
+        try:
+            beats = values(column("id", String), column("at", TIMESTAMP(timezone=True)), name="beats").data(sorted(heartbeats.items()))
+            written = set(
+                db.scalars(
+                    update(models.Client)
+                    .where(models.Client.id == beats.c.id)
+                    .values(last_heartbeat=beats.c.at)
+                    .returning(models.Client.id)
+                    .execution_options(synchronize_session=False)
+                )
+            )
+            renew_leases(db, {client_id: at for client_id, at in heartbeats.items() if client_id in written})
+            db.commit()
+        except Exception:
+            with self._lock:
+                for client_id, at in heartbeats.items():
+                    self._pending.setdefault(client_id, at)
+            raise
+        with self._lock:
+            # Clients deleted meanwhile get a 404 on their next heartbeat
+            self._known -= heartbeats.keys() - written
+        return len(written)
+
+    def start(self, session_factory: sessionmaker, interval: float) -> None:
+        """Flush every ``interval`` seconds in a daemon thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory, interval), name="whatsnext-heartbeats", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread after a last flush."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _flush_in_session(self, session_factory: sessionmaker) -> None:
+        try:
+            with session_factory() as db:
+                self.flush(db)
+        except Exception:
+            logger.exception("Flushing client heartbeats failed")
+
+    def _run(self, session_factory: sessionmaker, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self._flush_in_session(session_factory)
+        self._flush_in_session(session_factory)
+
+
+heartbeat_buffer = HeartbeatBuffer()
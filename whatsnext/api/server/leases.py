@@ -0,0 +1,150 @@
+"""Job leases: requeueing jobs of workers that disappeared.
+
+A job claimed by a registered client carries a lease: ``lease_owner`` is the
+client ID and ``lease_expires_at`` the time until which the client is
+trusted to be working on it (``job_lease_seconds`` after the claim). Every
+heartbeat of the client renews the leases of its QUEUED and RUNNING jobs
+(written in bulk with the buffered heartbeats, see :mod:`.heartbeats`), and
+the lease is dropped when the job leaves those states.
+
+A client that dies stops heartbeating. Every server process runs a
+:class:`LeaseReaper` that periodically returns jobs with expired leases to
+PENDING, so lost capacity comes back within one lease period plus one reap
+interval. A job that has already been claimed ``max_job_attempts`` times is
+marked FAILED instead, and its dependents BLOCKED, so a job that kills its
+workers cannot take the whole fleet down one worker at a time.
+
+The reaper locks expired jobs with ``FOR UPDATE SKIP LOCKED``, so server
+processes reaping at the same time never handle the same job twice.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Mapping, Optional, Tuple
+
+from sqlalchemy import TIMESTAMP, String, column, func, select, update, values
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .config import settings
+from .dependencies import propagate_failure
+from .notifier import announce
+
+logger = logging.getLogger(__name__)
+
+# Job states a lease covers
+LEASED_STATES = (models.JobStatus.QUEUED, models.JobStatus.RUNNING)
+
+# Values that drop a job's lease
+NO_LEASE = {"lease_owner": None, "lease_expires_at": None}
+
+
+def renew_leases(db: Session, heartbeats: Mapping[str, datetime]) -> int:
+    """Extend the leases of all jobs the given clients are working on.
+
+    All clients are renewed with one ``UPDATE ... FROM (VALUES ...)``.
+
+    Args:
+        db: Database session.
+        heartbeats: Time of the latest heartbeat per client ID; leases run
+            ``job_lease_seconds`` from it.
+
+    Returns:
+        Number of renewed leases.
+    """
+    if not heartbeats:
+        return 0
+    beats = values(column("client_id", String), column("at", TIMESTAMP(timezone=True)), name="beats").data(list(heartbeats.items()))
+    result = db.execute(
+        update(models.Job)
+        .where(models.Job.lease_owner == beats.c.client_id, models.Job.status.in_(LEASED_STATES))
+        .values(lease_expires_at=beats.c.at + timedelta(seconds=settings.job_lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def reap_expired_leases(db: Session, max_attempts: int) -> Tuple[int, int]:
+    """Requeue or fail the jobs whose lease expired.
+
+    Call in a transaction of its own and commit afterwards.
+
+    Args:
+        db: Database session.
+        max_attempts: Claims after which an expired job is FAILED instead of
+            requeued (0 = always requeue).
+
+    Returns:
+        Number of requeued jobs and number of failed jobs.
+    """
+    expired = select(models.Job.id).where(
+        models.Job.lease_expires_at < func.now(),
+        models.Job.status.in_(LEASED_STATES),
+    )
+
+    requeue = expired if max_attempts <= 0 else expired.where(models.Job.attempts < max_attempts)
+    requeued_projects = db.scalars(
+        update(models.Job)
+        .where(models.Job.id.in_(requeue.with_for_update(skip_locked=True)))
+        .values(status=models.JobStatus.PENDING, **NO_LEASE)
+        .returning(models.Job.project_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for project_id in set(requeued_projects):
+        announce(db, project_id)
+
+    failed_jobs = []
+    if max_attempts > 0:
+        exhausted = expired.where(models.Job.attempts >= max_attempts).with_for_update(skip_locked=True)
+        failed_jobs = db.scalars(
+            update(models.Job)
+            .where(models.Job.id.in_(exhausted))
+            .values(status=models.JobStatus.FAILED, **NO_LEASE)
+            .returning(models.Job)
+            .execution_options(synchronize_session=False)
+        ).all()
+        for job in failed_jobs:
+            propagate_failure(db, job)
+
+    if requeued_projects or failed_jobs:
+        logger.info(f"Lease expired: requeued {len(requeued_projects)} job(s), failed {len(failed_jobs)} job(s)")
+    return len(requeued_projects), len(failed_jobs)
+
+
+class LeaseReaper:
+    """Background thread running :func:`reap_expired_leases` periodically."""
+
+    def __init__(self, session_factory: sessionmaker, interval: float, max_attempts: int) -> None:
+        self._session_factory = session_factory
+        self._interval = interval
+        self._max_attempts = max_attempts
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start reaping in a daemon thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="whatsnext-lease-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the reaper and wait for its thread to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reap(self) -> Tuple[int, int]:
+        """Reap once in a new session."""
+        with self._session_factory() as db:
+            reaped = reap_expired_leases(db, self._max_attempts)
+            db.commit()
+            return reaped
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self.reap()
+            except Exception:
+                logger.exception("Reaping expired job leases failed")
@@ -1,16 +1,23 @@
 import logging
 import os
+from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
+from fastapi.responses import JSONResponse
+from sqlalchemy import exc, text
 from sqlalchemy.orm import Session
 
 from . import models
 from .config import settings
-from .database import engine, get_db
+from .database import SQLALCHEMY_DATABASE_URL, SessionLocal, async_engine, async_pool_metrics, engine, get_db, pool_metrics
+from .heartbeats import heartbeat_buffer
+from .leases import LeaseReaper
 from .middleware import AuthenticationMiddleware, RateLimitMiddleware
-from .routers import clients, jobs, projects, tasks
+from .notifier import PostgresListener
+from .routers import clients, jobs, projects, scheduling, status, tasks
+from .shared_ratelimit import RateLimitSync
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +27,44 @@ logger = logging.getLogger(__name__)
 if os.environ.get("AUTO_CREATE_TABLES", "").lower() in ("true", "1", "yes"):
     models.Base.metadata.create_all(bind=engine)
 
+
+# Shares rate limit counts between server processes (rate_limit_backend=postgres)
+rate_limit_sync: Optional[RateLimitSync] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the job change feed listener, the lease reaper, the heartbeat flusher and the rate limit sync for the lifetime of the app."""
+    listener = None
+    if settings.job_notifications:
+        listener = PostgresListener(SQLALCHEMY_DATABASE_URL)
+        listener.start()
+    reaper = None
+    if settings.lease_reap_interval > 0:
+        reaper = LeaseReaper(SessionLocal, settings.lease_reap_interval, settings.max_job_attempts)
+        reaper.start()
+    if settings.heartbeat_flush_interval > 0:
+        heartbeat_buffer.start(SessionLocal, settings.heartbeat_flush_interval)
+    if rate_limit_sync is not None:
+        rate_limit_sync.start(SessionLocal, settings.rate_limit_sync_interval)
+    yield
+    if rate_limit_sync is not None:
+        rate_limit_sync.stop()
+    if heartbeat_buffer.running:
+        heartbeat_buffer.stop()
+    if reaper is not None:
+        reaper.stop()
+    if listener is not None:
+        listener.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
 app = FastAPI(
     title="WhatsNext API",
     description="Job queue and task management system API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -46,8 +87,17 @@ app.add_middleware(
 )
 
 # Add rate limiting middleware (if enabled)
-if settings.rate_limit_per_minute > 0:
-    app.add_middleware(RateLimitMiddleware, requests_per_minute=settings.rate_limit_per_minute)  # type: ignore[arg-type]
+rate_limit_routes = settings.get_rate_limit_routes()
+if settings.rate_limit_per_minute > 0 or any(limit > 0 for _, limit in rate_limit_routes):
+    if settings.rate_limit_backend == "postgres":
+        rate_limit_sync = RateLimitSync(max_keys=settings.rate_limit_max_clients, processes=settings.rate_limit_processes)
+    app.add_middleware(
+        RateLimitMiddleware,  # type: ignore[arg-type]
+        requests_per_minute=settings.rate_limit_per_minute,
+        route_limits=rate_limit_routes,
+        max_keys=settings.rate_limit_max_clients,
+        limiter_factory=rate_limit_sync.limiter if rate_limit_sync is not None else None,
+    )
 else:
     logger.warning(
         "SECURITY: Rate limiting is disabled. Set rate_limit_per_minute to enable. This makes the API vulnerable to denial-of-service attacks."
@@ -60,10 +110,23 @@ if api_keys:
 else:
     logger.warning("SECURITY: Authentication is disabled. Set api_keys to enable. All API endpoints are publicly accessible.")
 
+
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError):
+    """Answer 503 when no database connection became free within ``database_pool_timeout``."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database connection pool exhausted, retry later."},
+        headers={"Retry-After": "1"},
+    )
+
+
 app.include_router(jobs.router)
 app.include_router(projects.router)
 app.include_router(tasks.router)
 app.include_router(clients.router)
+app.include_router(scheduling.router)
+app.include_router(status.router)
 
 
 @app.get("/checkdb")
@@ -78,6 +141,15 @@ def check_db(db: Session = Depends(get_db)):
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
 
+@app.get("/metrics/pool")
+def pool_stats():
+    """Connection pool usage: checkouts, time spent waiting for a connection, overflow and timeouts."""
+    stats = {"sync": pool_metrics.snapshot(engine.pool)}
+    if async_engine is not None:
+        stats["async"] = async_pool_metrics.snapshot(async_engine.pool)
+    return stats
+
+
 @app.get("/")
 def check_connection():
     """Basic health check endpoint."""
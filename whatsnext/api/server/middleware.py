@@ -1,30 +1,37 @@
-"""Middleware for authentication, CORS, and rate limiting."""
+"""Middleware for authentication, CORS, and rate limiting.
 
-import secrets
-import time
-from collections import defaultdict
-from typing import Callable, Dict, List, Optional
+The middleware classes are plain ASGI apps wrapping the application rather
+than ``BaseHTTPMiddleware`` subclasses, which run every request in an extra
+task with its body passed through a memory stream. A request that passes
+the checks is handed to the application unchanged.
+"""
 
-from fastapi import HTTPException, Request, status
+import hashlib
+from typing import FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
 from fastapi.security import APIKeyHeader
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from .config import settings
+from .ratelimit import LimiterFactory, RouteLimits, retry_after_seconds
+
 
+def _key_digests(api_keys: Iterable[str]) -> FrozenSet[bytes]:
+    """Hash the valid API keys once, for :func:`_is_valid_key`."""
+    return frozenset(hashlib.sha256(key.encode()).digest() for key in api_keys)
 
-def _constant_time_compare(provided_key: str, valid_keys: List[str]) -> bool:
-    """Compare API key against valid keys using constant-time comparison.
 
-    This prevents timing attacks that could leak information about valid keys.
+def _is_valid_key(provided_key: str, digests: FrozenSet[bytes]) -> bool:
+    """Check an API key against the digests of the valid keys.
+
+    The provided key is hashed before the lookup, so the lookup's timing
+    depends on its digest, which an attacker cannot steer towards a valid
+    key's, and not on how much of a valid key it matches.
     """
-    # We must compare against all keys to ensure constant time
-    # regardless of which key (if any) matches
-    result = False
-    for valid_key in valid_keys:
-        if secrets.compare_digest(provided_key.encode(), valid_key.encode()):
-            result = True
-    return result
+    return hashlib.sha256(provided_key.encode()).digest() in digests
 
 
 # API key header
@@ -42,13 +49,15 @@ def get_api_key_dependency():
 
         return no_auth
 
+    digests = _key_digests(api_keys)
+
     async def verify_api_key(api_key: Optional[str] = API_KEY_HEADER):  # type: ignore[assignment]
         if api_key is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="API key required. Provide X-API-Key header.",
             )
-        if not _constant_time_compare(api_key, api_keys):
+        if not _is_valid_key(api_key, digests):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Invalid API key.",
@@ -58,92 +67,93 @@ def get_api_key_dependency():
     return verify_api_key
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware using a sliding window approach."""
+class RateLimitMiddleware:
+    """Rate limiting middleware using sliding window counters per client IP.
 
-    def __init__(self, app, requests_per_minute: int = 60):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.window_size = 60  # 1 minute window
-        # Store request timestamps per client IP
-        self.request_times: Dict[str, List[float]] = defaultdict(list)
+    ``route_limits`` give matching paths their own limit, and
+    ``limiter_factory`` the limiters counting requests, e.g. shared between
+    processes; see :class:`~.ratelimit.RouteLimits`.
+    """
 
-    def _get_client_ip(self, request: Request) -> str:
-        """Get client IP from request, checking X-Forwarded-For for proxied requests."""
-        forwarded = request.headers.get("X-Forwarded-For")
+    def __init__(
+        self,
+        app: ASGIApp,
+        requests_per_minute: int = 60,
+        route_limits: Sequence[Tuple[str, int]] = (),
+        max_keys: int = 10000,
+        limiter_factory: Optional[LimiterFactory] = None,
+    ):
+        self.app = app
+        self.limits = RouteLimits(requests_per_minute, route_limits, max_keys=max_keys, limiter_factory=limiter_factory)
+
+    def _get_client_ip(self, scope: Scope) -> str:
+        """Get client IP from the request scope, checking X-Forwarded-For for proxied requests."""
+        forwarded = Headers(scope=scope).get("X-Forwarded-For")
         if forwarded:
             return forwarded.split(",")[0].strip()
-        if request.client:
-            return request.client.host
+        client = scope.get("client")
+        if client:
+            return client[0]
         return "unknown"
 
-    def _clean_old_requests(self, client_ip: str, current_time: float) -> None:
-        """Remove request timestamps older than the window."""
-        cutoff = current_time - self.window_size
-        self.request_times[client_ip] = [t for t in self.request_times[client_ip] if t > cutoff]
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Skip rate limiting if disabled
-        if self.requests_per_minute <= 0:
-            return await call_next(request)
-
-        client_ip = self._get_client_ip(request)
-        current_time = time.time()
-
-        # Clean old requests
-        self._clean_old_requests(client_ip, current_time)
-
-        # Check rate limit
-        if len(self.request_times[client_ip]) >= self.requests_per_minute:
-            # Calculate retry after
-            oldest_request = min(self.request_times[client_ip])
-            retry_after = int(oldest_request + self.window_size - current_time) + 1
-
-            return Response(
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limits.limiter_for(scope["path"])
+        # Skip rate limiting if disabled for this route
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = limiter.hit(self._get_client_ip(scope))
+        if wait:
+            retry_after = retry_after_seconds(wait)
+            response = Response(
                 content=f"Rate limit exceeded. Try again in {retry_after} seconds.",
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 headers={"Retry-After": str(retry_after)},
             )
+            await response(scope, receive, send)
+            return
 
-        # Record this request
-        self.request_times[client_ip].append(current_time)
+        await self.app(scope, receive, send)
 
-        return await call_next(request)
 
-
-class AuthenticationMiddleware(BaseHTTPMiddleware):
+class AuthenticationMiddleware:
     """Middleware for API key authentication.
 
     This provides authentication at the middleware level, which is useful
     for protecting all routes without adding dependencies to each one.
     """
 
-    def __init__(self, app, api_keys: List[str], excluded_paths: Optional[List[str]] = None):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, api_keys: List[str], excluded_paths: Optional[List[str]] = None):
+        self.app = app
         self.api_keys = api_keys
         self.excluded_paths = excluded_paths or ["/", "/checkdb", "/docs", "/openapi.json", "/redoc"]
+        self._digests = _key_digests(api_keys)
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Skip authentication for excluded paths
-        if request.url.path in self.excluded_paths:
-            return await call_next(request)
-
-        # Skip if no API keys configured (auth disabled)
-        if not self.api_keys:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Skip non-HTTP traffic, excluded paths, and everything if no API keys are configured (auth disabled)
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths or not self.api_keys:
+            await self.app(scope, receive, send)
+            return
 
         # Check for API key in header
-        api_key = request.headers.get("X-API-Key")
+        api_key = Headers(scope=scope).get("X-API-Key")
         if api_key is None:
-            return Response(
+            response = Response(
                 content="API key required. Provide X-API-Key header.",
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
-
-        if not _constant_time_compare(api_key, self.api_keys):
-            return Response(
+        elif not _is_valid_key(api_key, self._digests):
+            response = Response(
                 content="Invalid API key.",
                 status_code=status.HTTP_403_FORBIDDEN,
             )
+        else:
+            await self.app(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await response(scope, receive, send)
@@ -0,0 +1,67 @@
+"""Normalize job dependencies into the job_dependencies edge table.
+
+Replaces the JSON ``jobs.depends`` column ({str(job_id): job_name}) with one
+row per dependency edge, indexed in both directions. Existing dependencies
+are backfilled; references to jobs that no longer exist are dropped.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Create job_dependencies, backfill it from jobs.depends and drop the JSON column."""
+    op.create_table(
+        "job_dependencies",
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("depends_on_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["depends_on_id"], ["jobs.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("job_id", "depends_on_id"),
+    )
+    op.create_index(op.f("ix_job_dependencies_depends_on_id"), "job_dependencies", ["depends_on_id"], unique=False)
+
+    op.execute(
+        """
+        INSERT INTO job_dependencies (job_id, depends_on_id)
+        SELECT DISTINCT jobs.id, dependency.id
+        FROM jobs
+        CROSS JOIN LATERAL json_object_keys(jobs.depends) AS dep(key)
+        JOIN jobs AS dependency ON dependency.id = CASE WHEN dep.key ~ '^[0-9]+$' THEN dep.key::integer END
+        """
+    )
+
+    op.drop_column("jobs", "depends")
+
+
+def downgrade() -> None:
+    """Restore jobs.depends from job_dependencies and drop the edge table."""
+    op.add_column("jobs", sa.Column("depends", sa.JSON(), nullable=False, server_default="{}"))
+    op.execute(
+        """
+        UPDATE jobs
+        SET depends = edges.depends
+        FROM (
+            SELECT job_dependencies.job_id, json_object_agg(dependency.id::text, dependency.name) AS depends
+            FROM job_dependencies
+            JOIN jobs AS dependency ON dependency.id = job_dependencies.depends_on_id
+            GROUP BY job_dependencies.job_id
+        ) AS edges
+        WHERE jobs.id = edges.job_id
+        """
+    )
+
+    op.drop_index(op.f("ix_job_dependencies_depends_on_id"), table_name="job_dependencies")
+    op.drop_table("job_dependencies")
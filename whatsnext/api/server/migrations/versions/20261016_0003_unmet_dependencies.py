@@ -0,0 +1,46 @@
+"""Add the jobs.unmet_dependencies counter and the ready-job index.
+
+``unmet_dependencies`` counts the dependencies of a job that are not
+COMPLETED. Existing jobs are backfilled from ``job_dependencies``.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add and backfill jobs.unmet_dependencies and index ready jobs."""
+    op.add_column("jobs", sa.Column("unmet_dependencies", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.execute(
+        """
+        UPDATE jobs
+        SET unmet_dependencies = unmet.count
+        FROM (
+            SELECT job_dependencies.job_id, count(*) AS count
+            FROM job_dependencies
+            JOIN jobs AS dependency ON dependency.id = job_dependencies.depends_on_id
+            WHERE dependency.status <> 'COMPLETED'
+            GROUP BY job_dependencies.job_id
+        ) AS unmet
+        WHERE jobs.id = unmet.job_id
+        """
+    )
+    op.create_index("ix_jobs_ready", "jobs", ["project_id", "status", "unmet_dependencies", "priority"], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the ready-job index and jobs.unmet_dependencies."""
+    op.drop_index("ix_jobs_ready", table_name="jobs")
+    op.drop_column("jobs", "unmet_dependencies")
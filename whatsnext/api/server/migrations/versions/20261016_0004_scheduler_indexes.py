@@ -0,0 +1,77 @@
+"""Add scheduler-oriented indexes to the jobs table.
+
+- ``ix_jobs_project_status_priority`` on (project_id, status, priority DESC, id)
+  for per-project listings filtered by status in claim order.
+- ``ix_jobs_pending`` on (project_id, unmet_dependencies, priority DESC, id)
+  WHERE status = 'PENDING' for claiming, pending counts and clearing queues.
+  It only holds the queue itself and replaces ``ix_jobs_ready``.
+- ``ix_jobs_project_updated_at`` on (project_id, updated_at) for recently
+  changed jobs.
+
+Indexes are built and dropped ``CONCURRENTLY`` so the jobs table stays
+writable while existing deployments migrate. ``CONCURRENTLY`` cannot run in
+a transaction, so each statement runs in an autocommit block; if a build
+fails, drop the INVALID index it leaves behind and run the upgrade again.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: str | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Create the scheduler indexes concurrently and drop ix_jobs_ready."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_jobs_project_status_priority",
+            "jobs",
+            ["project_id", "status", sa.text("priority DESC"), "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_jobs_pending",
+            "jobs",
+            ["project_id", "unmet_dependencies", sa.text("priority DESC"), "id"],
+            unique=False,
+            postgresql_where=sa.text("status = 'PENDING'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_jobs_project_updated_at",
+            "jobs",
+            ["project_id", "updated_at"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_jobs_ready", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Restore ix_jobs_ready and drop the scheduler indexes concurrently."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_jobs_ready",
+            "jobs",
+            ["project_id", "status", "unmet_dependencies", "priority"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_jobs_project_updated_at", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_jobs_pending", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_jobs_project_status_priority", table_name="jobs", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,101 @@
+"""Add the project_job_counts table and the triggers that maintain it.
+
+``project_job_counts`` holds the number of jobs per (project, status).
+Statement triggers on ``jobs`` apply every insert, delete and status change
+to it in the same transaction. Existing counts are backfilled from ``jobs``;
+``whatsnext db recount`` rebuilds them should they ever drift.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: str | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Create and backfill project_job_counts and install the jobs triggers."""
+    op.create_table(
+        "project_job_counts",
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("status", postgresql.ENUM(name="jobstatus", create_type=False), nullable=False),
+        sa.Column("n", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("project_id", "status"),
+    )
+    # Jobs must not change between the backfill and the triggers taking over
+    op.execute("LOCK TABLE jobs IN SHARE MODE")
+    op.execute(
+        """
+        INSERT INTO project_job_counts (project_id, status, n)
+        SELECT project_id, status, count(*) FROM jobs GROUP BY project_id, status
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION count_jobs() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO project_job_counts AS counts (project_id, status, n)
+                SELECT project_id, status, count(*) FROM new_jobs
+                GROUP BY project_id, status
+                ORDER BY project_id, status
+                ON CONFLICT (project_id, status) DO UPDATE SET n = counts.n + excluded.n;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO project_job_counts AS counts (project_id, status, n)
+                SELECT old_jobs.project_id, old_jobs.status, -count(*) FROM old_jobs
+                JOIN projects ON projects.id = old_jobs.project_id
+                GROUP BY old_jobs.project_id, old_jobs.status
+                ORDER BY old_jobs.project_id, old_jobs.status
+                ON CONFLICT (project_id, status) DO UPDATE SET n = counts.n + excluded.n;
+            ELSE
+                INSERT INTO project_job_counts AS counts (project_id, status, n)
+                SELECT changes.project_id, changes.status, sum(changes.delta) FROM (
+                    SELECT project_id, status, -1 AS delta FROM old_jobs
+                    UNION ALL
+                    SELECT project_id, status, 1 AS delta FROM new_jobs
+                ) AS changes
+                GROUP BY changes.project_id, changes.status
+                HAVING sum(changes.delta) <> 0
+                ORDER BY changes.project_id, changes.status
+                ON CONFLICT (project_id, status) DO UPDATE SET n = counts.n + excluded.n;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS jobs_count_insert ON jobs;
+        CREATE TRIGGER jobs_count_insert AFTER INSERT ON jobs
+            REFERENCING NEW TABLE AS new_jobs
+            FOR EACH STATEMENT EXECUTE FUNCTION count_jobs();
+
+        DROP TRIGGER IF EXISTS jobs_count_update ON jobs;
+        CREATE TRIGGER jobs_count_update AFTER UPDATE ON jobs
+            REFERENCING OLD TABLE AS old_jobs NEW TABLE AS new_jobs
+            FOR EACH STATEMENT EXECUTE FUNCTION count_jobs();
+
+        DROP TRIGGER IF EXISTS jobs_count_delete ON jobs;
+        CREATE TRIGGER jobs_count_delete AFTER DELETE ON jobs
+            REFERENCING OLD TABLE AS old_jobs
+            FOR EACH STATEMENT EXECUTE FUNCTION count_jobs();
+        """
+    )
+
+
+def downgrade() -> None:
+    """Remove the jobs triggers and drop project_job_counts."""
+    op.execute("DROP TRIGGER IF EXISTS jobs_count_delete ON jobs")
+    op.execute("DROP TRIGGER IF EXISTS jobs_count_update ON jobs")
+    op.execute("DROP TRIGGER IF EXISTS jobs_count_insert ON jobs")
+    op.execute("DROP FUNCTION IF EXISTS count_jobs()")
+    op.drop_table("project_job_counts")
@@ -0,0 +1,38 @@
+"""Add the project_usage table for fair sharing between projects.
+
+``project_usage`` holds each project's recent consumption, the decayed
+number of jobs claimed through the cross-project ``/fetch_job``. Projects
+without a row have not consumed anything yet.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: str | None = "0005"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Create project_usage."""
+    op.create_table(
+        "project_usage",
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("usage", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("project_id"),
+    )
+
+
+def downgrade() -> None:
+    """Drop project_usage."""
+    op.drop_table("project_usage")
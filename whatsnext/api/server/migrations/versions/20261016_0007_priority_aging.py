@@ -0,0 +1,31 @@
+"""Add projects.priority_aging for aging the priority of waiting jobs.
+
+A ready job of a project with ``priority_aging`` above 0 is claimed by
+``priority + priority_aging * hours waited``; existing projects keep strict
+priority order.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: str | None = "0006"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add the priority_aging column."""
+    op.add_column("projects", sa.Column("priority_aging", sa.Float(), nullable=False, server_default=sa.text("0")))
+
+
+def downgrade() -> None:
+    """Drop the priority_aging column."""
+    op.drop_column("projects", "priority_aging")
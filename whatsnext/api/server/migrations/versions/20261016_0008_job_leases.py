@@ -0,0 +1,63 @@
+"""Add job leases and attempt counting.
+
+- ``jobs.lease_owner`` / ``jobs.lease_expires_at``: the client holding a
+  claimed job and when the job is requeued unless the client's heartbeats
+  renew the lease. Existing claimed jobs have no lease.
+- ``jobs.attempts``: how often a job has been claimed.
+- Partial indexes ``ix_jobs_lease_owner`` and ``ix_jobs_lease_expires_at``
+  covering leased jobs only, for renewing and reaping leases.
+
+The indexes are built ``CONCURRENTLY`` in an autocommit block, as in
+revision 0004.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: str | None = "0007"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add the lease and attempt columns and their indexes."""
+    op.add_column("jobs", sa.Column("lease_owner", sa.String(), nullable=True))
+    op.add_column("jobs", sa.Column("lease_expires_at", sa.TIMESTAMP(timezone=True), nullable=True))
+    op.add_column("jobs", sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_jobs_lease_owner",
+            "jobs",
+            ["lease_owner"],
+            unique=False,
+            postgresql_where=sa.text("lease_owner IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_jobs_lease_expires_at",
+            "jobs",
+            ["lease_expires_at"],
+            unique=False,
+            postgresql_where=sa.text("lease_expires_at IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Drop the lease indexes and columns."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_jobs_lease_expires_at", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_jobs_lease_owner", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+    op.drop_column("jobs", "attempts")
+    op.drop_column("jobs", "lease_expires_at")
+    op.drop_column("jobs", "lease_owner")
@@ -0,0 +1,42 @@
+"""Add an index for listing a project's jobs page by page.
+
+- ``ix_jobs_project_id_id`` on ``(project_id, id)``: ``GET /jobs?project_id=``
+  pages through a project's jobs with ``id > cursor ORDER BY id``, which
+  this index answers by seeking straight to the page.
+
+The index is built ``CONCURRENTLY`` in an autocommit block, as in
+revision 0004.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: str | None = "0008"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Create the (project_id, id) index."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_jobs_project_id_id",
+            "jobs",
+            ["project_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Drop the (project_id, id) index."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_jobs_project_id_id", table_name="jobs", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,40 @@
+"""Add the rate_limit_counters table for rate limits shared between server processes.
+
+``rate_limit_counters`` holds the requests per (limiter, client, slot) of
+every server process when ``rate_limit_backend`` is ``postgres``. Only the
+last two slots of each client matter, so the table is ``UNLOGGED``: it is
+not written to the WAL, and a crash only empties it.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: str | None = "0009"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Create rate_limit_counters."""
+    op.create_table(
+        "rate_limit_counters",
+        sa.Column("limiter", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("slot_start", sa.Integer(), nullable=False),
+        sa.Column("n", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.PrimaryKeyConstraint("limiter", "key", "slot_start"),
+        prefixes=["UNLOGGED"],
+    )
+
+
+def downgrade() -> None:
+    """Drop rate_limit_counters."""
+    op.drop_table("rate_limit_counters")
@@ -0,0 +1,132 @@
+"""Stripe project_job_counts and only count status changes.
+
+Every claim moved jobs between the same two ``project_job_counts`` rows of
+its project, so concurrent claims waited for each other on those rows. The
+counts are now split over 16 stripes: each session writes the stripe of its
+database backend, and a count is the sum of the stripes. Status changes are
+counted by a row trigger that only fires when the status or project of a
+job changes, so lease renewals and heartbeats no longer touch the counters.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: str | None = "0010"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add the stripe column and install the striped triggers."""
+    # Jobs must not change while the counters and triggers are replaced
+    op.execute("LOCK TABLE jobs IN SHARE MODE")
+    op.add_column("project_job_counts", sa.Column("stripe", sa.SmallInteger(), nullable=False, server_default=sa.text("0")))
+    op.drop_constraint("project_job_counts_pkey", "project_job_counts", type_="primary")
+    op.create_primary_key("project_job_counts_pkey", "project_job_counts", ["project_id", "status", "stripe"])
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION count_jobs() RETURNS trigger AS $$
+        DECLARE
+            backend_stripe smallint := mod(pg_backend_pid(), 16);
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO project_job_counts AS counts (project_id, status, stripe, n)
+                SELECT project_id, status, backend_stripe, count(*) FROM new_jobs
+                GROUP BY project_id, status
+                ORDER BY project_id, status
+                ON CONFLICT (project_id, status, stripe) DO UPDATE SET n = counts.n + excluded.n;
+            ELSE
+                INSERT INTO project_job_counts AS counts (project_id, status, stripe, n)
+                SELECT old_jobs.project_id, old_jobs.status, backend_stripe, -count(*) FROM old_jobs
+                JOIN projects ON projects.id = old_jobs.project_id
+                GROUP BY old_jobs.project_id, old_jobs.status
+                ORDER BY old_jobs.project_id, old_jobs.status
+                ON CONFLICT (project_id, status, stripe) DO UPDATE SET n = counts.n + excluded.n;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION count_job_move() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO project_job_counts AS counts (project_id, status, stripe, n)
+            SELECT moves.project_id, moves.status, mod(pg_backend_pid(), 16), moves.n
+            FROM (VALUES (OLD.project_id, OLD.status, -1), (NEW.project_id, NEW.status, 1)) AS moves (project_id, status, n)
+            ORDER BY moves.project_id, moves.status
+            ON CONFLICT (project_id, status, stripe) DO UPDATE SET n = counts.n + excluded.n;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS jobs_count_update ON jobs;
+        CREATE TRIGGER jobs_count_update AFTER UPDATE OF status, project_id ON jobs
+            FOR EACH ROW
+            WHEN (OLD.status <> NEW.status OR OLD.project_id <> NEW.project_id)
+            EXECUTE FUNCTION count_job_move();
+        """
+    )
+
+
+def downgrade() -> None:
+    """Fold the stripes into one row per (project, status) and restore the statement update trigger."""
+    op.execute("LOCK TABLE jobs IN SHARE MODE")
+    op.execute(
+        """
+        WITH folded AS (
+            DELETE FROM project_job_counts RETURNING project_id, status, n
+        )
+        INSERT INTO project_job_counts (project_id, status, n)
+        SELECT project_id, status, sum(n) FROM folded GROUP BY project_id, status
+        """
+    )
+    op.drop_constraint("project_job_counts_pkey", "project_job_counts", type_="primary")
+    op.drop_column("project_job_counts", "stripe")
+    op.create_primary_key("project_job_counts_pkey", "project_job_counts", ["project_id", "status"])
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION count_jobs() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO project_job_counts AS counts (project_id, status, n)
+                SELECT project_id, status, count(*) FROM new_jobs
+                GROUP BY project_id, status
+                ORDER BY project_id, status
+                ON CONFLICT (project_id, status) DO UPDATE SET n = counts.n + excluded.n;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO project_job_counts AS counts (project_id, status, n)
+                SELECT old_jobs.project_id, old_jobs.status, -count(*) FROM old_jobs
+                JOIN projects ON projects.id = old_jobs.project_id
+                GROUP BY old_jobs.project_id, old_jobs.status
+                ORDER BY old_jobs.project_id, old_jobs.status
+                ON CONFLICT (project_id, status) DO UPDATE SET n = counts.n + excluded.n;
+            ELSE
+                INSERT INTO project_job_counts AS counts (project_id, status, n)
+                SELECT changes.project_id, changes.status, sum(changes.delta) FROM (
+                    SELECT project_id, status, -1 AS delta FROM old_jobs
+                    UNION ALL
+                    SELECT project_id, status, 1 AS delta FROM new_jobs
+                ) AS changes
+                GROUP BY changes.project_id, changes.status
+                HAVING sum(changes.delta) <> 0
+                ORDER BY changes.project_id, changes.status
+                ON CONFLICT (project_id, status) DO UPDATE SET n = counts.n + excluded.n;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS jobs_count_update ON jobs;
+        CREATE TRIGGER jobs_count_update AFTER UPDATE ON jobs
+            REFERENCING OLD TABLE AS old_jobs NEW TABLE AS new_jobs
+            FOR EACH STATEMENT EXECUTE FUNCTION count_jobs();
+        DROP FUNCTION IF EXISTS count_job_move();
+        """
+    )
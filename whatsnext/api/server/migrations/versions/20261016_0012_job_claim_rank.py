@@ -0,0 +1,113 @@
+"""Store the claim order of pending jobs in jobs.claim_rank and index it.
+
+With priority aging the claim query sorted the project's ready jobs by
+``priority + priority_aging * hours waited``, which no index can serve. At
+any one moment that orders jobs like ``priority - priority_aging * hours
+from the epoch to creation``, which does not change while a job waits.
+Triggers store it in ``claim_rank`` when a job is inserted or becomes
+PENDING, and recompute it for the pending jobs of a project whose aging
+rate changes. ``ix_jobs_pending`` is rebuilt on ``claim_rank`` instead of
+``priority``; without aging the two are equal.
+
+The new index is built ``CONCURRENTLY`` under a temporary name and then
+takes the old one's place, so the jobs table stays writable. If the build
+fails, drop the INVALID ``ix_jobs_pending_ranked`` it leaves behind and run
+the upgrade again.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-16
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: str | None = "0011"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add and backfill claim_rank, install its triggers and rebuild ix_jobs_pending on it."""
+    op.add_column("jobs", sa.Column("claim_rank", sa.Float(), nullable=False, server_default=sa.text("0")))
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION rank_job() RETURNS trigger AS $$
+        BEGIN
+            NEW.claim_rank := NEW.priority - coalesce(
+                (SELECT priority_aging FROM projects WHERE id = NEW.project_id), 0
+            ) * extract(epoch FROM NEW.created_at) / 3600;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION rank_project_jobs() RETURNS trigger AS $$
+        BEGIN
+            UPDATE jobs SET claim_rank = priority - NEW.priority_aging * extract(epoch FROM created_at) / 3600
+            WHERE project_id = NEW.id AND status = 'PENDING';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS jobs_rank_insert ON jobs;
+        CREATE TRIGGER jobs_rank_insert BEFORE INSERT ON jobs
+            FOR EACH ROW EXECUTE FUNCTION rank_job();
+
+        DROP TRIGGER IF EXISTS jobs_rank_update ON jobs;
+        CREATE TRIGGER jobs_rank_update BEFORE UPDATE OF status, priority, created_at, project_id ON jobs
+            FOR EACH ROW
+            WHEN (NEW.status = 'PENDING')
+            EXECUTE FUNCTION rank_job();
+
+        DROP TRIGGER IF EXISTS projects_rank_jobs ON projects;
+        CREATE TRIGGER projects_rank_jobs AFTER UPDATE OF priority_aging ON projects
+            FOR EACH ROW
+            WHEN (OLD.priority_aging <> NEW.priority_aging)
+            EXECUTE FUNCTION rank_project_jobs();
+        """
+    )
+    op.execute(
+        """
+        UPDATE jobs SET claim_rank = jobs.priority - projects.priority_aging * extract(epoch FROM jobs.created_at) / 3600
+        FROM projects
+        WHERE projects.id = jobs.project_id AND jobs.status = 'PENDING'
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_jobs_pending_ranked",
+            "jobs",
+            ["project_id", "unmet_dependencies", sa.text("claim_rank DESC"), "id"],
+            unique=False,
+            postgresql_where=sa.text("status = 'PENDING'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_jobs_pending", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+        op.execute("ALTER INDEX ix_jobs_pending_ranked RENAME TO ix_jobs_pending")
+
+
+def downgrade() -> None:
+    """Rebuild ix_jobs_pending on priority and remove claim_rank with its triggers."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_jobs_pending_by_priority",
+            "jobs",
+            ["project_id", "unmet_dependencies", sa.text("priority DESC"), "id"],
+            unique=False,
+            postgresql_where=sa.text("status = 'PENDING'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_jobs_pending", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+        op.execute("ALTER INDEX ix_jobs_pending_by_priority RENAME TO ix_jobs_pending")
+    op.execute("DROP TRIGGER IF EXISTS projects_rank_jobs ON projects")
+    op.execute("DROP TRIGGER IF EXISTS jobs_rank_update ON jobs")
+    op.execute("DROP TRIGGER IF EXISTS jobs_rank_insert ON jobs")
+    op.execute("DROP FUNCTION IF EXISTS rank_project_jobs()")
+    op.execute("DROP FUNCTION IF EXISTS rank_job()")
+    op.drop_column("jobs", "claim_rank")
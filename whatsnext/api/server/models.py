@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String
+from sqlalchemy import DDL, Column, Enum, Float, ForeignKey, Index, Integer, SmallInteger, String, event
 from sqlalchemy.schema import UniqueConstraint
 from sqlalchemy.sql.expression import text
 from sqlalchemy.sql.sqltypes import JSON, TIMESTAMP
@@ -17,14 +17,92 @@ class Job(Base):
     parameters = Column(JSON, nullable=False)
     status = Column(Enum(JobStatus), nullable=False, default=JobStatus.PENDING)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), server_onupdate=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
     priority = Column(Integer, default=0, nullable=False)
-    depends = Column(JSON, default={}, nullable=False)
+    unmet_dependencies = Column(Integer, default=0, nullable=False, server_default=text("0"))
+    # Lease of a claimed job: the client running it and when it is requeued unless renewed
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Number of times the job has been claimed
+    attempts = Column(Integer, default=0, nullable=False, server_default=text("0"))
+    # Claim order of a PENDING job, highest first; set by JOB_RANK_TRIGGERS
+    claim_rank = Column(Float, nullable=False, server_default=text("0"))
+
+    __table_args__ = (
+        Index("ix_jobs_project_status_priority", project_id, status, priority.desc(), id),
+        # The queue itself: claiming, pending counts and clearing only touch PENDING jobs
+        Index(
+            "ix_jobs_pending",
+            project_id,
+            unmet_dependencies,
+            claim_rank.desc(),
+            id,
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+        Index("ix_jobs_project_updated_at", project_id, updated_at),
+        # Paging through a project's jobs by ID
+        Index("ix_jobs_project_id_id", project_id, id),
+        # Leased jobs only: renewing a client's leases and reaping expired ones
+        Index("ix_jobs_lease_owner", lease_owner, postgresql_where=text("lease_owner IS NOT NULL")),
+        Index("ix_jobs_lease_expires_at", lease_expires_at, postgresql_where=text("lease_expires_at IS NOT NULL")),
+    )
 
     def __repr__(self):
         return f"<Job {self.name}>"
 
 
+class JobDependency(Base):
+    """Edge of the job dependency graph: ``job_id`` waits for ``depends_on_id``."""
+
+    __tablename__ = "job_dependencies"
+
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    depends_on_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True, index=True, nullable=False)
+
+    def __repr__(self):
+        return f"<JobDependency {self.job_id} -> {self.depends_on_id}>"
+
+
+class ProjectJobCount(Base):
+    """Change in the number of jobs of a project in one status, on one stripe.
+
+    Maintained by the ``jobs_count_*`` statement triggers (see
+    :data:`JOB_COUNTS_TRIGGERS`) in the transaction that inserts, deletes or
+    changes jobs. Each database session writes the stripe of its backend, so
+    concurrent claims of a project rarely wait for the same counter row. A
+    count is the sum of the stripes, read with a primary key range scan;
+    single stripes may be negative.
+    """
+
+    __tablename__ = "project_job_counts"
+
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    status = Column(Enum(JobStatus), primary_key=True, nullable=False)
+    stripe = Column(SmallInteger, primary_key=True, nullable=False, default=0, server_default=text("0"))
+    n = Column(Integer, default=0, nullable=False, server_default=text("0"))
+
+    def __repr__(self):
+        return f"<ProjectJobCount {self.project_id} {self.status}[{self.stripe}]={self.n}>"
+
+
+class ProjectUsage(Base):
+    """Recent consumption of a project, for fair sharing between projects.
+
+    ``usage`` counts the jobs claimed through the cross-project fetch and
+    decays exponentially with the ``fair_share_half_life`` setting; it is
+    current as of ``updated_at``.
+    """
+
+    __tablename__ = "project_usage"
+
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    usage = Column(Float, default=0, nullable=False, server_default=text("0"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+    def __repr__(self):
+        return f"<ProjectUsage {self.project_id}={self.usage}>"
+
+
 class Project(Base):
     __tablename__ = "projects"
 
@@ -34,11 +112,34 @@ class Project(Base):
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
     updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), server_onupdate=text("now()"))
     status = Column(Enum(ProjectStatus), nullable=False, default=DEFAULT_PROJECT_STATUS)
+    # Priority points a pending job gains per hour waited (0 = strict priority order)
+    priority_aging = Column(Float, default=0, nullable=False, server_default=text("0"))
 
     def __repr__(self):
         return f"<Project {self.name}>"
 
 
+class RateLimitCounter(Base):
+    """Requests of one client in one slot of a rate limit, counted by all server processes.
+
+    ``slot_start`` is the epoch second the slot starts at; slots are aligned
+    to the wall clock, so every process agrees on them. Rows older than two
+    slots are deleted. The table is ``UNLOGGED``: a crash only forgets the
+    counts of the last two minutes.
+    """
+
+    __tablename__ = "rate_limit_counters"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    limiter = Column(String, primary_key=True, nullable=False)
+    key = Column(String, primary_key=True, nullable=False)
+    slot_start = Column(Integer, primary_key=True, nullable=False)
+    n = Column(Integer, default=0, nullable=False, server_default=text("0"))
+
+    def __repr__(self):
+        return f"<RateLimitCounter {self.limiter} {self.key}@{self.slot_start}={self.n}>"
+
+
 class Task(Base):
     __tablename__ = "tasks"
 
@@ -72,3 +173,110 @@ class Client(Base):
 
     def __repr__(self):
         return f"<Client {self.name}>"
+
+
+# Number of counter rows per (project, status) in project_job_counts
+JOB_COUNT_STRIPES = 16
+
+# Keeps project_job_counts in step with jobs, writing to the stripe of the
+# session's backend. Inserts and deletes are counted once per statement from
+# the transition tables, in key order so concurrent statements lock counter
+# rows in the same order; jobs removed together with their project are not
+# counted. Status changes are counted per row by a trigger that only fires
+# when the status or project of a job changes, so updates leaving both alone
+# (lease renewals, heartbeats) never touch the counters.
+JOB_COUNTS_TRIGGERS = f"""
+CREATE OR REPLACE FUNCTION count_jobs() RETURNS trigger AS $$
+DECLARE
+    backend_stripe smallint := mod(pg_backend_pid(), {JOB_COUNT_STRIPES});
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO project_job_counts AS counts (project_id, status, stripe, n)
+        SELECT project_id, status, backend_stripe, count(*) FROM new_jobs
+        GROUP BY project_id, status
+        ORDER BY project_id, status
+        ON CONFLICT (project_id, status, stripe) DO UPDATE SET n = counts.n + excluded.n;
+    ELSE
+        INSERT INTO project_job_counts AS counts (project_id, status, stripe, n)
+        SELECT old_jobs.project_id, old_jobs.status, backend_stripe, -count(*) FROM old_jobs
+        JOIN projects ON projects.id = old_jobs.project_id
+        GROUP BY old_jobs.project_id, old_jobs.status
+        ORDER BY old_jobs.project_id, old_jobs.status
+        ON CONFLICT (project_id, status, stripe) DO UPDATE SET n = counts.n + excluded.n;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION count_job_move() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO project_job_counts AS counts (project_id, status, stripe, n)
+    SELECT moves.project_id, moves.status, mod(pg_backend_pid(), {JOB_COUNT_STRIPES}), moves.n
+    FROM (VALUES (OLD.project_id, OLD.status, -1), (NEW.project_id, NEW.status, 1)) AS moves (project_id, status, n)
+    ORDER BY moves.project_id, moves.status
+    ON CONFLICT (project_id, status, stripe) DO UPDATE SET n = counts.n + excluded.n;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS jobs_count_insert ON jobs;
+CREATE TRIGGER jobs_count_insert AFTER INSERT ON jobs
+    REFERENCING NEW TABLE AS new_jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION count_jobs();
+
+DROP TRIGGER IF EXISTS jobs_count_update ON jobs;
+CREATE TRIGGER jobs_count_update AFTER UPDATE OF status, project_id ON jobs
+    FOR EACH ROW
+    WHEN (OLD.status <> NEW.status OR OLD.project_id <> NEW.project_id)
+    EXECUTE FUNCTION count_job_move();
+
+DROP TRIGGER IF EXISTS jobs_count_delete ON jobs;
+CREATE TRIGGER jobs_count_delete AFTER DELETE ON jobs
+    REFERENCING OLD TABLE AS old_jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION count_jobs();
+"""
+
+# Ranks pending jobs for claiming. A project aging priorities by
+# priority_aging points per hour ranks a job by priority + priority_aging *
+# hours waited; at any one moment that orders jobs like priority -
+# priority_aging * (hours from the epoch to the job's creation), which does
+# not change while the job waits and so can be indexed. The rank is set
+# when a job is inserted or becomes PENDING, and recomputed for the pending
+# jobs of a project whose aging rate changes.
+JOB_RANK_TRIGGERS = """
+CREATE OR REPLACE FUNCTION rank_job() RETURNS trigger AS $$
+BEGIN
+    NEW.claim_rank := NEW.priority - coalesce(
+        (SELECT priority_aging FROM projects WHERE id = NEW.project_id), 0
+    ) * extract(epoch FROM NEW.created_at) / 3600;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rank_project_jobs() RETURNS trigger AS $$
+BEGIN
+    UPDATE jobs SET claim_rank = priority - NEW.priority_aging * extract(epoch FROM created_at) / 3600
+    WHERE project_id = NEW.id AND status = 'PENDING';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS jobs_rank_insert ON jobs;
+CREATE TRIGGER jobs_rank_insert BEFORE INSERT ON jobs
+    FOR EACH ROW EXECUTE FUNCTION rank_job();
+
+DROP TRIGGER IF EXISTS jobs_rank_update ON jobs;
+CREATE TRIGGER jobs_rank_update BEFORE UPDATE OF status, priority, created_at, project_id ON jobs
+    FOR EACH ROW
+    WHEN (NEW.status = 'PENDING')
+    EXECUTE FUNCTION rank_job();
+
+DROP TRIGGER IF EXISTS projects_rank_jobs ON projects;
+CREATE TRIGGER projects_rank_jobs AFTER UPDATE OF priority_aging ON projects
+    FOR EACH ROW
+    WHEN (OLD.priority_aging <> NEW.priority_aging)
+    EXECUTE FUNCTION rank_project_jobs();
+"""
+
+event.listen(Base.metadata, "after_create", DDL(JOB_COUNTS_TRIGGERS))
+event.listen(Base.metadata, "after_create", DDL(JOB_RANK_TRIGGERS))
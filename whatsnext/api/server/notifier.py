@@ -0,0 +1,289 @@
+"""Change notifications for ready jobs, within and across server processes.
+
+Routes that may make a job ready (a new job, a job set back to PENDING, a
+completed dependency) call :func:`announce` inside their transaction. This
+queues a PostgreSQL ``NOTIFY`` on the ``whatsnext_jobs`` channel, which is
+delivered only if the transaction commits, and notifies this process once
+the session commits. Every server process runs a :class:`PostgresListener`
+that ``LISTEN``s on the channel and forwards announcements made by other
+processes to its local :class:`JobNotifier`.
+
+The notifier wakes long-polling fetch requests and runs registered
+callbacks, e.g. to invalidate caches. Long-polling fetches subscribe to
+their project *before* trying to claim, so a notification sent between a
+failed claim and the wait is not lost. Waiting happens on the event loop,
+not in a worker thread, and the caller commits before it waits, so an idle
+long poll holds neither a threadpool slot nor a database connection.
+"""
+
+import asyncio
+import logging
+import select
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import psycopg2
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionRunner
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL channel carrying "<project_id>:<instance_id>" payloads
+CHANNEL = "whatsnext_jobs"
+
+# Identifies this server process, so it can ignore its own announcements
+INSTANCE_ID = uuid.uuid4().hex
+
+# Session.info key collecting the projects announced in the open transaction
+_PENDING_KEY = "whatsnext_announced_projects"
+
+
+class Subscription:
+    """A long-poll waiter registered for one or more projects."""
+
+    def __init__(self, notifier: "JobNotifier", project_ids: Tuple[int, ...]) -> None:
+        self._notifier = notifier
+        self.project_ids = project_ids
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until the project is notified or the timeout expires.
+
+        Args:
+            timeout: Maximum number of seconds to wait.
+
+        Returns:
+            True if a notification arrived, False on timeout.
+        """
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+    def __enter__(self) -> "Subscription":
+        self._notifier._add(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._notifier._remove(self)
+
+
+class JobNotifier:
+    """Per-project registry of long-polling fetch requests."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._callbacks: List[Callable[[Optional[int]], None]] = []
+
+    def add_callback(self, callback: Callable[[Optional[int]], None]) -> None:
+        """Register a function called with the project ID on every notification.
+
+        The project ID is None when any project may have changed, e.g. after
+        the change feed reconnected and notifications may have been missed.
+        Callbacks run on the notifying thread and must be quick.
+        """
+        self._callbacks.append(callback)
+
+    def subscribe(self, *project_ids: int) -> Subscription:
+        """Create a subscription for one or more projects, to be used as a context manager.
+
+        The subscription wakes when any of the projects is notified. Must be
+        called from the event loop.
+        """
+        return Subscription(self, project_ids)
+
+    def notify(self, project_id: Optional[int]) -> None:
+        """Wake every request waiting on a project. Safe to call from any thread.
+
+        Args:
+            project_id: The project whose jobs may have become ready, or None
+                for all projects.
+        """
+        with self._lock:
+            if project_id is None:
+                waiters: Tuple[Subscription, ...] = tuple({s for subs in self._subscriptions.values() for s in subs})
+            else:
+                waiters = tuple(self._subscriptions.get(project_id, ()))
+        for subscription in waiters:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.event.set)
+            except RuntimeError:
+                pass  # The waiter's event loop has shut down
+        for callback in self._callbacks:
+            try:
+                callback(project_id)
+            except Exception:
+                logger.exception("Job notification callback failed")
+
+    def _add(self, subscription: Subscription) -> None:
+        with self._lock:
+            for project_id in subscription.project_ids:
+                self._subscriptions.setdefault(project_id, set()).add(subscription)
+
+    def _remove(self, subscription: Subscription) -> None:
+        with self._lock:
+            for project_id in subscription.project_ids:
+                waiters = self._subscriptions.get(project_id)
+                if waiters is not None:
+                    waiters.discard(subscription)
+                    if not waiters:
+                        del self._subscriptions[project_id]
+
+
+notifier = JobNotifier()
+
+
+async def long_poll(
+    runner: SessionRunner,
+    project_ids: Sequence[int],
+    wait: float,
+    claim: Callable[[Session], Dict[str, Any]],
+    claimed: str,
+) -> Dict[str, Any]:
+    """Run ``claim`` until it returns jobs or ``wait`` seconds have passed.
+
+    ``claim`` runs through ``runner`` (in the threadpool, or on the event
+    loop in async database mode) and commits before returning, so the
+    database connection is back in the pool while the request waits for a
+    notification of any of ``project_ids`` on the event loop. Waits are
+    capped at ``max_fetch_wait``.
+
+    Args:
+        runner: Runs ``claim`` with the request's session.
+        project_ids: Projects whose notifications trigger another attempt.
+        wait: Seconds to wait for a job.
+        claim: Attempts the claim and returns the response.
+        claimed: Response key that is empty while nothing was claimed.
+    """
+    deadline = time.monotonic() + min(wait, settings.max_fetch_wait)
+    with notifier.subscribe(*project_ids) as subscription:
+        while True:
+            response = await runner.run(claim)
+            remaining = deadline - time.monotonic()
+            if response[claimed] or remaining <= 0:
+                return response
+            await subscription.wait(remaining)
+
+
+def announce(db: Session, project_id: int) -> None:
+    """Announce that jobs of a project may have become ready.
+
+    Call inside the transaction that makes the change. Other server
+    processes are told through ``NOTIFY`` when the transaction commits, and
+    this process when the session commits; nothing is sent on rollback.
+
+    Args:
+        db: Database session with the open transaction.
+        project_id: The project whose jobs may have become ready.
+    """
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": f"{project_id}:{INSTANCE_ID}"})
+    db.info.setdefault(_PENDING_KEY, set()).add(project_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session: Session) -> None:
+    for project_id in session.info.pop(_PENDING_KEY, ()):
+        notifier.notify(project_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+class PostgresListener:
+    """Background thread forwarding ``NOTIFY`` announcements to a notifier.
+
+    Holds one dedicated database connection outside the pool. If the
+    connection drops it reconnects with backoff and then notifies all
+    projects, since announcements may have been missed meanwhile.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        job_notifier: JobNotifier = notifier,
+        instance_id: str = INSTANCE_ID,
+        poll_timeout: float = 1.0,
+        max_backoff: float = 30.0,
+    ) -> None:
+        self._dsn = dsn
+        self._notifier = job_notifier
+        self._instance_id = instance_id
+        self._poll_timeout = poll_timeout
+        self._max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._listening = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start listening in a daemon thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="whatsnext-change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the listener and wait for its thread to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait_until_listening(self, timeout: float) -> bool:
+        """Block until the listener is subscribed to the channel."""
+        return self._listening.wait(timeout)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        reconnected = False
+        while not self._stop.is_set():
+            try:
+                conn = psycopg2.connect(self._dsn)
+            except psycopg2.Error as e:
+                logger.warning(f"Change feed cannot connect, retrying in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self._max_backoff)
+                continue
+            try:
+                conn.set_session(autocommit=True)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                backoff = 1.0
+                self._listening.set()
+                if reconnected:
+                    self._notifier.notify(None)
+                    reconnected = False
+                self._listen(conn)
+            except psycopg2.Error as e:
+                logger.warning(f"Change feed connection lost: {e}")
+                reconnected = True
+            finally:
+                self._listening.clear()
+                conn.close()
+
+    def _listen(self, conn) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([conn], [], [], self._poll_timeout)
+            if not readable:
+                continue
+            conn.poll()
+            while conn.notifies:
+                self._dispatch(conn.notifies.pop(0).payload)
+
+    def _dispatch(self, payload: str) -> None:
+        project_id, _, instance_id = payload.partition(":")
+        if instance_id == self._instance_id:
+            return  # Already notified locally on commit
+        try:
+            self._notifier.notify(int(project_id))
+        except ValueError:
+            logger.warning(f"Ignoring malformed change feed payload {payload!r}")
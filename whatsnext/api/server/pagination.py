@@ -0,0 +1,125 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+A page is read with ``WHERE (sort key) > (last key of the previous page)
+ORDER BY sort key LIMIT n``, which an index on the sort key answers by
+seeking straight to the page, so deep pages cost the same as the first one.
+``LIMIT/OFFSET`` instead reads and discards every row before the page.
+
+The cursor is the sort key of the last row of a page, JSON-encoded and
+base64url-wrapped so clients treat it as opaque. List endpoints send the
+cursor of the next page in the ``X-Next-Cursor`` response header, which is
+absent on the last page, so the response body stays a plain list.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# A sort key column and whether it is sorted descending
+SortKey = Tuple[Any, bool]
+
+
+def _encode_value(value: Any) -> str:
+    """JSON-encode the timestamps of a sort key as ISO 8601 strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot use {type(value).__name__} in a cursor")
+
+
+def _decode_value(column: Any, value: Any) -> Any:
+    """Check a cursor value against the type of its column; raise TypeError or ValueError if it does not fit."""
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    # JSON has no separate bool and int, and bool is an int subclass
+    if not isinstance(value, python_type) or isinstance(value, bool):
+        raise TypeError(f"Expected {python_type.__name__}, got {type(value).__name__}")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of a row as an opaque cursor."""
+    encoded = json.dumps(list(values), separators=(",", ":"), default=_encode_value)
+    return base64.urlsafe_b64encode(encoded.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> List[Any]:
+    """Decode a cursor made by :func:`encode_cursor` for the sort key ``keys``.
+
+    Each value must have the type of its column (timestamps as ISO 8601
+    strings), so a crafted cursor is rejected here instead of failing in SQL.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or belongs to another sort order.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if isinstance(values, list) and len(values) == len(keys):
+            return [_decode_value(column, value) for (column, _), value in zip(keys, values)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        pass
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+
+def after(keys: Sequence[SortKey], values: Sequence[Any]):
+    """SQL condition selecting the rows that sort after ``values``.
+
+    Expands the row comparison so columns may be sorted in different
+    directions: ``a > x OR (a = x AND b > y) ...``. The redundant bound
+    ``a >= x`` in front lets PostgreSQL seek into an index on the sort key
+    instead of filtering it from the start.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column < values[i] if descending else column > values[i]))
+    first, descending = keys[0]
+    if len(keys) == 1:
+        return clauses[0]
+    return and_(first <= values[0] if descending else first >= values[0], or_(*clauses))
+
+
+def keyset_page(
+    query: Query,
+    keys: Sequence[SortKey],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> Tuple[List[Any], Optional[str]]:
+    """Read one page of ``query`` in the order of ``keys``.
+
+    Args:
+        query: Query for the model, with all filters applied.
+        keys: Sort key columns with their direction; the last one must be unique.
+        limit: Maximum number of rows.
+        cursor: Cursor of the previous page (None = first page).
+        skip: Rows to skip before the page (deprecated offset paging).
+
+    Returns:
+        The rows, and the cursor of the next page (None on the last page).
+    """
+    if cursor is not None:
+        query = query.filter(after(keys, decode_cursor(cursor, keys)))
+    query = query.order_by(*(column.desc() if descending else column.asc() for column, descending in keys))
+    if skip:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column, _ in keys])
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """Send the cursor of the next page, if there is one."""
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,88 @@
+"""Connection pool instrumentation.
+
+Requests that find the pool exhausted wait up to ``database_pool_timeout``
+seconds for a connection, which is invisible from the outside until
+requests time out. The pools of the server's engines are therefore built
+from :func:`instrumented_pool` classes that time every checkout and count
+checkouts served by overflow connections and checkouts that timed out.
+``GET /metrics/pool`` reports the counters together with the pool's
+current size, connections in use and overflow, so the pool can be sized
+to the worker fleet.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Counters of one connection pool's checkouts."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_checkout(self, wait: float, overflow: bool) -> None:
+        """Record a checkout that waited ``wait`` seconds for a connection."""
+        with self._lock:
+            self.checkouts += 1
+            self.overflow_checkouts += overflow
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def record_timeout(self, wait: float) -> None:
+        """Record a checkout that gave up after ``wait`` seconds."""
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        """Return the counters and the current state of ``pool``."""
+        with self._lock:
+            stats: Dict[str, Any] = {
+                "checkouts": self.checkouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_total,
+                "wait_seconds_max": self.wait_max,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0))
+        return stats
+
+
+class _InstrumentedPool:
+    """Mixin timing the checkouts of a queue pool."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            logger.warning("Timed out waiting for a database connection; consider raising database_pool_size")
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start, self.overflow() > 0)  # type: ignore[attr-defined]
+        return connection
+
+
+def instrumented_pool(pool_class: Type[QueuePool], metrics: PoolMetrics) -> Type[QueuePool]:
+    """Create a subclass of ``pool_class`` recording its checkouts in ``metrics``.
+
+    The metrics are a class attribute, so they survive the pool being
+    recreated, e.g. by ``engine.dispose()``.
+    """
+    return type(f"Instrumented{pool_class.__name__}", (_InstrumentedPool, pool_class), {"metrics": metrics})
@@ -0,0 +1,172 @@
+"""Sliding-window request counters for rate limiting.
+
+Each key (a client IP) has two fixed slots of one window each: the count of
+the current slot and the count of the previous one. The number of requests
+in the sliding window ending now is estimated as the current count plus the
+previous count weighted by how much of the previous slot the window still
+covers. A request updates three numbers, however many requests the key
+made, so fetch and heartbeat traffic costs the same at any rate.
+
+Keys live in a least-recently-used map capped at ``max_keys``; a key unseen
+for two windows carries no count and is evicted from the cold end as new
+requests arrive, so memory stays bounded by the number of recently active
+clients.
+
+:class:`SlidingWindowLimiter` counts in the memory of one process. Limiters
+sharing their counts between processes, such as
+:class:`~.shared_ratelimit.SharedWindowLimiter`, plug into
+:class:`RouteLimits` through its ``limiter_factory``.
+"""
+
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Protocol, Sequence, Tuple
+
+
+class RateLimiter(Protocol):
+    """Counts requests per key against a limit."""
+
+    limit: int
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """Count a request of ``key`` if the limit allows it; return 0, or the seconds until it would be allowed."""
+
+
+def wait_for_room(limit: int, window: float, elapsed: float, previous: float, current: float) -> float:
+    """Seconds until a sliding window counter leaves room for one more request.
+
+    Args:
+        limit: Requests allowed per window.
+        window: Window length in seconds.
+        elapsed: Seconds since the current slot started.
+        previous: Count of the previous slot.
+        current: Count of the current slot.
+    """
+    room = limit - 1
+    if current <= room:
+        # Room returns as the previous slot slides out of the window
+        return max(window * (1 - (room - current) / previous) - elapsed, 0)
+    if room <= 0:
+        # The current slot alone fills the window until it is the previous one and gone
+        return 2 * window - elapsed
+    # Wait into the next slot, where the current count slides out
+    return window - elapsed + window * (1 - room / current)
+
+
+class SlidingWindowLimiter:
+    """Allows each key ``limit`` requests per sliding window of ``window`` seconds.
+
+    Not thread-safe; the middleware calls it from the event loop only.
+    """
+
+    def __init__(self, limit: int, window: float = 60, max_keys: int = 10000) -> None:
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        # key -> [start of the current slot, previous slot count, current slot count]
+        self._slots: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """Count a request of ``key`` if the limit allows it.
+
+        Args:
+            key: The client the request is counted for.
+            now: Current time (default ``time.monotonic()``).
+
+        Returns:
+            0 if the request is allowed, otherwise the seconds until it would be.
+        """
+        if now is None:
+            now = time.monotonic()
+        self._evict_idle(now)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = [now, 0, 0]
+            if len(self._slots) > self.max_keys:
+                self._slots.popitem(last=False)
+        else:
+            self._slots.move_to_end(key)
+            self._advance(slot, now)
+
+        start, previous, current = slot
+        elapsed = now - start
+        if previous * (1 - elapsed / self.window) + current + 1 > self.limit:
+            return wait_for_room(self.limit, self.window, elapsed, previous, current)
+        slot[2] = current + 1
+        return 0
+
+    def _advance(self, slot: List[float], now: float) -> None:
+        """Move the slot of a key forward to the one containing ``now``."""
+        passed = int((now - slot[0]) // self.window)
+        if passed >= 1:
+            slot[0] += passed * self.window
+            slot[1] = slot[2] if passed == 1 else 0
+            slot[2] = 0
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop keys unseen for two windows, coldest first."""
+        while self._slots:
+            key, slot = next(iter(self._slots.items()))
+            if now - slot[0] < 2 * self.window:
+                break
+            del self._slots[key]
+
+
+# Creates the limiter of a route from its name and requests per minute
+LimiterFactory = Callable[[str, int], RateLimiter]
+
+# Name of the limiter of paths matching no route rule
+DEFAULT_LIMITER = "default"
+
+
+class RouteLimits:
+    """Chooses the limiter of a request path: the first matching route rule, or the default one.
+
+    Every rule counts its requests separately from the other rules and the
+    default, so e.g. heartbeats do not use up a client's budget for other calls.
+
+    Args:
+        requests_per_minute: Limit of paths matching no rule (0 = unlimited).
+        routes: ``(path pattern, requests per minute)`` rules; ``*`` in a
+            pattern matches one path segment, and a limit of 0 exempts the route.
+        max_keys: Most clients tracked per limiter.
+        limiter_factory: Creates each limiter from its name, the route
+            pattern or :data:`DEFAULT_LIMITER`, and its limit (default:
+            a :class:`SlidingWindowLimiter` per route).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        routes: Sequence[Tuple[str, int]] = (),
+        max_keys: int = 10000,
+        limiter_factory: Optional[LimiterFactory] = None,
+    ) -> None:
+        factory = limiter_factory or (lambda name, limit: SlidingWindowLimiter(limit, max_keys=max_keys))
+
+        def limiter(name: str, limit: int) -> Optional[RateLimiter]:
+            return factory(name, limit) if limit > 0 else None
+
+        self.default = limiter(DEFAULT_LIMITER, requests_per_minute)
+        self.routes = [(re.compile(re.escape(pattern).replace(r"\*", "[^/]*") + "$"), limiter(pattern, limit)) for pattern, limit in routes]
+
+    def limiters(self) -> List[RateLimiter]:
+        """Return every limiter, the default one first."""
+        return [limiter for limiter in [self.default, *(limiter for _, limiter in self.routes)] if limiter is not None]
+
+    def limiter_for(self, path: str) -> Optional[RateLimiter]:
+        """Return the limiter counting requests to ``path``, or None if it is not limited."""
+        for pattern, limiter in self.routes:
+            if pattern.match(path):
+                return limiter
+        return self.default
+
+
+def retry_after_seconds(wait: float) -> int:
+    """Round a wait up to the whole seconds of a ``Retry-After`` header."""
+    return max(math.ceil(wait), 1)
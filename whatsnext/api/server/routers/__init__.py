@@ -1,5 +1,5 @@
 """FastAPI routers for the WhatsNext server API."""
 
-from . import artifacts, clients, jobs, projects, tasks
+from . import artifacts, clients, jobs, projects, scheduling, status, tasks
 
-__all__ = ["artifacts", "clients", "jobs", "projects", "tasks"]
+__all__ = ["artifacts", "clients", "jobs", "projects", "scheduling", "status", "tasks"]
@@ -1,12 +1,14 @@
 import re
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import text
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import SessionRunner, get_db, get_session_runner
+from ..heartbeats import heartbeat_buffer
+from ..pagination import keyset_page, set_next_cursor
 
 # Maximum items per page to prevent DoS via large queries
 MAX_PAGE_SIZE = 1000
@@ -27,15 +29,19 @@ def get_client(id: str, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[schemas.ClientResponse])
 def get_clients(
+    response: Response,
     db: Session = Depends(get_db),
     limit: int = Query(default=100, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
-    skip: int = Query(default=0, ge=0, description="Number of items to skip"),
+    skip: int = Query(default=0, ge=0, description="Number of items to skip (deprecated, use cursor)"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor header of the previous page"),
     active_only: bool = True,
 ):
+    """List clients by ID, page by page; the next page's cursor is in the ``X-Next-Cursor`` header."""
     query = db.query(models.Client)
     if active_only:
         query = query.filter(models.Client.is_active == 1)
-    clients = query.limit(limit).offset(skip).all()
+    clients, next_cursor = keyset_page(query, [(models.Client.id, False)], limit, cursor=cursor, skip=skip)
+    set_next_cursor(response, next_cursor)
     return clients
 
 
@@ -66,6 +72,7 @@ def register_client(client: schemas.ClientRegister, db: Session = Depends(get_db
         )
         db.commit()
         db.refresh(existing)
+        heartbeat_buffer.add_known(client.id)
         return existing
 
     new_client = models.Client(
@@ -79,18 +86,30 @@ def register_client(client: schemas.ClientRegister, db: Session = Depends(get_db
     db.add(new_client)
     db.commit()
     db.refresh(new_client)
+    heartbeat_buffer.add_known(new_client.id)
     return new_client
 
 
-@router.post("/{id}/heartbeat", status_code=status.HTTP_200_OK)
-def heartbeat(id: str, db: Session = Depends(get_db)):
-    """Update client's last heartbeat timestamp."""
-    client = db.query(models.Client).filter(models.Client.id == id).first()
-    if not client:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Client with id {id} not found.")
+def _client_exists(db: Session, id: str) -> bool:
+    return db.query(models.Client).filter(models.Client.id == id).first() is not None
 
-    db.query(models.Client).filter(models.Client.id == id).update({"last_heartbeat": text("now()")}, synchronize_session=False)
-    db.commit()
+
+@router.post("/{id}/heartbeat", status_code=status.HTTP_200_OK)
+async def heartbeat(id: str, runner: SessionRunner = Depends(get_session_runner)):
+    """Record a heartbeat of the client and renew the leases of its jobs.
+
+    Heartbeats are buffered and written in bulk every
+    ``heartbeat_flush_interval`` seconds; without a running flush thread
+    they are written immediately.
+    """
+    if not heartbeat_buffer.is_known(id):
+        if not await runner.run(_client_exists, id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Client with id {id} not found.")
+        heartbeat_buffer.add_known(id)
+
+    heartbeat_buffer.record(id)
+    if not heartbeat_buffer.running:
+        await runner.run(heartbeat_buffer.flush)
     return {"status": "ok"}
 
 
@@ -116,6 +135,7 @@ def delete_client(id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Client with id {id} not found.")
     client.delete(synchronize_session=False)
     db.commit()
+    heartbeat_buffer.forget(id)
 
 
 @router.post("/{id}/deactivate", status_code=status.HTTP_200_OK)
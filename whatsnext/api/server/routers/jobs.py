@@ -1,18 +1,26 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..database import get_db
 from ..dependencies import (
+    apply_status_change,
     are_dependencies_completed,
     detect_circular_dependency,
     get_dependency_ids,
     has_failed_dependency,
+    parse_dependency_ids,
     propagate_failure,
+    release_dependents,
+    set_dependencies,
 )
-from ..validate_in_db import validate_project_exists, validate_task_in_project_exists
+from ..leases import LEASED_STATES, NO_LEASE
+from ..notifier import announce
+from ..pagination import keyset_page, set_next_cursor
+from ..validate_in_db import validate_dependencies_exist, validate_project_exists, validate_task_in_project_exists
 
 # Maximum items per page to prevent DoS via large queries
 MAX_PAGE_SIZE = 1000
@@ -28,17 +36,41 @@ def get_job(id: int, db: Session = Depends(get_db)):
     return job
 
 
+# Sort keys of the job listing orders
+JOB_ORDERS = {
+    "id": [(models.Job.id, False)],
+    "priority": [(models.Job.priority, True), (models.Job.id, False)],
+}
+
+
 @router.get("/", response_model=List[schemas.JobResponse])
 def get_jobs(
+    response: Response,
     db: Session = Depends(get_db),
     limit: int = Query(default=10, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
-    skip: int = Query(default=0, ge=0, description="Number of items to skip"),
+    skip: int = Query(default=0, ge=0, description="Number of items to skip (deprecated, use cursor)"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor header of the previous page"),
+    order: Literal["id", "priority"] = Query(default="id", description="Sort by ID, or by priority (highest first) then ID"),
     project_id: Optional[int] = None,
+    status_filter: Optional[str] = None,
 ):
+    """List jobs page by page.
+
+    The cursor of the next page is sent in the ``X-Next-Cursor`` header; it
+    is absent on the last page. Pages of one project are read from an
+    index whatever their depth, in priority order when ``status_filter`` is
+    given as well.
+    """
+    if status_filter and status_filter not in models.JobStatus.__members__:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid status '{status_filter}'")
+
     query = db.query(models.Job)
     if project_id is not None:
         query = query.filter(models.Job.project_id == project_id)
-    jobs = query.limit(limit).offset(skip).all()
+    if status_filter:
+        query = query.filter(models.Job.status == models.JobStatus[status_filter])
+    jobs, next_cursor = keyset_page(query, JOB_ORDERS[order], limit, cursor=cursor, skip=skip)
+    set_next_cursor(response, next_cursor)
     return jobs
 
 
@@ -47,10 +79,13 @@ def add_job(job: schemas.JobCreate, db: Session = Depends(get_db)):
     """Create a new job.
 
     Validates that the project and task exist, and that the dependencies
-    don't create a circular dependency.
+    don't create a circular dependency. Jobs depending on a failed job are
+    created as BLOCKED.
     """
     validate_project_exists(db, job.project_id)
     validate_task_in_project_exists(db, job.task_id, job.project_id)
+    dep_ids = parse_dependency_ids(job.depends)
+    validate_dependencies_exist(db, dep_ids, job.project_id)
 
     # Check for circular dependencies (use 0 as placeholder for new job ID)
     if job.depends and detect_circular_dependency(db, 0, job.depends, job.project_id):
@@ -59,8 +94,15 @@ def add_job(job: schemas.JobCreate, db: Session = Depends(get_db)):
             detail="Circular dependency detected. Cannot create job with these dependencies.",
         )
 
-    new_job = models.Job(**job.model_dump())
+    new_job = models.Job(**job.model_dump(exclude={"depends"}))
     db.add(new_job)
+    if dep_ids:
+        db.flush()  # Flush to get the ID
+        set_dependencies(db, new_job.id, dep_ids)
+        # Jobs whose dependencies already failed can never run
+        if has_failed_dependency(db, new_job):
+            new_job.status = models.JobStatus.BLOCKED
+    announce(db, job.project_id)
     db.commit()
     db.refresh(new_job)
     return new_job
@@ -70,14 +112,21 @@ def add_job(job: schemas.JobCreate, db: Session = Depends(get_db)):
 def update_job(id: int, job: schemas.JobUpdate, db: Session = Depends(get_db)):
     """Update a job.
 
-    Validates circular dependencies and propagates failure status to dependent jobs.
+    Validates circular dependencies, keeps the unmet dependency counts of
+    dependent jobs in step with status changes and propagates failure status
+    to dependent jobs. A PENDING job depending on a failed job is stored as
+    BLOCKED.
     """
     validate_project_exists(db, job.project_id)
     job_query = db.query(models.Job).filter(models.Job.id == id)
-    old_job = job_query.first()
+    # Concurrent updates of the job wait here, so each sees the status the previous one set
+    old_job = job_query.with_for_update().first()
     if old_job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job with id {id} not found.")
 
+    dep_ids = parse_dependency_ids(job.depends)
+    validate_dependencies_exist(db, dep_ids, job.project_id)
+
     # Check for circular dependencies if depends is being updated
     if job.depends and detect_circular_dependency(db, id, job.depends, job.project_id):
         raise HTTPException(
@@ -86,16 +135,53 @@ def update_job(id: int, job: schemas.JobUpdate, db: Session = Depends(get_db)):
         )
 
     old_status = old_job.status
-    job_query.update(job.model_dump(), synchronize_session=False)
+    new_status = models.JobStatus(job.status)
+    set_dependencies(db, id, dep_ids)
+    if new_status == models.JobStatus.PENDING and has_failed_dependency(db, old_job):
+        # Jobs whose dependencies already failed can never run
+        new_status = models.JobStatus.BLOCKED
+    values = {**job.model_dump(exclude={"depends"}), "status": new_status}
+    if new_status not in LEASED_STATES:
+        # Nobody is working on the job any more
+        values.update(NO_LEASE)
+    job_query.update(values, synchronize_session=False)
+    apply_status_change(db, id, old_status, new_status)
+    if new_status in (models.JobStatus.PENDING, models.JobStatus.COMPLETED):
+        # The job itself or its dependents may now be ready
+        announce(db, job.project_id)
+    if old_status != new_status and new_status in (models.JobStatus.FAILED, models.JobStatus.BLOCKED):
+        # Block the dependents in the same transaction as the status change
+        propagate_failure(db, old_job)
     db.commit()
 
-    # If job status changed to FAILED, propagate to dependent jobs
-    updated_job = job_query.first()
-    if old_status != models.JobStatus.FAILED and job.status == models.JobStatus.FAILED.value:
-        propagate_failure(db, updated_job)
-        db.commit()
+    return {"data": job_query.first()}
 
-    return {"data": updated_job}
+
+@router.post("/{id}/release", status_code=status.HTTP_200_OK, response_model=schemas.JobResponse)
+def release_job(id: int, db: Session = Depends(get_db)):
+    """Return a claimed job that was not started to the queue.
+
+    Only QUEUED jobs can be released. The job becomes PENDING again, loses
+    its lease and gets back the attempt its claim counted.
+    """
+    released = db.scalars(
+        update(models.Job)
+        .where(models.Job.id == id, models.Job.status == models.JobStatus.QUEUED)
+        .values(status=models.JobStatus.PENDING, attempts=func.greatest(models.Job.attempts - 1, 0), **NO_LEASE)
+        .returning(models.Job)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if released is None:
+        job = db.query(models.Job).filter(models.Job.id == id).first()
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job with id {id} not found.")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job with id {id} is {job.status.name}, only QUEUED jobs can be released.",
+        )
+    announce(db, released.project_id)
+    db.commit()
+    return released
 
 
 @router.get("/{id}/dependencies", response_model=schemas.JobDependencyStatusResponse)
@@ -105,7 +191,7 @@ def get_job_dependencies(id: int, db: Session = Depends(get_db)):
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job with id {id} not found.")
 
-    dep_ids = get_dependency_ids(job)
+    dep_ids = get_dependency_ids(db, job)
     dependencies = []
 
     if dep_ids:
@@ -132,7 +218,11 @@ def get_job_dependencies(id: int, db: Session = Depends(get_db)):
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_job(id: int, db: Session = Depends(get_db)):
     job = db.query(models.Job).filter(models.Job.id == id)
-    if job.first() is None:
+    existing_job = job.first()
+    if existing_job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job with id {id} not found.")
+    project_id = existing_job.project_id
+    release_dependents(db, select(models.Job.id).where(models.Job.id == id))
     job.delete(synchronize_session=False)
+    announce(db, project_id)
     db.commit()
@@ -1,14 +1,23 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
-from ..database import get_db
-from ..dependencies import get_jobs_with_completed_dependencies
+from ..bulk import insert_jobs, resolve_batch_dependencies
+from ..counts import count_jobs, count_jobs_by_task, count_pending_by_priority, get_job_counts
+from ..database import SessionRunner, get_db, get_session_runner
+from ..dependencies import parse_dependency_ids, release_dependents
+from ..notifier import announce, long_poll
+from ..pagination import keyset_page, set_next_cursor
+from ..scheduler import claim_jobs, claim_next_job
+from ..validate_in_db import validate_dependencies_exist, validate_tasks_in_project_exist
 
 # Maximum items per page to prevent DoS via large queries
 MAX_PAGE_SIZE = 1000
+# Maximum number of jobs a worker can claim in one fetch_jobs call
+MAX_FETCH_JOBS = 100
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
@@ -31,18 +40,22 @@ def get_project_by_name(name: str, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[schemas.ProjectResponse])
 def get_projects(
+    response: Response,
     db: Session = Depends(get_db),
     limit: int = Query(default=10, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
-    skip: int = Query(default=0, ge=0, description="Number of items to skip"),
+    skip: int = Query(default=0, ge=0, description="Number of items to skip (deprecated, use cursor)"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor header of the previous page"),
     status_filter: Optional[str] = "ACTIVE",
 ):
+    """List projects by ID, page by page; the next page's cursor is in the ``X-Next-Cursor`` header."""
     if status_filter and status_filter not in models.ProjectStatus.__members__:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid status '{status_filter}'")
 
     query = db.query(models.Project)
     if status_filter:
         query = query.filter(models.Project.status == status_filter)
-    projects = query.limit(limit).offset(skip).all()
+    projects, next_cursor = keyset_page(query, [(models.Project.id, False)], limit, cursor=cursor, skip=skip)
+    set_next_cursor(response, next_cursor)
     return projects
 
 
@@ -61,7 +74,7 @@ def update_project(id: int, project: schemas.ProjectUpdate, db: Session = Depend
     old_project = project_query.first()
     if old_project is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project with id {id} not found.")
-    project_query.update(project.model_dump(), synchronize_session=False)
+    project_query.update(project.model_dump(exclude_unset=True), synchronize_session=False)
     db.commit()
     return {"data": project_query.first()}
 
@@ -84,46 +97,124 @@ def delete_project_by_name(name: str, db: Session = Depends(get_db)):
     db.commit()
 
 
-@router.get("/{id}/fetch_job", response_model=schemas.JobAndCountResponse)
-def fetch_job(
+@router.get("/{id}/stats", response_model=schemas.ProjectStatsResponse)
+def get_project_stats(
     id: int,
     db: Session = Depends(get_db),
+    band_width: int = Query(default=10, ge=1, description="Priority values per band of pending_by_priority"),
+):
+    """Summarize a project's queue: job counts by status, by task and by priority band.
+
+    Status counts are read from the maintained per-project counters; the
+    other counts are aggregated in the database, so the response stays small
+    however many jobs the project has.
+    """
+    project = db.query(models.Project).filter(models.Project.id == id).first()
+    if not project:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project with id {id} not found.")
+
+    by_status = {job_status.name: n for job_status, n in get_job_counts(db, id).items()}
+    bands, oldest_pending_age = count_pending_by_priority(db, id, band_width)
+    return {
+        "project_id": id,
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_task": [{"task_id": task_id, "task_name": name, "n": n} for task_id, name, n in count_jobs_by_task(db, id)],
+        "pending_by_priority": [{"min_priority": lowest, "max_priority": lowest + band_width - 1, "n": n} for lowest, n in bands],
+        "oldest_pending_age": oldest_pending_age,
+    }
+
+
+@router.get("/{id}/fetch_job", response_model=schemas.JobAndCountResponse)
+async def fetch_job(
+    id: int,
+    runner: SessionRunner = Depends(get_session_runner),
     available_cpu: int = 0,
     available_accelerators: int = 0,
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for a ready job"),
+    client_id: Optional[str] = Query(default=None, description="Registered client claiming the job, which then holds a lease on it"),
 ):
     """Fetch the next job ready for execution.
 
-    Only returns jobs whose dependencies are all COMPLETED.
-    Jobs with failed dependencies are automatically marked as BLOCKED.
+    Only returns jobs whose dependencies are all COMPLETED. The job is claimed
+    atomically, so concurrent workers never receive the same job. With
+    ``wait``, an empty result is delayed until a job becomes ready or the
+    timeout expires.
 
     Args:
         id: Project ID.
         available_cpu: Filter jobs by available CPU (0 = no filter).
         available_accelerators: Filter jobs by available accelerators (0 = no filter).
+        wait: Long-poll timeout in seconds (0 = return immediately, capped at ``max_fetch_wait``).
+        client_id: ID of the registered client claiming the job. The job is then
+            leased to it and requeued if its heartbeats stop.
     """
-    # Get jobs with completed dependencies (this also marks blocked jobs)
-    ready_jobs = get_jobs_with_completed_dependencies(db, id, available_cpu=available_cpu, available_accelerators=available_accelerators)
 
-    # Count all pending jobs (including those waiting for dependencies)
-    job_count = db.query(models.Job).filter(models.Job.project_id == id).filter(models.Job.status == models.JobStatus.PENDING).count()
+    def claim(db: Session) -> Dict[str, Any]:
+        # Count all pending jobs (including those waiting for dependencies)
+        job_count = count_jobs(db, id, models.JobStatus.PENDING)
 
-    if not ready_jobs:
-        db.commit()  # Commit any status changes from dependency check
-        return {"job": None, "num_pending": job_count}
+        job = claim_next_job(db, id, available_cpu=available_cpu, available_accelerators=available_accelerators, lease_owner=client_id)
+        if job is None:
+            db.commit()
+            return {"job": None, "num_pending": job_count}
 
-    # Get the highest priority job from ready jobs
-    job = ready_jobs[0]
+        response = {"job": schemas.JobWithTaskNameResponse.model_validate(job), "num_pending": job_count}
+        db.commit()
+        return response
 
-    # Get the task name
-    task = db.query(models.Task).filter(models.Task.id == job.task_id).first()
-    task_name = task.name if task else None
+    return await long_poll(runner, [id], wait, claim, "job")
 
-    # Mark job as QUEUED
-    db.query(models.Job).filter(models.Job.id == job.id).update({"status": models.JobStatus.QUEUED}, synchronize_session=False)
-    db.commit()
-    db.refresh(job)
-    job.task_name = task_name
-    return {"job": job, "num_pending": job_count}
+
+@router.get("/{id}/fetch_jobs", response_model=schemas.JobsAndCountResponse)
+async def fetch_jobs(
+    id: int,
+    runner: SessionRunner = Depends(get_session_runner),
+    max_jobs: int = Query(default=10, ge=1, le=MAX_FETCH_JOBS, alias="max", description="Maximum number of jobs to claim"),
+    available_cpu: int = 0,
+    available_accelerators: int = 0,
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for a ready job"),
+    client_id: Optional[str] = Query(default=None, description="Registered client claiming the job, which then holds a lease on it"),
+    sequential: bool = Query(default=False, description="The jobs run one after another: each must fit the budget on its own"),
+):
+    """Fetch up to ``max`` jobs ready for execution in one round trip.
+
+    Jobs are claimed atomically in priority order while their combined
+    requirements fit the ``available_cpu`` and ``available_accelerators``
+    budget, or with ``sequential`` while each job fits it on its own. With
+    ``wait``, an empty result is delayed as for ``fetch_job``.
+
+    Args:
+        id: Project ID.
+        max_jobs: Maximum number of jobs to claim (query parameter ``max``).
+        available_cpu: CPU budget for all returned jobs together (0 = no filter).
+        available_accelerators: Accelerator budget for all returned jobs together (0 = no filter).
+        wait: Long-poll timeout in seconds (0 = return immediately, capped at ``max_fetch_wait``).
+        client_id: ID of the registered client claiming the jobs, which then holds leases on them.
+        sequential: Apply the budget to each job instead of to all of them together.
+    """
+
+    def claim(db: Session) -> Dict[str, Any]:
+        # Count all pending jobs (including those waiting for dependencies)
+        job_count = count_jobs(db, id, models.JobStatus.PENDING)
+
+        jobs = claim_jobs(
+            db,
+            id,
+            max_jobs,
+            available_cpu=available_cpu,
+            available_accelerators=available_accelerators,
+            lease_owner=client_id,
+            sequential=sequential,
+        )
+        response = {
+            "jobs": [schemas.JobWithTaskNameResponse.model_validate(job) for job in jobs],
+            "num_pending": job_count,
+        }
+        db.commit()
+        return response
+
+    return await long_poll(runner, [id], wait, claim, "jobs")
 
 
 @router.delete("/{project_id}/jobs/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -132,7 +223,9 @@ def delete_project_job(project_id: int, job_id: int, db: Session = Depends(get_d
     job = db.query(models.Job).filter(models.Job.id == job_id, models.Job.project_id == project_id).first()
     if job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job with id {job_id} not found in project {project_id}.")
+    release_dependents(db, select(models.Job.id).where(models.Job.id == job_id))
     db.delete(job)
+    announce(db, project_id)
     db.commit()
 
 
@@ -143,36 +236,41 @@ def clear_project_queue(id: int, db: Session = Depends(get_db)):
     if project is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project with id {id} not found.")
 
+    release_dependents(db, select(models.Job.id).where(models.Job.project_id == id, models.Job.status == models.JobStatus.PENDING))
     deleted_count = (
         db.query(models.Job)
         .filter(models.Job.project_id == id, models.Job.status == models.JobStatus.PENDING)
         .delete(synchronize_session=False)
     )
+    announce(db, id)
     db.commit()
     return {"deleted": deleted_count}
 
 
 @router.post("/{id}/jobs/batch", status_code=status.HTTP_201_CREATED, response_model=schemas.JobBatchResponse)
 def add_jobs_batch(id: int, batch: schemas.JobBatchCreate, db: Session = Depends(get_db)):
-    """Add multiple jobs to a project's queue in a single request."""
+    """Add multiple jobs to a project's queue in a single request.
+
+    Jobs may depend on existing jobs (``depends``) and on other jobs of the
+    batch, by position (``depends_on_items``) or by name
+    (``depends_on_names``), so a whole DAG is submitted in one transaction.
+    Tasks and dependencies are validated with one query each and the jobs
+    are written with multi-row inserts, so the number of statements does not
+    grow with the batch size. Jobs depending on a failed job are created as
+    BLOCKED.
+    """
     project = db.query(models.Project).filter(models.Project.id == id).first()
     if project is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project with id {id} not found.")
 
-    created_ids = []
-    for job_item in batch.jobs:
-        new_job = models.Job(
-            name=job_item.name,
-            project_id=id,
-            task_id=job_item.task_id,
-            parameters=job_item.parameters,
-            priority=job_item.priority,
-            depends=job_item.depends,
-            status=models.JobStatus.PENDING,
-        )
-        db.add(new_job)
-        db.flush()  # Flush to get the ID
-        created_ids.append(new_job.id)
+    validate_tasks_in_project_exist(db, (job_item.task_id for job_item in batch.jobs), id)
+    dep_ids = [dep_id for job_item in batch.jobs for dep_id in parse_dependency_ids(job_item.depends)]
+    validate_dependencies_exist(db, list(dict.fromkeys(dep_ids)), id)
+
+    batch_deps = resolve_batch_dependencies(batch.jobs)
+
+    created_ids = insert_jobs(db, id, batch.jobs, batch_deps)
 
+    announce(db, id)
     db.commit()
     return {"created": len(created_ids), "job_ids": created_ids}
@@ -0,0 +1,77 @@
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from ..config import settings
+from ..counts import count_jobs_of_projects
+from ..database import SessionRunner, get_session_runner
+from ..fair_share import claim_fair_share
+from ..notifier import long_poll
+
+# Maximum number of projects one cross-project fetch may serve
+MAX_FETCH_PROJECTS = 50
+
+router = APIRouter(tags=["Scheduling"])
+
+
+@router.get("/fetch_job", response_model=schemas.JobAndCountResponse)
+async def fetch_job(
+    runner: SessionRunner = Depends(get_session_runner),
+    project_ids: List[int] = Query(alias="project_id", description="Projects to serve; repeat for each project"),
+    weights: List[float] = Query(default=[], alias="weight", description="Weight per project, in the same order (default 1 each)"),
+    available_cpu: int = 0,
+    available_accelerators: int = 0,
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for a ready job"),
+    client_id: Optional[str] = Query(default=None, description="Registered client claiming the job, which then holds a lease on it"),
+):
+    """Fetch the next ready job of any of several projects by weighted fair share.
+
+    Each project is served in proportion to its weight: the job comes from
+    the project with the lowest recent consumption per unit of weight that
+    has a job fitting the resources. Consumption decays with the
+    ``fair_share_half_life`` setting. Claiming and ``wait`` work as for
+    ``/projects/{id}/fetch_job``. Shares are per project, as projects have
+    no owning entity.
+
+    Args:
+        project_ids: Project IDs (query parameter ``project_id``, repeated).
+        weights: Positive weights (query parameter ``weight``, repeated), one per project.
+        available_cpu: Filter jobs by available CPU (0 = no filter).
+        available_accelerators: Filter jobs by available accelerators (0 = no filter).
+        wait: Long-poll timeout in seconds (0 = return immediately, capped at ``max_fetch_wait``).
+        client_id: ID of the registered client claiming the job, which then holds a lease on it.
+    """
+    if not 0 < len(project_ids) <= MAX_FETCH_PROJECTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {MAX_FETCH_PROJECTS} projects are required.",
+        )
+    if len(set(project_ids)) != len(project_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Each project may only be listed once.")
+    if not weights:
+        weights = [1.0] * len(project_ids)
+    if len(weights) != len(project_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give one weight per project, or none.")
+    if any(weight <= 0 for weight in weights):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Weights must be positive.")
+    shares = dict(zip(project_ids, weights))
+
+    def claim(db: Session) -> Dict[str, Any]:
+        # Count all pending jobs of the projects (including those waiting for dependencies)
+        job_count = count_jobs_of_projects(db, project_ids, models.JobStatus.PENDING)
+
+        job = claim_fair_share(
+            db,
+            shares,
+            settings.fair_share_half_life,
+            available_cpu=available_cpu,
+            available_accelerators=available_accelerators,
+            lease_owner=client_id,
+        )
+        response = {"job": schemas.JobWithTaskNameResponse.model_validate(job) if job else None, "num_pending": job_count}
+        db.commit()
+        return response
+
+    return await long_poll(runner, project_ids, wait, claim, "job")
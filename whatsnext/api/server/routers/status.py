@@ -0,0 +1,33 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import exc
+from sqlalchemy.orm import Session
+
+from .. import schemas
+from ..config import settings
+from ..database import get_db
+from ..summary import build_summary, summary_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/status", tags=["Status"])
+
+
+@router.get("/summary", response_model=schemas.StatusSummaryResponse)
+def get_status_summary(db: Session = Depends(get_db)):
+    """Snapshot of every project's job counts, the clients and recent throughput, for dashboards.
+
+    Each server process serves the same snapshot for ``status_summary_ttl``
+    seconds; the session only connects when the snapshot is rebuilt. If the
+    database fails the rebuild, the previous snapshot is served with the
+    server marked unhealthy, or 503 if there is none.
+    """
+    try:
+        return summary_cache.get(lambda: build_summary(db), settings.status_summary_ttl)
+    except exc.DBAPIError as e:
+        logger.error(f"Building the status summary failed: {e}")
+        last = summary_cache.last
+        if last is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database unavailable.") from e
+        return {**last, "server": {"status": "unhealthy", "database": "disconnected"}}
@@ -1,10 +1,11 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..database import get_db
+from ..pagination import keyset_page, set_next_cursor
 from ..validate_in_db import validate_project_exists
 
 # Maximum items per page to prevent DoS via large queries
@@ -15,11 +16,14 @@ router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
 @router.get("/", response_model=List[schemas.TaskResponse])
 def get_tasks(
+    response: Response,
     db: Session = Depends(get_db),
     limit: int = Query(default=10, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
-    skip: int = Query(default=0, ge=0, description="Number of items to skip"),
+    skip: int = Query(default=0, ge=0, description="Number of items to skip (deprecated, use cursor)"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor header of the previous page"),
     project_id: Optional[int] = None,
 ):
+    """List a project's tasks by ID, page by page; the next page's cursor is in the ``X-Next-Cursor`` header."""
     if project_id is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="project_id is required")
 
@@ -27,7 +31,9 @@ def get_tasks(
     if project.status == models.ProjectStatus.ARCHIVED:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Project with id {project_id} is archived.")
 
-    tasks = db.query(models.Task).filter(models.Task.project_id == project_id).limit(limit).offset(skip).all()
+    query = db.query(models.Task).filter(models.Task.project_id == project_id)
+    tasks, next_cursor = keyset_page(query, [(models.Task.id, False)], limit, cursor=cursor, skip=skip)
+    set_next_cursor(response, next_cursor)
     return tasks
 
 
@@ -0,0 +1,175 @@
+"""Atomic job claiming for workers.
+
+A claim is a single ``UPDATE ... RETURNING`` statement whose candidate
+subquery locks the chosen rows with ``FOR UPDATE SKIP LOCKED``. Concurrent
+workers therefore never receive the same job and never queue up behind each
+other's row locks; a locked candidate is simply skipped.
+
+Readiness is read from ``jobs.unmet_dependencies`` and the claim order from
+``jobs.claim_rank``, so the candidate is found through the partial
+``ix_jobs_pending`` index instead of by checking every pending job's
+dependencies or sorting the queue.
+
+Projects may age priorities (``projects.priority_aging``): a ready job then
+ranks by ``priority + priority_aging * hours waited since creation``, so a
+steady stream of high priority work cannot starve older low priority jobs.
+Triggers keep ``claim_rank`` in that order (see
+:data:`models.JOB_RANK_TRIGGERS`); without aging it is the plain
+``priority``.
+
+Every claim counts as an attempt. A claim made for a registered client also
+takes a lease on the jobs, which the client's heartbeats renew; see
+:mod:`.leases` for what happens when it expires.
+"""
+
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import ColumnElement, Select, func, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+# Requirements of a job; jobs without a task require nothing
+_required_cpu = func.coalesce(models.Task.required_cpu, 0)
+_required_accelerators = func.coalesce(models.Task.required_accelerators, 0)
+
+
+def filter_ready(stmt: Select, project_id: int, available_cpu: int = 0, available_accelerators: int = 0) -> Select:
+    """Restrict a query on jobs to the ready jobs of a project that fit the resources.
+
+    Joins ``tasks`` (outer, so jobs without a task are kept) and compares
+    ``required_cpu`` / ``required_accelerators`` in SQL, so jobs that do not
+    fit are never loaded. The query may select task columns such as
+    ``Task.name``.
+
+    Args:
+        stmt: SELECT over ``jobs``.
+        project_id: The project to select from.
+        available_cpu: Only keep jobs needing at most this many CPUs (0 = no filter).
+        available_accelerators: Only keep jobs needing at most this many accelerators (0 = no filter).
+    """
+    stmt = stmt.outerjoin(models.Task, models.Task.id == models.Job.task_id).where(
+        models.Job.project_id == project_id,
+        models.Job.status == models.JobStatus.PENDING,
+        models.Job.unmet_dependencies == 0,
+    )
+    if available_cpu > 0:
+        stmt = stmt.where(_required_cpu <= available_cpu)
+    if available_accelerators > 0:
+        stmt = stmt.where(_required_accelerators <= available_accelerators)
+    return stmt
+
+
+def lease_expiry() -> ColumnElement:
+    """SQL expression for the expiry of a lease taken or renewed now."""
+    return func.now() + timedelta(seconds=settings.job_lease_seconds)
+
+
+def claim_jobs(
+    db: Session,
+    project_id: int,
+    max_jobs: int,
+    available_cpu: int = 0,
+    available_accelerators: int = 0,
+    lease_owner: Optional[str] = None,
+    sequential: bool = False,
+) -> List[models.Job]:
+    """Atomically claim up to ``max_jobs`` ready jobs of a project.
+
+    Jobs are taken in (effective) priority order while their combined requirements fit
+    the given budget: the first job that would exceed ``available_cpu`` or
+    ``available_accelerators`` ends the batch, so a batch never skips ahead
+    of a higher priority job. Jobs that could never fit the budget on their
+    own are not considered. With ``sequential`` the jobs are to be run one
+    after another, so each must fit the budget on its own instead of all of
+    them together. The claimed jobs are moved from PENDING to QUEUED
+    in one statement; the change becomes visible to other workers when the
+    caller commits. The same statement counts the attempt, takes the lease
+    and returns the task names, which are set as ``task_name`` on the jobs.
+
+    Args:
+        db: Database session.
+        project_id: The project to claim from.
+        max_jobs: Maximum number of jobs to claim.
+        available_cpu: CPU budget for all claimed jobs together (0 = no filter).
+        available_accelerators: Accelerator budget for all claimed jobs together (0 = no filter).
+        lease_owner: ID of the client claiming the jobs, which then holds a lease
+            on them (None = no lease, the jobs stay claimed until updated).
+        sequential: Apply the budget to each job instead of to the batch.
+
+    Returns:
+        The claimed jobs, highest (effective) priority first.
+    """
+    candidates = select(
+        models.Job.id,
+        models.Job.claim_rank,
+        models.Task.name.label("task_name"),
+        _required_cpu.label("required_cpu"),
+        _required_accelerators.label("required_accelerators"),
+    )
+    candidates = (
+        filter_ready(candidates, project_id, available_cpu, available_accelerators)
+        .order_by(models.Job.claim_rank.desc(), models.Job.id)
+        .limit(max_jobs)
+        .with_for_update(of=models.Job, skip_locked=True)
+        .cte("candidates")
+    )
+
+    # Window functions cannot share a query level with FOR UPDATE, so the
+    # running totals are computed over the locked candidates.
+    claim_order = (candidates.c.claim_rank.desc(), candidates.c.id)
+    running = select(
+        candidates.c.id,
+        candidates.c.task_name,
+        func.row_number().over(order_by=claim_order).label("rank"),
+        func.sum(candidates.c.required_cpu).over(order_by=claim_order).label("cpu"),
+        func.sum(candidates.c.required_accelerators).over(order_by=claim_order).label("accelerators"),
+    ).subquery("running")
+    picked = select(running.c.id, running.c.task_name, running.c.rank)
+    if available_cpu > 0 and not sequential:
+        picked = picked.where(running.c.cpu <= available_cpu)
+    if available_accelerators > 0 and not sequential:
+        picked = picked.where(running.c.accelerators <= available_accelerators)
+    picked = picked.subquery("picked")
+
+    values = {"status": models.JobStatus.QUEUED, "attempts": models.Job.attempts + 1}
+    if lease_owner is not None:
+        values.update(lease_owner=lease_owner, lease_expires_at=lease_expiry())
+    stmt = (
+        update(models.Job)
+        .where(models.Job.id == picked.c.id)
+        .values(values)
+        .returning(models.Job, picked.c.task_name, picked.c.rank)
+        .execution_options(synchronize_session=False)
+    )
+    ranked = []
+    for job, task_name, rank in db.execute(stmt):
+        job.task_name = task_name
+        ranked.append((rank, job))
+    ranked.sort(key=lambda ranked_job: ranked_job[0])
+    return [job for _, job in ranked]
+
+
+def claim_next_job(
+    db: Session,
+    project_id: int,
+    available_cpu: int = 0,
+    available_accelerators: int = 0,
+    lease_owner: Optional[str] = None,
+) -> Optional[models.Job]:
+    """Atomically claim the highest (effective) priority ready job of a project.
+
+    Args:
+        db: Database session.
+        project_id: The project to claim from.
+        available_cpu: Only claim jobs needing at most this many CPUs (0 = no filter).
+        available_accelerators: Only claim jobs needing at most this many accelerators (0 = no filter).
+        lease_owner: ID of the client claiming the job (None = no lease).
+
+    Returns:
+        The claimed job, or None if no job is ready.
+    """
+    jobs = claim_jobs(db, project_id, 1, available_cpu=available_cpu, available_accelerators=available_accelerators, lease_owner=lease_owner)
+    return jobs[0] if jobs else None
@@ -71,12 +71,23 @@ class JobAndCountResponse(BaseModel):
     num_pending: int
 
 
+class JobsAndCountResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    jobs: List[JobWithTaskNameResponse]
+    num_pending: int
+
+
 class JobBatchItem(BaseModel):
     name: str
     task_id: int
     parameters: Dict[str, Any]
     priority: int = 0
+    # Existing jobs, as {job_id: job_name}
     depends: Dict[str, Any] = Field(default_factory=dict)
+    # Jobs of the same batch, by position in the batch or by name
+    depends_on_items: List[int] = Field(default_factory=list)
+    depends_on_names: List[str] = Field(default_factory=list)
 
 
 class JobBatchCreate(BaseModel):
@@ -111,6 +122,7 @@ class ProjectBase(BaseModel):
     name: str
     description: str
     status: str
+    priority_aging: float = Field(default=0, ge=0, description="Priority points a pending job gains per hour waited")
 
 
 class ProjectCreate(ProjectBase):
@@ -146,6 +158,66 @@ class ProjectResponse(ProjectBase):
     updated_at: datetime
 
 
+class TaskJobCount(BaseModel):
+    task_id: Optional[int]
+    task_name: Optional[str]
+    n: int
+
+
+class PriorityBandCount(BaseModel):
+    min_priority: int
+    max_priority: int
+    n: int
+
+
+class ProjectStatsResponse(BaseModel):
+    project_id: int
+    total: int
+    # Number of jobs per status name, every status included
+    by_status: Dict[str, int]
+    # Jobs per task, the most jobs first
+    by_task: List[TaskJobCount]
+    # PENDING jobs per priority band, the highest priorities first
+    pending_by_priority: List[PriorityBandCount]
+    # Seconds since the oldest PENDING job was created
+    oldest_pending_age: Optional[float] = None
+
+
+class ServerHealth(BaseModel):
+    status: str
+    database: str
+
+
+class ProjectSummary(BaseModel):
+    id: int
+    name: str
+    status: str
+    total: int
+    # Number of jobs per status name, every status included
+    by_status: Dict[str, int]
+    # Jobs COMPLETED / FAILED within the recent window
+    recent_completed: int
+    recent_failed: int
+
+
+class ClientSummary(BaseModel):
+    total: int
+    active: int
+    # Resources of the active clients
+    active_cpu: int
+    active_accelerators: int
+
+
+class StatusSummaryResponse(BaseModel):
+    server: ServerHealth
+    # When the snapshot was taken; it may be served for status_summary_ttl seconds
+    generated_at: datetime
+    # Seconds covered by recent_completed / recent_failed
+    recent_window: int
+    projects: List[ProjectSummary]
+    clients: ClientSummary
+
+
 class TaskBase(BaseModel):
     name: str
     project_id: int
@@ -0,0 +1,260 @@
+"""Rate limits shared by all server processes through PostgreSQL.
+
+Each server process (e.g. each ``uvicorn --workers`` process) counts its
+own requests, so with per-process limiters a client gets the limit once per
+process. With ``rate_limit_backend=postgres`` every limiter is a
+:class:`SharedWindowLimiter` and the counts of all processes meet in the
+``rate_limit_counters`` table, one row per (limiter, client, slot). Slots
+are aligned to the wall clock, so all processes and hosts agree on them.
+
+Checking a request stays in memory: a limiter decides on the counts of all
+processes as of the last sync plus the requests this process admitted
+since. A :class:`RateLimitSync` thread in each process adds those requests
+to the table every ``rate_limit_sync_interval`` seconds with one
+``INSERT ... ON CONFLICT DO UPDATE SET n = n + excluded.n`` for all
+limiters and clients, which is atomic under concurrent writers, and reads
+back the totals of the clients the process has seen. A client spreading its
+requests over several processes can exceed its limit by at most what the
+other processes admit within one sync interval.
+
+Until a client's totals have been read back, a process knows nothing of its
+requests to the other processes, so a burst reaching all of them at once
+would get the limit from each. A limiter therefore admits only its share
+``limit / processes`` of a client's requests (``rate_limit_processes``)
+until the client's first sync.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .ratelimit import wait_for_room
+
+logger = logging.getLogger(__name__)
+
+# Requests per (client, slot start) not yet written
+Pending = Dict[Tuple[str, int], int]
+# A limiter with the requests taken from it and the clients it tracks
+Taken = Tuple["SharedWindowLimiter", Pending, List[str]]
+
+
+class SharedWindowLimiter:
+    """Sliding window limiter counting the requests of all server processes.
+
+    Works like :class:`~.ratelimit.SlidingWindowLimiter` on slots aligned to
+    the wall clock, with the counts refreshed by :class:`RateLimitSync`.
+    ``hit`` runs on the event loop and the sync in its thread, so the state
+    is guarded by a lock held only for dictionary updates.
+
+    A key not synced since it was first seen is held to this process's share
+    of the limit, ``limit // processes`` (at least 1).
+    """
+
+    def __init__(self, name: str, limit: int, window: int = 60, max_keys: int = 10000, processes: int = 1) -> None:
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.unsynced_limit = max(1, limit // max(1, processes))
+        self._lock = threading.Lock()
+        # key -> {slot start: requests of all processes}, least recently used first
+        self._counts: "OrderedDict[str, Dict[int, int]]" = OrderedDict()
+        # Tracked keys whose totals have not been read back yet
+        self._unsynced: Set[str] = set()
+        self._pending: Pending = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """Count a request of ``key`` if the limit allows it.
+
+        Args:
+            key: The client the request is counted for.
+            now: Current time (default ``time.time()``).
+
+        Returns:
+            0 if the request is allowed, otherwise the seconds until it would be.
+        """
+        if now is None:
+            now = time.time()
+        slot = int(now // self.window) * self.window
+        with self._lock:
+            self._evict_idle(slot)
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = {}
+                self._unsynced.add(key)
+                if len(self._counts) > self.max_keys:
+                    self._unsynced.discard(self._counts.popitem(last=False)[0])
+            else:
+                self._counts.move_to_end(key)
+
+            limit = self.unsynced_limit if key in self._unsynced else self.limit
+            previous = counts.get(slot - self.window, 0)
+            current = counts.get(slot, 0)
+            elapsed = now - slot
+            if previous * (1 - elapsed / self.window) + current + 1 > limit:
+                return wait_for_room(limit, self.window, elapsed, previous, current)
+            if current == 0:
+                for old in [s for s in counts if s < slot - self.window]:
+                    del counts[old]
+            counts[slot] = current + 1
+            self._pending[key, slot] = self._pending.get((key, slot), 0) + 1
+        return 0
+
+    def take_pending(self) -> Tuple[Pending, List[str]]:
+        """Take the requests not yet written, and the clients whose totals to read back."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending, list(self._counts)
+
+    def restore_pending(self, pending: Pending) -> None:
+        """Put back requests whose write failed, to be written by the next sync."""
+        with self._lock:
+            for slot_key, n in pending.items():
+                self._pending[slot_key] = self._pending.get(slot_key, 0) + n
+
+    def apply_totals(self, keys: List[str], totals: Dict[str, Dict[int, int]]) -> None:
+        """Replace the counts of ``keys`` by the totals of all processes.
+
+        Requests admitted since :meth:`take_pending` are not in the totals
+        yet and are added back on top. The keys get the full limit from now on.
+        """
+        with self._lock:
+            synced = set()
+            for key in keys:
+                if key in self._counts:
+                    self._counts[key] = dict(totals.get(key, {}))
+                    synced.add(key)
+            self._unsynced -= synced
+            for (key, slot), n in self._pending.items():
+                if key in synced:
+                    counts = self._counts[key]
+                    counts[slot] = counts.get(slot, 0) + n
+
+    def _evict_idle(self, slot: int) -> None:
+        """Drop clients without requests in the current or previous slot, least recently seen first."""
+        while self._counts:
+            key, counts = next(iter(self._counts.items()))
+            if counts and max(counts) >= slot - self.window:
+                break
+            del self._counts[key]
+            self._unsynced.discard(key)
+
+
+class RateLimitSync:
+    """Creates the shared limiters of a process and syncs them with the database.
+
+    Pass :meth:`limiter` as the ``limiter_factory`` of
+    :class:`~.ratelimit.RouteLimits`.
+    """
+
+    def __init__(self, max_keys: int = 10000, processes: int = 1) -> None:
+        self.max_keys = max_keys
+        self.processes = processes
+        self.limiters: List[SharedWindowLimiter] = []
+        self._next_cleanup = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def limiter(self, name: str, limit: int) -> SharedWindowLimiter:
+        """Create a shared limiter named ``name`` and sync it from now on."""
+        limiter = SharedWindowLimiter(name, limit, max_keys=self.max_keys, processes=self.processes)
+        self.limiters.append(limiter)
+        return limiter
+
+    def sync(self, db: Session, now: Optional[float] = None) -> int:
+        """Write the requests of every limiter, read back the totals, drop expired rows and commit.
+
+        If writing or committing fails, the requests are put back.
+
+        Args:
+            db: Database session.
+            now: Current time (default ``time.time()``).
+
+        Returns:
+            Number of counter rows written.
+        """
+        if now is None:
+            now = time.time()
+        table = models.RateLimitCounter.__table__
+        taken: List[Taken] = [(limiter, *limiter.take_pending()) for limiter in self.limiters]
+        try:
+            # Sorted, so concurrent syncs lock counter rows in the same order
+            rows = [
+                {"limiter": limiter.name, "key": key, "slot_start": slot, "n": n}
+                for limiter, pending, _ in sorted(taken, key=lambda taken_limiter: taken_limiter[0].name)
+                for (key, slot), n in sorted(pending.items())
+            ]
+            if rows:
+                stmt = insert(table).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.limiter, table.c.key, table.c.slot_start],
+                    set_={"n": table.c.n + stmt.excluded.n},
+                )
+                db.execute(stmt)
+            totals = self._read_totals(db, taken, now)
+            if self.limiters and now >= self._next_cleanup:
+                # Once a window, drop the slots that no longer count for any client
+                window = max(limiter.window for limiter in self.limiters)
+                db.execute(delete(table).where(table.c.slot_start < (int(now // window) - 1) * window))
+                self._next_cleanup = now + window
+            db.commit()
+        except Exception:
+            for limiter, pending, _ in taken:
+                limiter.restore_pending(pending)
+            raise
+        for limiter, _, keys in taken:
+            limiter.apply_totals(keys, totals.get(limiter.name, {}))
+        return len(rows)
+
+    def _read_totals(self, db: Session, taken: List[Taken], now: float) -> Dict[str, Dict[str, Dict[int, int]]]:
+        """Read the counts of the current and previous slot of every tracked client, per limiter."""
+        totals: Dict[str, Dict[str, Dict[int, int]]] = {}
+        table = models.RateLimitCounter.__table__
+        for limiter, _, keys in taken:
+            if not keys:
+                continue
+            since = (int(now // limiter.window) - 1) * limiter.window
+            rows = db.execute(
+                select(table.c.key, table.c.slot_start, table.c.n).where(
+                    table.c.limiter == limiter.name, table.c.key.in_(keys), table.c.slot_start >= since
+                )
+            )
+            counts = totals.setdefault(limiter.name, {})
+            for key, slot, n in rows:
+                counts.setdefault(key, {})[slot] = n
+        return totals
+
+    def start(self, session_factory: sessionmaker, interval: float) -> None:
+        """Sync every ``interval`` seconds in a daemon thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory, interval), name="whatsnext-rate-limits", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the sync thread after a last sync."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sync_in_session(self, session_factory: sessionmaker) -> None:
+        try:
+            with session_factory() as db:
+                self.sync(db)
+        except Exception:
+            logger.exception("Syncing rate limit counters failed")
+
+    def _run(self, session_factory: sessionmaker, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self._sync_in_session(session_factory)
+        self._sync_in_session(session_factory)
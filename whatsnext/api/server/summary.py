@@ -0,0 +1,144 @@
+"""System-wide snapshot for status dashboards.
+
+``GET /status/summary`` answers ``whatsnext status`` with the job counts of
+every project, the active clients and their resources, and the jobs that
+finished recently, in one response. Dashboards are typically polled in a
+loop by many people at once, so each server process keeps the snapshot for
+``status_summary_ttl`` seconds in a :class:`SummaryCache` and rebuilds it at
+most once per expiry, however many requests arrive meanwhile.
+
+The snapshot's ``server`` health is that of its build: a snapshot is only
+built when its queries succeed, and if a rebuild fails on the database, the
+route serves the previous snapshot marked unhealthy.
+
+Building a snapshot takes three queries: projects with their finished-job
+counts (index range scans on ``(project_id, updated_at)``), the
+``project_job_counts`` table, and one aggregate over ``clients``.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Jobs that finished within this many seconds count as recent throughput
+RECENT_WINDOW = 3600
+
+
+def _recent(job_status: models.JobStatus, since):
+    """Correlated count of a project's jobs that moved to ``job_status`` since ``since``."""
+    return (
+        select(func.count())
+        .where(models.Job.project_id == models.Project.id, models.Job.updated_at >= since, models.Job.status == job_status)
+        .scalar_subquery()
+    )
+
+
+def build_summary(db: Session) -> Dict[str, Any]:
+    """Collect the per-project job counts, client totals and recent throughput.
+
+    Args:
+        db: Database session.
+
+    Returns:
+        The snapshot, shaped like ``schemas.StatusSummaryResponse``.
+    """
+    since = func.now() - timedelta(seconds=RECENT_WINDOW)
+    projects = db.execute(
+        select(
+            models.Project.id,
+            models.Project.name,
+            models.Project.status,
+            _recent(models.JobStatus.COMPLETED, since),
+            _recent(models.JobStatus.FAILED, since),
+        ).order_by(models.Project.id)
+    ).all()
+    counts: Dict[int, Dict[str, int]] = {}
+    for project_id, job_status, n in db.execute(
+        select(models.ProjectJobCount.project_id, models.ProjectJobCount.status, func.sum(models.ProjectJobCount.n)).group_by(
+            models.ProjectJobCount.project_id, models.ProjectJobCount.status
+        )
+    ):
+        counts.setdefault(project_id, {})[job_status.name] = n
+    active = models.Client.is_active == 1
+    clients = db.execute(
+        select(
+            func.count(),
+            func.count().filter(active),
+            func.coalesce(func.sum(models.Client.available_cpu).filter(active), 0),
+            func.coalesce(func.sum(models.Client.available_accelerators).filter(active), 0),
+        )
+    ).one()
+
+    project_summaries = []
+    for project_id, name, project_status, completed, failed in projects:
+        by_status = {job_status.name: 0 for job_status in models.JobStatus}
+        by_status.update(counts.get(project_id, {}))
+        project_summaries.append(
+            {
+                "id": project_id,
+                "name": name,
+                "status": project_status.name,
+                "total": sum(by_status.values()),
+                "by_status": by_status,
+                "recent_completed": completed,
+                "recent_failed": failed,
+            }
+        )
+    return {
+        "server": {"status": "healthy", "database": "connected"},
+        "generated_at": datetime.now(timezone.utc),
+        "recent_window": RECENT_WINDOW,
+        "projects": project_summaries,
+        "clients": {
+            "total": clients[0],
+            "active": clients[1],
+            "active_cpu": clients[2],
+            "active_accelerators": clients[3],
+        },
+    }
+
+
+class SummaryCache:
+    """Keeps the last snapshot of a process for a few seconds.
+
+    A request finding the snapshot expired rebuilds it while holding the
+    lock; requests arriving meanwhile wait for it instead of querying too.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._summary: Optional[Dict[str, Any]] = None
+        self._expires = 0.0
+
+    @property
+    def last(self) -> Optional[Dict[str, Any]]:
+        """The last snapshot built, however old, or None."""
+        return self._summary
+
+    def get(self, build: Callable[[], Dict[str, Any]], ttl: float) -> Dict[str, Any]:
+        """Return the cached snapshot, rebuilding it with ``build`` once it is ``ttl`` seconds old.
+
+        Args:
+            build: Builds a fresh snapshot.
+            ttl: Seconds a snapshot is served (0 = rebuild on every call).
+        """
+        with self._lock:
+            if self._summary is None or time.monotonic() >= self._expires:
+                self._summary = build()
+                self._expires = time.monotonic() + ttl
+            return self._summary
+
+    def clear(self) -> None:
+        """Drop the cached snapshot."""
+        with self._lock:
+            self._summary = None
+
+
+# Snapshot cache of this server process
+summary_cache = SummaryCache()
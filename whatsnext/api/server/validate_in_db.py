@@ -1,4 +1,7 @@
+from typing import Iterable, List
+
 from fastapi import HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from . import models
@@ -18,3 +21,24 @@ def validate_task_in_project_exists(db: Session, task_id: int, project_id: int)
     if task is None or task.project_id != project_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Task {task_id=} not found for project id {project_id}.")
     return task
+
+
+# validate that all tasks exist in project, with one query
+def validate_tasks_in_project_exist(db: Session, task_ids: Iterable[int], project_id: int) -> None:
+    task_ids = set(task_ids)
+    if not task_ids:
+        return
+    found = set(db.scalars(select(models.Task.id).where(models.Task.id.in_(task_ids), models.Task.project_id == project_id)))
+    missing = sorted(task_ids - found)
+    if missing:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Tasks {missing} not found for project id {project_id}.")
+
+
+# validate that all dependency jobs exist in project
+def validate_dependencies_exist(db: Session, dep_ids: List[int], project_id: int) -> None:
+    if not dep_ids:
+        return
+    found = set(db.scalars(select(models.Job.id).where(models.Job.id.in_(dep_ids), models.Job.project_id == project_id)))
+    missing = sorted(set(dep_ids) - found)
+    if missing:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Dependency jobs {missing} not found for project id {project_id}.")
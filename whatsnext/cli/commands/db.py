@@ -2,6 +2,7 @@
 
 import subprocess
 from pathlib import Path
+from typing import Optional
 
 import typer
 from rich.console import Console
@@ -154,3 +155,32 @@ def init_db(
             console.print("\n[green]Database initialized successfully.[/green]")
         else:
             raise typer.Exit(returncode)
+
+
+@app.command(name="recount")
+def recount(
+    project_id: Optional[int] = typer.Option(None, "--project-id", help="Only recount this project (default: all projects)"),
+) -> None:
+    """Rebuild the per-project job counts from the jobs table.
+
+    The counts are kept up to date by database triggers; use this to repair
+    them should they ever drift. Jobs cannot change while the counts are
+    rebuilt. Uses the server's database settings.
+
+    Examples:
+        whatsnext db recount                # Recount all projects
+        whatsnext db recount --project-id 3 # Recount one project
+    """
+    try:
+        from ...api.server.counts import recount_jobs
+        from ...api.server.database import SessionLocal
+    except ImportError:
+        console.print("[red]Error:[/red] Server dependencies not installed.")
+        console.print("Install with: pip install whatsnext[server]")
+        raise typer.Exit(1)
+
+    console.print("[bold]Recounting jobs...[/bold]\n")
+    with SessionLocal() as session:
+        rows = recount_jobs(session, project_id)
+        session.commit()
+    console.print(f"[green]Wrote {rows} job count(s).[/green]")
@@ -113,17 +113,11 @@ def show_project(
 
     # Get queue stats
     try:
-        queue_response = requests.get(f"{server.url}/jobs/", params={"project_id": project["id"], "limit": 1000})
-        queue_response.raise_for_status()
-        jobs = queue_response.json()
+        stats_response = requests.get(f"{server.url}/projects/{project['id']}/stats")
+        stats_response.raise_for_status()
+        status_counts = {s: n for s, n in stats_response.json()["by_status"].items() if n}
     except requests.RequestException:
-        jobs = []
-
-    # Count by status
-    status_counts = {}
-    for job in jobs:
-        s = job.get("status", "UNKNOWN")
-        status_counts[s] = status_counts.get(s, 0) + 1
+        status_counts = {}
 
     # Display
     console.print(f"\n[bold cyan]Project: {project['name']}[/bold cyan]")
@@ -131,6 +125,7 @@ def show_project(
     console.print(f"ID:          {project['id']}")
     console.print(f"Status:      {project['status']}")
     console.print(f"Description: {project.get('description') or '-'}")
+    console.print(f"Aging:       {project.get('priority_aging') or 0:g} priority/hour")
     console.print(f"Created:     {project.get('created_at', '-')}")
     console.print(f"Updated:     {project.get('updated_at', '-')}")
 
@@ -145,6 +140,9 @@ def show_project(
 def create_project(
     name: str = typer.Argument(..., help="Project name"),
     description: str = typer.Option("", "--description", "-d", help="Project description"),
+    priority_aging: float = typer.Option(
+        0.0, "--priority-aging", min=0, help="Priority points a pending job gains per hour waited (0 = strict priority)"
+    ),
     host: Optional[str] = typer.Option(None, "--server", "-s", help="Server host"),
     port: Optional[int] = typer.Option(None, "--port", "-p", help="Server port"),
     config_file: Optional[Path] = typer.Option(None, "--config", "-c", help="Config file path"),
@@ -158,7 +156,7 @@ def create_project(
     try:
         response = requests.post(
             f"{server.url}/projects/",
-            json={"name": name, "description": description, "status": "ACTIVE"},
+            json={"name": name, "description": description, "status": "ACTIVE", "priority_aging": priority_aging},
         )
         response.raise_for_status()
         project = response.json()
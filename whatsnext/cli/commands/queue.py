@@ -1,5 +1,6 @@
 """Queue viewing and management commands."""
 
+from itertools import islice
 from pathlib import Path
 from typing import Optional
 
@@ -31,6 +32,9 @@ def list_queue(
 
     import requests
 
+    from whatsnext import Server
+    from whatsnext.api.client.server import MAX_PAGE_SIZE
+
     config = get_config(config_file)
     server = get_server_from_config(config, host, port)
 
@@ -48,19 +52,15 @@ def list_queue(
         console.print(f"[red]Error finding project: {e}[/red]")
         raise typer.Exit(1)
 
-    # Get jobs
+    # Get jobs, filtered by status on the server
+    job_status = status_filter.upper() if status_filter and status_filter.lower() != "all" else None
     try:
-        response = requests.get(f"{server.url}/jobs/", params={"project_id": project_id, "limit": limit})
-        response.raise_for_status()
-        jobs = response.json()
+        client = Server(server.host, server.port)
+        jobs = list(islice(client.iter_jobs(project_id=project_id, status=job_status, page_size=max(1, min(limit, MAX_PAGE_SIZE))), limit))
     except requests.RequestException as e:
         console.print(f"[red]Error fetching jobs: {e}[/red]")
         raise typer.Exit(1)
 
-    # Apply filters
-    if status_filter and status_filter.lower() != "all":
-        jobs = [j for j in jobs if j.get("status", "").upper() == status_filter.upper()]
-
     if task:
         # Get task ID for filtering
         try:
@@ -142,32 +142,19 @@ def queue_stats(
         console.print(f"[red]Error finding project: {e}[/red]")
         raise typer.Exit(1)
 
-    # Get all jobs for stats
+    # Counts are aggregated by the server
     try:
-        response = requests.get(f"{server.url}/jobs/", params={"project_id": project_id, "limit": 10000})
+        response = requests.get(f"{server.url}/projects/{project_id}/stats")
         response.raise_for_status()
-        jobs = response.json()
+        stats = response.json()
     except requests.RequestException as e:
-        console.print(f"[red]Error fetching jobs: {e}[/red]")
+        console.print(f"[red]Error fetching queue statistics: {e}[/red]")
         raise typer.Exit(1)
 
-    # Calculate stats
-    total = len(jobs)
-    by_status = {}
-    by_task = {}
-
-    for job in jobs:
-        status = job.get("status", "UNKNOWN")
-        by_status[status] = by_status.get(status, 0) + 1
-
-        task_id = job.get("task_id", "unknown")
-        by_task[task_id] = by_task.get(task_id, 0) + 1
-
-    stats = {
-        "total": total,
-        "by_status": by_status,
-        "by_task": by_task,
-    }
+    total = stats["total"]
+    by_status = stats["by_status"]
+    by_task = stats["by_task"]
+    by_priority = stats["pending_by_priority"]
 
     if json_output:
         console.print(json.dumps(stats, indent=2))
@@ -197,9 +184,18 @@ def queue_stats(
                 console.print(f"  [{style}]{status:12}[/{style}] {count:4}  {bar} {pct:5.1f}%")
 
     if by_task:
-        console.print("\n[bold]By Task ID:[/bold]")
-        for task_id, count in sorted(by_task.items(), key=lambda x: -x[1])[:10]:
-            console.print(f"  Task {task_id}: {count}")
+        console.print("\n[bold]By Task:[/bold]")
+        for task in by_task[:10]:
+            name = task["task_name"] or f"Task {task['task_id']}"
+            console.print(f"  {name}: {task['n']}")
+
+    if by_priority:
+        console.print("\n[bold]Pending By Priority:[/bold]")
+        for band in by_priority:
+            console.print(f"  {band['min_priority']:>5} to {band['max_priority']:<5} {band['n']:4}")
+
+    if stats["oldest_pending_age"] is not None:
+        console.print(f"\nOldest pending job: {stats['oldest_pending_age']:.0f}s old")
 
 
 @app.command("clear")
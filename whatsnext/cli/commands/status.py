@@ -6,7 +6,6 @@ from typing import Optional
 import typer
 from rich.console import Console
 from rich.panel import Panel
-from rich.table import Table
 
 from ..config import get_config, get_server_from_config
 
@@ -38,13 +37,14 @@ def show_status(
         "server": {"url": server.url, "status": "unknown"},
         "project": None,
         "queue": {},
-        "clients": {"total": 0, "active": 0},
+        "clients": {"total": 0, "active": 0, "active_cpu": 0, "active_accelerators": 0},
     }
 
-    # Check server connectivity
+    # One request returns the whole dashboard, from a snapshot cached by the server
     try:
-        response = requests.get(f"{server.url}/projects/", params={"limit": 1}, timeout=5)
+        response = requests.get(f"{server.url}/status/summary", timeout=5)
         response.raise_for_status()
+        summary = response.json()
         status_data["server"]["status"] = "connected"
     except requests.RequestException as e:
         status_data["server"]["status"] = "disconnected"
@@ -58,53 +58,25 @@ def show_status(
 
     # Get project info
     project_name = project or config.project
-    project_id = None
 
     if project_name:
-        try:
-            proj_response = requests.get(f"{server.url}/projects/name/{project_name}")
-            proj_response.raise_for_status()
-            proj_data = proj_response.json()
-            project_id = proj_data["id"]
+        proj_data = next((p for p in summary["projects"] if p["name"] == project_name), None)
+        if proj_data:
             status_data["project"] = {
                 "name": proj_data["name"],
                 "id": proj_data["id"],
                 "status": proj_data["status"],
             }
-        except requests.RequestException:
-            status_data["project"] = {"name": project_name, "error": "not found"}
-
-    # Get queue stats if we have a project
-    if project_id:
-        try:
-            jobs_response = requests.get(f"{server.url}/jobs/", params={"project_id": project_id, "limit": 10000})
-            jobs_response.raise_for_status()
-            jobs = jobs_response.json()
-
-            by_status = {}
-            for job in jobs:
-                s = job.get("status", "UNKNOWN")
-                by_status[s] = by_status.get(s, 0) + 1
-
             status_data["queue"] = {
-                "total": len(jobs),
-                "by_status": by_status,
+                "total": proj_data["total"],
+                "by_status": {s: n for s, n in proj_data["by_status"].items() if n},
+                "recent_completed": proj_data["recent_completed"],
+                "recent_failed": proj_data["recent_failed"],
             }
-        except requests.RequestException:
-            pass
+        else:
+            status_data["project"] = {"name": project_name, "error": "not found"}
 
-    # Get client stats
-    try:
-        clients_response = requests.get(f"{server.url}/clients/", params={"active_only": False, "limit": 1000})
-        clients_response.raise_for_status()
-        all_clients = clients_response.json()
-        active_clients = [c for c in all_clients if c.get("is_active")]
-        status_data["clients"] = {
-            "total": len(all_clients),
-            "active": len(active_clients),
-        }
-    except requests.RequestException:
-        pass
+    status_data["clients"] = summary["clients"]
 
     if json_output:
         console.print(json.dumps(status_data, indent=2))
@@ -157,6 +129,8 @@ def show_status(
                     status_parts.append(f"[{style}]{s}: {count}[/{style}]")
             if status_parts:
                 console.print("  " + " | ".join(status_parts))
+        window = summary["recent_window"] // 60
+        console.print(f"  [dim]Last {window} min: {queue['recent_completed']} completed, {queue['recent_failed']} failed[/dim]")
     elif project_name:
         console.print("\n[bold]Queue:[/bold] [dim]No jobs[/dim]")
 
@@ -164,34 +138,11 @@ def show_status(
     clients = status_data["clients"]
     console.print(f"\n[bold]Workers:[/bold] {clients['active']} active / {clients['total']} registered")
 
-    # Show active clients if any
     if clients["active"] > 0:
-        try:
-            active_response = requests.get(f"{server.url}/clients/", params={"active_only": True, "limit": 5})
-            active_response.raise_for_status()
-            active_list = active_response.json()
-
-            if active_list:
-                table = Table(show_header=True, header_style="dim", box=None)
-                table.add_column("Name")
-                table.add_column("Entity")
-                table.add_column("Resources")
-
-                for client in active_list[:5]:
-                    resources = f"{client.get('available_cpu', 0)} CPU"
-                    if client.get("available_accelerators", 0) > 0:
-                        resources += f", {client['available_accelerators']} accel"
-                    table.add_row(
-                        client.get("name", client["id"][:12]),
-                        client.get("entity", "-"),
-                        resources,
-                    )
-
-                console.print(table)
-                if len(active_list) > 5:
-                    console.print(f"  [dim]... and {len(active_list) - 5} more[/dim]")
-        except requests.RequestException:
-            pass
+        resources = f"{clients['active_cpu']} CPU"
+        if clients["active_accelerators"] > 0:
+            resources += f", {clients['active_accelerators']} accel"
+        console.print(f"  Resources: {resources}")
 
     # Config info
     if config.config_path:
@@ -2,7 +2,7 @@
 
 import socket
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 import typer
 from rich.console import Console
@@ -12,14 +12,35 @@ from ..config import get_config, get_project_from_config, get_server_from_config
 console = Console()
 
 
+def parse_share(value: str) -> Tuple[str, float]:
+    """Split a ``NAME[:WEIGHT]`` project option into name and weight.
+
+    Raises:
+        typer.BadParameter: If the weight is not a positive number.
+    """
+    name, sep, weight = value.rpartition(":")
+    if not sep:
+        return value, 1.0
+    try:
+        share = float(weight)
+    except ValueError:
+        raise typer.BadParameter(f"Invalid weight in '{value}', expected NAME:WEIGHT")
+    if share <= 0:
+        raise typer.BadParameter(f"Weight in '{value}' must be positive")
+    return name, share
+
+
 def start_worker(
-    project: Optional[str] = typer.Option(None, "--project", "-P", help="Project name"),
+    project: Optional[List[str]] = typer.Option(
+        None, "--project", "-P", help="Project name, optionally NAME:WEIGHT; repeat to share the worker between projects"
+    ),
     name: Optional[str] = typer.Option(None, "--name", help="Worker name (default: hostname)"),
     entity: Optional[str] = typer.Option(None, "--entity", "-e", help="Entity/team name"),
     cpus: Optional[int] = typer.Option(None, "--cpus", help="Available CPUs"),
     accelerators: Optional[int] = typer.Option(None, "--accelerators", "--accel", help="Available accelerators"),
     formatter_type: Optional[str] = typer.Option(None, "--formatter", "-f", help="Formatter type: cli, slurm, runai"),
-    poll_interval: int = typer.Option(30, "--poll-interval", help="Seconds between polling when queue is empty"),
+    poll_interval: int = typer.Option(30, "--poll-interval", help="Seconds each request waits for a new job when queue is empty"),
+    batch_size: int = typer.Option(1, "--batch-size", min=1, help="Maximum number of jobs to claim per request"),
     once: bool = typer.Option(False, "--once", help="Process one job and exit"),
     host: Optional[str] = typer.Option(None, "--server", "-s", help="Server host"),
     port: Optional[int] = typer.Option(None, "--port", "-p", help="Server port"),
@@ -28,6 +49,8 @@ def start_worker(
     """Start a worker to process jobs from the queue.
 
     The worker will continuously fetch and execute jobs until interrupted (Ctrl+C).
+    Given several projects, each job comes from the project furthest below its
+    weighted fair share of recent work.
     """
     from whatsnext import Client, Formatter
     from whatsnext.api.client.formatter import CLIFormatter, RUNAIFormatter, SlurmFormatter
@@ -40,17 +63,24 @@ def start_worker(
     worker_cpus = cpus if cpus is not None else (config.client.cpus or 0)
     worker_accelerators = accelerators if accelerators is not None else (config.client.accelerators or 0)
 
-    # Get project
-    project_name = project or config.project
-    if not project_name:
+    # Get projects
+    project_options = project or ([config.project] if config.project else [])
+    if not project_options:
         console.print("[red]No project specified. Use --project or set 'project' in .whatsnext[/red]")
         raise typer.Exit(1)
+    named_shares = [parse_share(option) for option in project_options]
+    if len(named_shares) > 1 and batch_size > 1:
+        console.print("[red]--batch-size cannot be combined with several projects[/red]")
+        raise typer.Exit(1)
 
     try:
-        proj = get_project_from_config(config, project_name, host, port)
+        shares = [(get_project_from_config(config, name, host, port), weight) for name, weight in named_shares]
     except Exception as e:
         console.print(f"[red]Error connecting to project: {e}[/red]")
         raise typer.Exit(1)
+    proj = shares[0][0]
+    project_name = ", ".join(name if len(named_shares) == 1 else f"{name} ({weight:g})" for name, weight in named_shares)
+    worker_shares = shares if len(shares) > 1 else None
 
     # Create formatter
     fmt_type = formatter_type or config.formatter.type or "cli"
@@ -114,10 +144,11 @@ def start_worker(
             # Process single job
             resource = client.allocate_resource(cpu=1, accelerator=[])
             try:
-                job = proj.fetch_job(
-                    available_cpu=worker_cpus if worker_cpus > 0 else 0,
-                    available_accelerators=worker_accelerators if worker_accelerators > 0 else 0,
-                )
+                fetch_args = {
+                    "available_cpu": worker_cpus if worker_cpus > 0 else 0,
+                    "available_accelerators": worker_accelerators if worker_accelerators > 0 else 0,
+                }
+                job = client.fetch_shared_job(worker_shares, **fetch_args) if worker_shares else proj.fetch_job(**fetch_args)
                 if job:
                     console.print(f"[yellow]Processing:[/yellow] {job.name} (ID: {job.id})")
                     exit_code = job.run(resource)
@@ -136,6 +167,8 @@ def start_worker(
                 poll_interval=poll_interval,
                 run_forever=True,
                 use_resource_filter=use_filter,
+                batch_size=batch_size,
+                shares=worker_shares,
             )
             console.print(f"\n[bold]Processed {jobs_processed} job(s)[/bold]")
 